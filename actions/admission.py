@@ -0,0 +1,184 @@
+# Controllo di ammissione davanti al modello.
+#
+# Il modello su CPU regge poche generazioni alla volta: invece di lanciarle
+# tutte contro Ollama (e vederle scadere insieme), al più `max_concurrency`
+# generazioni sono in corso e le altre aspettano in una coda di priorità
+# limitata. A coda piena la richiesta viene rifiutata subito (l'utente riceve
+# un messaggio "occupato"), e chi aspetta oltre `max_wait` secondi rinuncia:
+# così le richieste accettate restano nei tempi anche sotto carico.
+
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from . import metrics
+
+# Priorità: numeri più bassi passano prima
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+
+class Overloaded(Exception):
+    """Coda piena: la richiesta è stata rifiutata senza attendere."""
+
+
+class QueueTimeout(Overloaded):
+    """La richiesta ha atteso in coda oltre il tempo massimo."""
+
+
+WAIT_TIME = metrics.REGISTRY.register(metrics.Histogram(
+    "llm_admission_wait_seconds", "Attesa in coda prima della generazione.", ("outcome",),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0),
+))
+
+
+class AdmissionController:
+    '''
+    Limita le generazioni contemporanee con una coda di priorità limitata.
+
+    :param max_concurrency: generazioni in corso al massimo
+    :param max_queue: richieste in attesa al massimo; oltre si rifiuta subito
+    :param max_wait: secondi massimi di attesa in coda
+    '''
+
+    def __init__(self, max_concurrency: int = 2, max_queue: int = 8, max_wait: float = 20.0) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._active = 0
+        self._queued = 0
+        # heap di [priorità, ordine di arrivo, future]; le future già risolte
+        # (scadute, scartate, cancellate) vengono tolte quando affiorano
+        self._waiters: List[List[Any]] = []
+        self._order = itertools.count()
+        self._stats = {"admitted": 0, "shed": 0, "evicted": 0, "expired": 0, "wait_time_max": 0.0}
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def _admitted(self, waited: float) -> None:
+        self._stats["admitted"] += 1
+        self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+        WAIT_TIME.observe(waited, outcome="admitted")
+
+    def _evict(self, priority: int) -> bool:
+        '''A coda piena fa posto scartando l'attesa meno urgente, se lo è meno di `priority`.'''
+        live = [entry for entry in self._waiters if not entry[2].done()]
+        if not live:
+            return False
+        worst = max(live, key=lambda entry: (entry[0], entry[1]))
+        if worst[0] <= priority:
+            return False
+        self._queued -= 1
+        self._stats["evicted"] += 1
+        worst[2].set_exception(Overloaded("evicted by a higher-priority request"))
+        return True
+
+    def _expire(self, future: asyncio.Future) -> None:
+        if future.done():
+            return
+        self._queued -= 1
+        self._stats["expired"] += 1
+        future.set_exception(QueueTimeout(f"no generation slot within {self.max_wait}s"))
+        # Ricompatta il heap se le voci morte sono troppe
+        if len(self._waiters) > 2 * self._queued + 16:
+            self._waiters = [entry for entry in self._waiters if not entry[2].done()]
+            heapq.heapify(self._waiters)
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE, timeout: Optional[float] = None) -> None:
+        '''
+        Attende un posto libero. Solleva `Overloaded` se la coda è piena e
+        `QueueTimeout` se il posto non arriva entro `timeout` (default `max_wait`).
+        '''
+        if self._active < self.max_concurrency and not self._queued:
+            self._active += 1
+            self._admitted(0.0)
+            return
+
+        if self._queued >= self.max_queue and not self._evict(priority):
+            self._stats["shed"] += 1
+            WAIT_TIME.observe(0.0, outcome="shed")
+            raise Overloaded(f"{self._queued} requests already waiting")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._waiters, [priority, next(self._order), future])
+        self._queued += 1
+        started = time.monotonic()
+        timer = loop.call_later(self.max_wait if timeout is None else timeout, self._expire, future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                # Cancellati mentre eravamo in coda
+                self._queued -= 1
+            elif future.exception() is None:
+                # Il posto era appena stato assegnato: lo restituiamo
+                self.release()
+            raise
+        except Overloaded:
+            WAIT_TIME.observe(time.monotonic() - started, outcome="rejected")
+            raise
+        finally:
+            timer.cancel()
+        self._admitted(time.monotonic() - started)
+
+    def release(self) -> None:
+        '''Libera un posto e lo passa alla prima richiesta in coda.'''
+        self._active -= 1
+        while self._waiters and self._active < self.max_concurrency:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._queued -= 1
+            self._active += 1
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_INTERACTIVE,
+                   timeout: Optional[float] = None) -> AsyncIterator[None]:
+        await self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self._stats)
+        stats["active"] = self._active
+        stats["queued"] = self._queued
+        stats["max_concurrency"] = self.max_concurrency
+        stats["max_queue"] = self.max_queue
+        return stats
+
+
+_admission: Optional[AdmissionController] = None
+
+
+def get_llm_admission() -> AdmissionController:
+    '''
+    Controllo di ammissione condiviso per le generazioni: OLLAMA_MAX_CONCURRENCY
+    generazioni in corso, LLM_QUEUE_SIZE in attesa per al più LLM_QUEUE_TIMEOUT secondi.
+    '''
+    global _admission
+    if _admission is None:
+        _admission = AdmissionController(
+            max_concurrency=int(os.getenv("OLLAMA_MAX_CONCURRENCY", 2)),
+            max_queue=int(os.getenv("LLM_QUEUE_SIZE", 8)),
+            max_wait=float(os.getenv("LLM_QUEUE_TIMEOUT", 20)),
+        )
+    return _admission
+
+
+@metrics.collector("llm_admission", counters=("admitted", "shed", "evicted", "expired"))
+def admission_metrics() -> Optional[Dict[str, Any]]:
+    return _admission.stats() if _admission is not None else None
@@ -0,0 +1,145 @@
+# Cache delle risposte generate da Ollama.
+#
+# Molti studenti fanno le stesse poche domande ("quanto costa la retta",
+# "how much are fees"): se contesto inviato, domanda normalizzata e lingua sono
+# gli stessi, la risposta già generata è riutilizzabile. Ogni risposta ricorda
+# l'hash della pagina da cui è stata ricavata: quando la pagina cambia la
+# risposta viene scartata, quindi un hit non è mai più vecchio del sito.
+
+import os
+import re
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Set, Tuple
+
+from . import metrics
+
+_PUNCT_RE = re.compile(r"[^\w\s]", re.UNICODE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(text: str) -> str:
+    '''Minuscole, senza accenti né punteggiatura, spazi compattati.'''
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _PUNCT_RE.sub(" ", text.lower())
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def context_hash(context: str) -> str:
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+
+class _Entry(NamedTuple):
+    url: str
+    page_hash: str
+    answer: str
+    created_at: float
+
+
+class AnswerCache:
+    '''
+    LRU con TTL delle risposte, indicizzata per (hash del contesto, domanda
+    normalizzata, lingua).
+
+    :param max_entries: risposte tenute al massimo
+    :param ttl: secondi di validità di una risposta
+    '''
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600.0) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str, str], _Entry]" = OrderedDict()
+        self._by_url: Dict[str, Set[Tuple[str, str, str]]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "invalidated": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(context: str, question: str, language: str) -> Tuple[str, str, str]:
+        return (context_hash(context), normalize_question(question), language)
+
+    def _drop(self, key: Tuple[str, str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._by_url.get(entry.url)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_url[entry.url]
+
+    def get(self, url: str, page_hash: str, context: str, question: str, language: str) -> Optional[str]:
+        key = self.make_key(context, question, language)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if entry.page_hash != page_hash:
+                self._drop(key)
+                self._stats["invalidated"] += 1
+                self._stats["misses"] += 1
+                return None
+            if time.time() - entry.created_at > self.ttl:
+                self._drop(key)
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry.answer
+
+    def put(self, url: str, page_hash: str, context: str, question: str, language: str, answer: str) -> None:
+        key = self.make_key(context, question, language)
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = _Entry(url, page_hash, answer, time.time())
+            self._by_url.setdefault(url, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._stats["evictions"] += 1
+
+    def invalidate_page(self, url: str, current_hash: Optional[str] = None) -> int:
+        '''
+        Scarta le risposte ricavate da `url` con un contenuto diverso da
+        `current_hash` (tutte, se `current_hash` è None).
+        '''
+        with self._lock:
+            stale = [
+                key for key in self._by_url.get(url, ())
+                if current_hash is None or self._entries[key].page_hash != current_hash
+            ]
+            for key in stale:
+                self._drop(key)
+            self._stats["invalidated"] += len(stale)
+        return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_cache: Optional[AnswerCache] = None
+
+
+def get_answer_cache() -> AnswerCache:
+    '''Cache condivisa dal processo: ANSWER_CACHE_SIZE risposte, ANSWER_CACHE_TTL secondi.'''
+    global _cache
+    if _cache is None:
+        _cache = AnswerCache(
+            max_entries=int(os.getenv("ANSWER_CACHE_SIZE", 256)),
+            ttl=float(os.getenv("ANSWER_CACHE_TTL", 3600)),
+        )
+    return _cache
+
+
+@metrics.collector("answer_cache", counters=("hits", "misses", "expired", "invalidated", "evictions"))
+def answer_cache_metrics() -> Optional[Dict[str, Any]]:
+    return _cache.stats() if _cache is not None else None
@@ -0,0 +1,308 @@
+# Copia in memoria del catalogo (tabelle degree e course).
+#
+# Il catalogo è di fatto un dato di riferimento statico: lo carichiamo una volta
+# sola e lo indicizziamo, così validazioni ed elenchi del form di iscrizione
+# diventano semplici lookup su dizionari. La copia viene ricaricata quando il
+# catalogo cambia (LISTEN/NOTIFY sul canale 'catalog_changed', con un controllo
+# periodico della versione come rete di sicurezza).
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from .db import ConnectionPool, connect, get_pool
+from .catalog_queries import fetch_catalog, fetch_version
+from .matcher import Matcher, TrigramIndex, fold
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "catalog_changed"
+
+
+class Degree(NamedTuple):
+    id: str
+    name: str
+    type: str
+    category: str
+
+
+class Course(NamedTuple):
+    id: int
+    degree_id: str
+    name: str
+    is_mandatory: bool
+
+
+class DegreeMatch(NamedTuple):
+    degree: Optional[Degree]    # None se non trovato o ambiguo
+    candidates: List[Degree]    # lauree tra cui far scegliere quando è ambiguo
+
+
+class CatalogSnapshot:
+    '''
+    Fotografia immutabile del catalogo con gli indici usati dalle action:
+    per (category, type), per id di laurea e per (degree_id, is_mandatory).
+    '''
+
+    def __init__(self, degrees: List[Degree], courses: List[Course], version: Optional[int] = None) -> None:
+        self.version = version
+        self.loaded_at = time.time()
+
+        self._degrees_by_id: Dict[str, Degree] = {}
+        self._degrees_by_upper_id: Dict[str, Degree] = {}
+        self._degrees_by_category_type: Dict[Tuple[str, str], List[Degree]] = {}
+        for d in degrees:
+            self._degrees_by_id[d.id] = d
+            self._degrees_by_upper_id[d.id.upper()] = d
+            self._degrees_by_category_type.setdefault((d.category, d.type), []).append(d)
+
+        self._courses_by_id: Dict[int, Course] = {}
+        self._courses_by_degree: Dict[Tuple[str, bool], List[Course]] = {}
+        for c in courses:
+            self._courses_by_id[c.id] = c
+            self._courses_by_degree.setdefault((c.degree_id, c.is_mandatory), []).append(c)
+
+        # Indici per nome costruiti al primo utilizzo
+        self._name_matcher: Optional[Matcher] = None
+        self._name_trigrams: Optional[TrigramIndex] = None
+        self._degrees_by_name: Dict[str, Degree] = {}
+
+    def __len__(self) -> int:
+        return len(self._degrees_by_id)
+
+    def degree(self, degree_id: str) -> Optional[Degree]:
+        return self._degrees_by_id.get(degree_id)
+
+    def degrees(self) -> List[Degree]:
+        return list(self._degrees_by_id.values())
+
+    def degrees_for(self, category: str, degree_type: str) -> List[Degree]:
+        return self._degrees_by_category_type.get((category, degree_type), [])
+
+    def course(self, course_id: Any) -> Optional[Course]:
+        try:
+            return self._courses_by_id.get(int(str(course_id).strip()))
+        except ValueError:
+            return None
+
+    def courses_for(self, degree_id: str, mandatory: bool) -> List[Course]:
+        return self._courses_by_degree.get((degree_id, mandatory), [])
+
+    # Similarità minima di un nome approssimato e distacco minimo dal secondo
+    NAME_MIN_SCORE = 0.5
+    NAME_MIN_MARGIN = 0.15
+
+    def find_degree(self, text: str, category: Optional[str] = None,
+                    degree_type: Optional[str] = None) -> Optional[Degree]:
+        '''Corso di laurea indicato senza ambiguità (vedi `match_degree`), altrimenti None.'''
+        return self.match_degree(text, category, degree_type).degree
+
+    def match_degree(self, text: str, category: Optional[str] = None,
+                     degree_type: Optional[str] = None) -> DegreeMatch:
+        '''
+        Cerca un corso di laurea, eventualmente solo tra quelli dell'area e del
+        tipo indicati: l'id deve corrispondere esattamente (senza distinguere
+        maiuscole), il nome anche in modo approssimato. Un nome approssimato è
+        accettato solo se nettamente più simile degli altri; altrimenti viene
+        restituito l'elenco dei candidati da proporre all'utente.
+        '''
+        def accept(degree: Degree) -> bool:
+            return (category is None or degree.category == category) and \
+                (degree_type is None or degree.type == degree_type)
+
+        degree = self._degrees_by_upper_id.get((text or "").strip().strip("[]").strip().upper())
+        if degree is not None:
+            return DegreeMatch(degree if accept(degree) else None, [])
+
+        if self._name_matcher is None:
+            self._degrees_by_name = {fold(d.name): d for d in self._degrees_by_id.values()}
+            self._name_matcher = Matcher(self._degrees_by_name, fuzzy=False)
+            self._name_trigrams = TrigramIndex(self._degrees_by_name)
+
+        # 1. Il nome completo compare nel testo
+        for match in self._name_matcher.find_exact(text):
+            if accept(match.value):
+                return DegreeMatch(match.value, [])
+
+        # 2. Tutte le parole del testo compaiono nel nome ("ingegneria informatica")
+        words = {w for w in fold(text).split() if len(w) > 2}
+        if words:
+            containing = [d for name, d in self._degrees_by_name.items()
+                          if accept(d) and words <= set(name.split())]
+            if len(containing) == 1:
+                return DegreeMatch(containing[0], [])
+            if containing:
+                return DegreeMatch(None, containing)
+
+        # 3. Nome approssimato (errori di battitura), solo se non ambiguo
+        scored = [(score, self._degrees_by_name[name]) for score, name in self._name_trigrams.search(fold(text))
+                  if score >= self.NAME_MIN_SCORE and accept(self._degrees_by_name[name])]
+        if not scored:
+            return DegreeMatch(None, [])
+        if len(scored) == 1 or scored[0][0] - scored[1][0] >= self.NAME_MIN_MARGIN:
+            return DegreeMatch(scored[0][1], [])
+        return DegreeMatch(None, [d for _, d in scored[:5]])
+
+    def optional_course(self, degree_id: str, course_id: Any) -> Optional[Course]:
+        '''Restituisce il corso solo se è un opzionale della laurea indicata.'''
+        course = self.course(course_id)
+        if course and course.degree_id == degree_id and not course.is_mandatory:
+            return course
+        return None
+
+
+def load_snapshot(conn: Any) -> CatalogSnapshot:
+    """Legge versione, degree e course con un'unica query (prepared statement)."""
+    version, degrees, courses = fetch_catalog(conn)
+    return CatalogSnapshot(
+        [Degree(*row) for row in degrees],
+        [Course(*row) for row in courses],
+        version,
+    )
+
+
+class CatalogCache:
+    '''
+    Mantiene lo snapshot corrente e lo ricarica quando il catalogo cambia.
+
+    - Se disponibile, una connessione dedicata resta in LISTEN su
+      'catalog_changed': a ogni `get()` ne leggiamo le notifiche senza
+      round-trip (poll non bloccante del socket).
+    - Ogni `poll_interval` secondi confrontiamo comunque `catalog_version`
+      con la versione dello snapshot, nel caso il listener sia caduto.
+    '''
+
+    def __init__(self,
+                 pool: ConnectionPool,
+                 listen_connect: Optional[Callable[[], Any]] = None,
+                 poll_interval: float = 60.0) -> None:
+        self._pool = pool
+        self._listen_connect = listen_connect
+        self.poll_interval = poll_interval
+
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._listener: Any = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    # --- LISTEN/NOTIFY ----------------------------------------------------
+
+    def _ensure_listener(self) -> None:
+        if self._listener is not None or self._listen_connect is None:
+            return
+        try:
+            conn = self._listen_connect()
+            conn.autocommit = True
+            cur = conn.cursor()
+            cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            cur.close()
+            self._listener = conn
+        except Exception as e:
+            logger.warning(f"Catalog LISTEN unavailable, falling back to version polling: {e}")
+            self._listener = None
+
+    def _drop_listener(self) -> None:
+        if self._listener is not None:
+            try:
+                self._listener.close()
+            except Exception:
+                pass
+        self._listener = None
+
+    def _has_notifications(self) -> bool:
+        if self._listener is None:
+            return False
+        try:
+            self._listener.poll()
+            if self._listener.notifies:
+                self._listener.notifies.clear()
+                return True
+        except Exception as e:
+            logger.warning(f"Catalog listener lost: {e}")
+            self._drop_listener()
+        return False
+
+    # --- Versione ---------------------------------------------------------
+
+    def _current_version(self) -> Optional[int]:
+        with self._pool.connection() as conn:
+            return fetch_version(conn)
+
+    def _is_stale(self) -> bool:
+        now = time.monotonic()
+        if now - self._last_check < self.poll_interval:
+            return False
+        self._last_check = now
+
+        # Riproviamo ad agganciare il listener se era caduto
+        self._ensure_listener()
+
+        if self._snapshot.version is None:
+            return True
+        try:
+            return self._current_version() != self._snapshot.version
+        except Exception as e:
+            logger.warning(f"Catalog version check failed: {e}")
+            return False
+
+    # --- API pubblica -----------------------------------------------------
+
+    def refresh(self) -> CatalogSnapshot:
+        """Ricarica subito lo snapshot dal database."""
+        with self._pool.connection() as conn:
+            snapshot = load_snapshot(conn)
+        self._snapshot = snapshot
+        self._last_check = time.monotonic()
+        self.reloads += 1
+        logger.info(f"Catalog loaded: {len(snapshot)} degrees (version {snapshot.version})")
+        return snapshot
+
+    def get(self) -> CatalogSnapshot:
+        '''
+        Restituisce lo snapshot corrente, ricaricandolo se il catalogo è cambiato.
+
+        Il primo caricamento solleva eccezione se il DB non è raggiungibile;
+        in seguito, in caso di errore, si continua a servire la copia esistente.
+        '''
+        with self._lock:
+            if self._snapshot is None:
+                self._ensure_listener()
+                return self.refresh()
+
+            if self._has_notifications() or self._is_stale():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.warning(f"Catalog reload failed, serving cached copy: {e}")
+            return self._snapshot
+
+    def close(self) -> None:
+        with self._lock:
+            self._drop_listener()
+
+
+_catalog: Optional[CatalogCache] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> CatalogSnapshot:
+    '''
+    Snapshot del catalogo condiviso dal processo.
+
+    `CATALOG_POLL_INTERVAL` (secondi) regola il controllo di versione di riserva;
+    `CATALOG_LISTEN=0` disabilita LISTEN/NOTIFY.
+    '''
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                listen = os.getenv("CATALOG_LISTEN", "1") != "0"
+                _catalog = CatalogCache(
+                    pool=get_pool(),
+                    listen_connect=connect if listen else None,
+                    poll_interval=float(os.getenv("CATALOG_POLL_INTERVAL", 60)),
+                )
+    return _catalog.get()
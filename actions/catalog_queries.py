@@ -0,0 +1,153 @@
+# Query sul catalogo (degree, course) in un solo round-trip.
+#
+# Ogni caso d'uso ha una sola query (join/aggregazioni json) invece di una
+# serie di SELECT sequenziali, e la query è un prepared statement lato server:
+# la prima volta su una connessione la prepariamo (PREPARE), poi ci limitiamo
+# a EXECUTE, saltando parse e planning ad ogni turno. I prepared statement
+# vivono quanto la sessione, quindi teniamo traccia di quelli già preparati
+# per ogni connessione del pool.
+
+import weakref
+import logging
+from typing import Any, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE: prepared statement inesistente / già esistente
+_UNDEFINED_STATEMENT = "26000"
+_DUPLICATE_STATEMENT = "42P05"
+
+
+class Statement(NamedTuple):
+    name: str
+    param_types: Tuple[str, ...]
+    sql: str
+
+
+# Versione, corsi di laurea e insegnamenti in una sola riga
+CATALOG_SNAPSHOT = Statement("catalog_snapshot", (), """
+    SELECT
+        (SELECT version FROM catalog_version),
+        (SELECT COALESCE(json_agg(json_build_array(id, name, type, category) ORDER BY id), '[]'::json)
+           FROM degree),
+        (SELECT COALESCE(json_agg(json_build_array(id, degree_id, name, is_mandatory) ORDER BY id), '[]'::json)
+           FROM course)
+""")
+
+# Come sopra, per i database senza la migrazione 02_catalog_version.sql
+CATALOG_SNAPSHOT_UNVERSIONED = Statement("catalog_snapshot_unversioned", (), """
+    SELECT
+        NULL::bigint,
+        (SELECT COALESCE(json_agg(json_build_array(id, name, type, category) ORDER BY id), '[]'::json)
+           FROM degree),
+        (SELECT COALESCE(json_agg(json_build_array(id, degree_id, name, is_mandatory) ORDER BY id), '[]'::json)
+           FROM course)
+""")
+
+CATALOG_VERSION = Statement("catalog_version", (), "SELECT version FROM catalog_version")
+
+# Riepilogo per la mail di iscrizione: corso di laurea, obbligatori e opzionale scelto.
+# Parte da una riga di parametri, così il nome dell'opzionale arriva anche se il
+# corso di laurea non esiste.
+ENROLLMENT_SUMMARY = Statement("enrollment_summary", ("text", "integer"), """
+    SELECT d.name,
+           d.type,
+           COALESCE(m.names, '[]'::json),
+           o.name
+      FROM (SELECT $1::text AS degree_id, $2::integer AS course_id) AS p
+      LEFT JOIN degree AS d ON d.id = p.degree_id
+      LEFT JOIN LATERAL (
+            SELECT json_agg(c.name ORDER BY c.id) AS names
+              FROM course AS c
+             WHERE c.degree_id = p.degree_id AND c.is_mandatory
+           ) AS m ON TRUE
+      LEFT JOIN course AS o ON o.id = p.course_id
+""")
+
+
+# connessione -> nomi dei prepared statement già creati su quella sessione
+_prepared: "weakref.WeakKeyDictionary[Any, Set[str]]" = weakref.WeakKeyDictionary()
+
+
+def prepared_statements(conn: Any) -> Set[str]:
+    return _prepared.setdefault(conn, set())
+
+
+def execute(cur: Any, statement: Statement, params: Sequence[Any] = ()) -> None:
+    '''
+    Esegue `statement` come prepared statement, preparandolo se è la prima
+    volta su questa connessione.
+    '''
+    known = prepared_statements(cur.connection)
+    if statement.name not in known:
+        types = f" ({', '.join(statement.param_types)})" if statement.param_types else ""
+        try:
+            cur.execute(f"PREPARE {statement.name}{types} AS {statement.sql}")
+        except Exception as e:
+            if getattr(e, "pgcode", None) == _DUPLICATE_STATEMENT:
+                # Preparato da un tentativo precedente non registrato: il prossimo turno userà EXECUTE
+                known.add(statement.name)
+            raise
+        known.add(statement.name)
+
+    if statement.param_types:
+        placeholders = ", ".join(["%s"] * len(statement.param_types))
+        query = f"EXECUTE {statement.name} ({placeholders})"
+    else:
+        query = f"EXECUTE {statement.name}"
+    try:
+        cur.execute(query, tuple(params))
+    except Exception as e:
+        if getattr(e, "pgcode", None) == _UNDEFINED_STATEMENT:
+            known.discard(statement.name)
+        raise
+
+
+def fetch_catalog(conn: Any) -> Tuple[Optional[int], List[list], List[list]]:
+    '''Versione, righe di degree e righe di course (ordinate per id).'''
+    cur = conn.cursor()
+    try:
+        try:
+            execute(cur, CATALOG_SNAPSHOT)
+        except Exception as e:
+            # DB senza migrazione 02_catalog_version.sql: si ricarica a intervalli
+            logger.warning(f"catalog_version not available: {e}")
+            conn.rollback()
+            execute(cur, CATALOG_SNAPSHOT_UNVERSIONED)
+        version, degrees, courses = cur.fetchone()
+    finally:
+        cur.close()
+    return version, degrees, courses
+
+
+def fetch_version(conn: Any) -> Optional[int]:
+    cur = conn.cursor()
+    try:
+        execute(cur, CATALOG_VERSION)
+        row = cur.fetchone()
+    finally:
+        cur.close()
+    return row[0] if row else None
+
+
+class EnrollmentSummary(NamedTuple):
+    degree_name: Optional[str]
+    degree_type: Optional[str]
+    mandatory_courses: List[str]
+    optional_course: Optional[str]
+
+
+def fetch_enrollment_summary(conn: Any, degree_id: Optional[str], course_id: Any) -> EnrollmentSummary:
+    '''Tutto ciò che serve alla mail di iscrizione, con una sola query.'''
+    try:
+        course_id = int(course_id) if course_id is not None else None
+    except (TypeError, ValueError):
+        course_id = None
+
+    cur = conn.cursor()
+    try:
+        execute(cur, ENROLLMENT_SUMMARY, (degree_id, course_id))
+        degree_name, degree_type, mandatory, optional = cur.fetchone()
+    finally:
+        cur.close()
+    return EnrollmentSummary(degree_name, degree_type, list(mandatory or []), optional)
@@ -0,0 +1,100 @@
+# Pulizia del markdown estratto da Crawl4AI.
+#
+# Le pagine del sito arrivano anche a centinaia di KB di markdown: invece di
+# sei `re.sub` non compilati sull'intero testo usiamo quattro pattern
+# precompilati (tag HTML; immagini e link insieme; righe vuote e separatori
+# insieme; spazi). Unire anche righe e spazi in un'unica alternativa è più
+# lento: il motore non può più cercare il prefisso letterale.
+# Con `max_chars` il testo viene pulito a blocchi e ci si ferma appena si è
+# raggiunto il budget, senza processare il resto della pagina.
+
+import re
+from typing import Iterator, Optional
+
+# Tag HTML residui
+_TAG_RE = re.compile(r"<[^>]+>")
+
+# Immagini dentro link (badge), immagini e link: dei link resta solo il testo.
+# Nella sostituzione `\1` vale "" per le alternative senza gruppo.
+_MARKUP_RE = re.compile(
+    r"\[!\[[^\]\n]*\]\([^)\n]*\)\]\([^)]*\)"   # [![alt](img)](url)
+    r"|!\[[^\]\n]*\]\([^)\n]*\)"               # ![alt](img)
+    r"|\[([^\]]+)\]\([^)]+\)"                  # [testo](url) -> testo
+)
+
+# Sequenze di righe vuote o di soli separatori (---, ===, ***, ___) -> una riga vuota
+_BLANK_LINES_RE = re.compile(r"\n(?:[^\S\n]*(?:[-=_*]{3,}[^\S\n]*)?\n)+")
+
+# Spazi multipli -> uno spazio (i tab sono già stati convertiti)
+_SPACES_RE = re.compile(r"  +")
+
+
+def _clean_block(text: str) -> str:
+    text = _TAG_RE.sub("", text)
+    text = _MARKUP_RE.sub(r"\1", text)
+    # I newline di contorno fanno riconoscere i separatori anche su prima e ultima riga
+    text = _BLANK_LINES_RE.sub("\n\n", "\n" + text + "\n")
+    text = _SPACES_RE.sub(" ", text.replace("\t", " "))
+    return text.strip()
+
+
+def _block_end(text: str, start: int, block_size: int) -> int:
+    '''Fine del blocco: ultima riga vuota nella finestra, altrimenti fine riga.'''
+    limit = start + block_size
+    if limit >= len(text):
+        return len(text)
+    for sep in ("\n\n", "\n"):
+        cut = text.rfind(sep, start, limit)
+        if cut > start:
+            return cut + len(sep)
+    # Riga lunghissima: non la spezziamo per non tagliare un link a metà
+    cut = text.find("\n", limit)
+    return len(text) if cut == -1 else cut + 1
+
+
+def iter_clean(text: str, block_size: int = 64 * 1024) -> Iterator[str]:
+    '''
+    Pulisce il testo a blocchi di circa `block_size` caratteri (divisi su
+    righe vuote) e restituisce i paragrafi puliti man mano, saltando quelli vuoti.
+    '''
+    pos = 0
+    n = len(text)
+    while pos < n:
+        end = _block_end(text, pos, block_size)
+        block = _clean_block(text[pos:end])
+        if block:
+            yield block
+        pos = end
+
+
+def clean_content(text: str, max_chars: Optional[int] = None, block_size: int = 64 * 1024) -> str:
+    '''
+    Pulisce il markdown: rimuove immagini, tag HTML e separatori, dei link tiene
+    solo il testo, compatta spazi e righe vuote.
+
+    :param text: markdown estratto dalla pagina
+    :param max_chars: lunghezza massima del risultato; raggiunta questa il
+        resto della pagina non viene nemmeno processato (None = nessun limite)
+    :param block_size: caratteri di input puliti per volta
+    '''
+    if not text:
+        return ""
+    if max_chars is None:
+        if len(text) <= block_size:
+            return _clean_block(text)
+    else:
+        # Blocchi proporzionati al budget: non puliamo 64 KB per tenerne 8
+        block_size = min(block_size, max(4096, 2 * max_chars))
+
+    parts = []
+    size = 0
+    for block in iter_clean(text, block_size):
+        parts.append(block)
+        size += len(block) + 2
+        if max_chars is not None and size >= max_chars:
+            break
+
+    result = "\n\n".join(parts)
+    if max_chars is not None and len(result) > max_chars:
+        result = result[:max_chars].rstrip()
+    return result
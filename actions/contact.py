@@ -0,0 +1,50 @@
+# Action di contatto: mail di prova all'indirizzo indicato dall'utente.
+
+from typing import Any, Text, Dict, List
+from rasa_sdk import Action, Tracker
+from rasa_sdk.executor import CollectingDispatcher
+from . import metrics
+from .outbox import get_outbox, smtp_configured
+
+@metrics.instrument
+class ActionSendEmail(Action):
+
+    '''Invia una mail con i dettagli di contatto dell'utente.'''
+
+    def name(self) -> Text:
+        return "action_send_email"
+
+    def run(self, dispatcher: CollectingDispatcher,
+            tracker: Tracker,
+            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+
+        user_email = tracker.get_slot("email")
+        
+        if not user_email:
+            dispatcher.utter_message(text="Non ho trovato la mail.")
+            return []
+
+        if not smtp_configured():
+            error_msg = "ERRORE CONFIGURAZIONE: Mancano le credenziali nel file .env"
+            print(error_msg)
+            dispatcher.utter_message(text="Errore interno: credenziali mancanti.")
+            return []
+
+        subject = "Nuovo contatto dal Bot Rasa"
+        body = f"Ciao! Questo è un messaggio automatico di prova inoltrato per conto di: {user_email}\n\nSe leggi questo, il bot funziona!"
+
+        try:
+            # La mail parte in background dall'outbox (connessione SMTP condivisa, retry)
+            with metrics.span("smtp_enqueue"):
+                message_id = get_outbox().enqueue(user_email, subject, body)
+            print(f"DEBUG: Mail {message_id} per {user_email} messa in coda")
+
+            # Conferma all'utente
+            dispatcher.utter_message(text=f"Perfetto! Ti sto inviando una mail di conferma a {user_email} (che sei tu <3).")
+
+        except Exception as e:
+            # Stampa l'errore esatto nel terminale Docker
+            print(f"ERRORE OUTBOX: {e}")
+            dispatcher.utter_message(text="C'è stato un problema tecnico nell'invio.")
+
+        return []
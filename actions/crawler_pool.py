@@ -0,0 +1,199 @@
+# Pool di browser headless per Crawl4AI.
+#
+# Aprire `AsyncWebCrawler` ad ogni richiesta significa avviare e chiudere un
+# Chromium completo (secondi di latenza e centinaia di MB). Qui teniamo invece
+# N crawler già avviati, prestati in esclusiva a una richiesta alla volta e
+# riciclati dopo K pagine o dopo un errore. Con CRAWLER_POOL_EAGER=0 (worker
+# che non leggono pagine, es. solo form) i browser partono solo al primo
+# `lease()`: il processo non carica Playwright né avvia Chromium all'avvio.
+
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+from . import lifecycle, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledCrawler:
+    def __init__(self, crawler: Any) -> None:
+        self.crawler = crawler
+        self.pages = 0
+
+
+async def _default_factory() -> Any:
+    from crawl4ai import AsyncWebCrawler
+
+    crawler = AsyncWebCrawler(verbose=False)
+    await crawler.start()
+    return crawler
+
+
+class CrawlerPool:
+    '''
+    Pool di crawler condiviso dall'action server.
+
+    :param size: numero massimo di browser vivi contemporaneamente
+    :param max_pages: pagine servite da un browser prima di essere riciclato
+    :param factory: coroutine che crea e avvia un crawler (default: AsyncWebCrawler)
+    :param acquire_timeout: secondi massimi di attesa per un crawler libero
+    '''
+
+    def __init__(self,
+                 size: int = 2,
+                 max_pages: int = 50,
+                 factory: Optional[Callable[[], Awaitable[Any]]] = None,
+                 acquire_timeout: float = 30.0) -> None:
+        self.size = size
+        self.max_pages = max_pages
+        self.acquire_timeout = acquire_timeout
+        self._factory = factory or _default_factory
+
+        self._idle: Optional[asyncio.Queue] = None
+        self._live = 0
+        self._closed = False
+        self._all: Set[_PooledCrawler] = set()
+        self._background: Set[asyncio.Task] = set()
+
+        self._stats = {"created": 0, "recycled": 0, "crashed": 0, "leases": 0, "start_failures": 0}
+
+    def _queue(self) -> asyncio.Queue:
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+        return self._idle
+
+    async def _create(self) -> _PooledCrawler:
+        # Lo slot (`_live`) è già stato riservato dal chiamante
+        try:
+            pooled = _PooledCrawler(await self._factory())
+        except Exception:
+            self._live -= 1
+            self._stats["start_failures"] += 1
+            raise
+        self._stats["created"] += 1
+        self._all.add(pooled)
+        return pooled
+
+    async def _destroy(self, pooled: _PooledCrawler) -> None:
+        if pooled not in self._all:
+            return
+        self._all.discard(pooled)
+        self._live -= 1
+        try:
+            await pooled.crawler.close()
+        except Exception as e:
+            logger.warning(f"Error closing crawler: {e}")
+
+    async def _replace(self, pooled: _PooledCrawler) -> None:
+        '''Chiude un browser e ne avvia uno nuovo in background, per tenere il pool caldo.'''
+        await self._destroy(pooled)
+        if self._closed or self._live >= self.size:
+            return
+        self._live += 1
+        try:
+            self._queue().put_nowait(await self._create())
+        except Exception as e:
+            logger.warning(f"Could not start replacement crawler: {e}")
+
+    async def start(self) -> None:
+        """Avvia subito tutti i browser del pool (warm-up)."""
+        queue = self._queue()
+        missing = self.size - self._live
+        self._live += missing
+        results = await asyncio.gather(*(self._create() for _ in range(missing)), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning(f"Crawler failed to start: {result}")
+            else:
+                queue.put_nowait(result)
+        logger.info(f"Crawler pool ready: {self._live}/{self.size} browsers")
+
+    async def _acquire(self) -> _PooledCrawler:
+        if self._closed:
+            raise RuntimeError("Crawler pool is closed")
+        queue = self._queue()
+        if queue.empty() and self._live < self.size:
+            self._live += 1
+            return await self._create()
+        return await asyncio.wait_for(queue.get(), timeout=self.acquire_timeout)
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[Any]:
+        '''
+        Presta un crawler in esclusiva per la durata del blocco `async with`.
+
+        Se il blocco solleva un'eccezione il browser viene considerato guasto
+        e sostituito; dopo `max_pages` pagine viene comunque riciclato.
+        '''
+        pooled = await self._acquire()
+        self._stats["leases"] += 1
+        crashed = False
+        try:
+            yield pooled.crawler
+        except Exception:
+            crashed = True
+            raise
+        finally:
+            pooled.pages += 1
+            if crashed or self._closed or pooled.pages >= self.max_pages:
+                self._stats["crashed" if crashed else "recycled"] += 1
+                task = asyncio.ensure_future(self._replace(pooled))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+            else:
+                self._queue().put_nowait(pooled)
+
+    async def close(self) -> None:
+        """Chiude tutti i browser (anche quelli in uso) e attende le sostituzioni in corso."""
+        self._closed = True
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        for pooled in list(self._all):
+            await self._destroy(pooled)
+        self._idle = None
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self._stats)
+        stats["size"] = self.size
+        stats["live"] = self._live
+        stats["idle"] = self._idle.qsize() if self._idle is not None else 0
+        return stats
+
+
+_pool: Optional[CrawlerPool] = None
+
+
+def get_crawler_pool() -> CrawlerPool:
+    '''
+    Pool condiviso dal processo: CRAWLER_POOL_SIZE browser, riciclati ogni
+    CRAWLER_MAX_PAGES pagine.
+    '''
+    global _pool
+    if _pool is None:
+        _pool = CrawlerPool(
+            size=int(os.getenv("CRAWLER_POOL_SIZE", 2)),
+            max_pages=int(os.getenv("CRAWLER_MAX_PAGES", 50)),
+            acquire_timeout=float(os.getenv("CRAWLER_ACQUIRE_TIMEOUT", 30)),
+        )
+    return _pool
+
+
+@lifecycle.on_startup
+async def start_crawler_pool() -> None:
+    # Pool pigro: il primo crawl del worker paga l'avvio del browser
+    if os.getenv("CRAWLER_POOL_EAGER", "1") != "0":
+        await get_crawler_pool().start()
+
+
+@lifecycle.on_shutdown
+async def close_crawler_pool() -> None:
+    if _pool is not None:
+        await _pool.close()
+
+
+@metrics.collector("crawler_pool", counters=("created", "recycled", "crashed", "leases", "start_failures"))
+def crawler_pool_metrics() -> Optional[Dict[str, Any]]:
+    return _pool.stats() if _pool is not None else None
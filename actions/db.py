@@ -0,0 +1,294 @@
+# Pool di connessioni PostgreSQL condiviso dall'action server.
+#
+# Ogni action che tocca il catalogo (degree/course) prende in prestito una
+# connessione già autenticata invece di aprire una nuova sessione TCP + auth
+# ad ogni validazione di slot.
+
+import os
+import time
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Nessuna connessione libera entro il tempo massimo di attesa."""
+
+
+class _PooledConnection:
+    """Connessione fisica più i metadati usati per health check e riciclo."""
+
+    def __init__(self, conn: Any) -> None:
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+    def age(self) -> float:
+        return time.monotonic() - self.created_at
+
+    def idle_for(self) -> float:
+        return time.monotonic() - self.last_used
+
+
+class ConnectionPool:
+    '''
+    Pool limitato e thread-safe di connessioni DB.
+
+    - al massimo `max_size` connessioni aperte contemporaneamente;
+    - le connessioni più vecchie di `max_lifetime` secondi vengono chiuse e ricreate;
+    - le connessioni inattive da più di `health_check_after` secondi vengono
+      verificate con un `SELECT 1` prima di essere restituite;
+    - `stats()` espone occupazione e tempi di attesa del pool.
+    '''
+
+    def __init__(self,
+                 connect: Callable[[], Any],
+                 min_size: int = 1,
+                 max_size: int = 10,
+                 max_lifetime: float = 1800.0,
+                 acquire_timeout: float = 10.0,
+                 health_check_after: float = 30.0) -> None:
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Invalid pool size: require 0 <= min_size <= max_size and max_size >= 1")
+
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.acquire_timeout = acquire_timeout
+        self.health_check_after = health_check_after
+
+        self._idle: List[_PooledConnection] = []
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        # Statistiche
+        self._created = 0
+        self._recycled = 0
+        self._failed_checks = 0
+        self._acquired = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    # --- Gestione connessioni fisiche -------------------------------------
+
+    def _open(self) -> _PooledConnection:
+        conn = self._connect()
+        with self._cond:
+            self._created += 1
+        return _PooledConnection(conn)
+
+    def _discard(self, pooled: _PooledConnection) -> None:
+        try:
+            pooled.conn.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled connection: {e}")
+
+    def _is_healthy(self, pooled: _PooledConnection) -> bool:
+        if pooled.conn.closed:
+            return False
+        if pooled.idle_for() < self.health_check_after:
+            return True
+        try:
+            cur = pooled.conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchone()
+            cur.close()
+            pooled.conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"DB pool health check failed: {e}")
+            return False
+
+    def open(self) -> None:
+        """Apre subito `min_size` connessioni (warm-up del pool)."""
+        while True:
+            with self._cond:
+                if self._closed or len(self._idle) + self._in_use >= self.min_size:
+                    return
+            pooled = self._open()
+            with self._cond:
+                self._idle.append(pooled)
+
+    # --- Checkout / checkin -----------------------------------------------
+
+    def _acquire(self) -> _PooledConnection:
+        start = time.monotonic()
+        deadline = start + self.acquire_timeout
+        waited = False
+
+        while True:
+            pooled = None
+            must_open = False
+
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Connection pool is closed")
+                    if self._idle:
+                        pooled = self._idle.pop()
+                        self._in_use += 1
+                        break
+                    if self._in_use < self.max_size:
+                        # Riserviamo lo slot prima di connetterci (fuori dal lock)
+                        self._in_use += 1
+                        must_open = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"No database connection available after {self.acquire_timeout:.1f}s "
+                            f"(max_size={self.max_size})"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+
+            # I/O di rete (connect / health check) senza tenere il lock
+            if must_open:
+                try:
+                    pooled = self._open()
+                except Exception:
+                    self._give_back_slot()
+                    raise
+            elif pooled.age() > self.max_lifetime:
+                self._discard(pooled)
+                self._give_back_slot(recycled=True)
+                continue
+            elif not self._is_healthy(pooled):
+                self._discard(pooled)
+                self._give_back_slot(failed_check=True)
+                continue
+
+            with self._cond:
+                wait_time = time.monotonic() - start
+                self._acquired += 1
+                if waited:
+                    self._waits += 1
+                self._wait_time_total += wait_time
+                self._wait_time_max = max(self._wait_time_max, wait_time)
+            return pooled
+
+    def _give_back_slot(self, recycled: bool = False, failed_check: bool = False) -> None:
+        with self._cond:
+            self._in_use -= 1
+            self._recycled += recycled
+            self._failed_checks += failed_check
+            self._cond.notify()
+
+    def _release(self, pooled: _PooledConnection, broken: bool = False) -> None:
+        with self._cond:
+            self._in_use -= 1
+            if broken or self._closed or pooled.conn.closed:
+                self._discard(pooled)
+            elif pooled.age() > self.max_lifetime:
+                self._recycled += 1
+                self._discard(pooled)
+            else:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        '''
+        Presta una connessione per la durata del blocco `with`.
+
+        A fine blocco la transazione viene confermata (o annullata in caso di
+        eccezione) e la connessione torna nel pool.
+        '''
+        pooled = self._acquire()
+        broken = False
+        try:
+            yield pooled.conn
+            pooled.conn.commit()
+        except Exception:
+            try:
+                pooled.conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self._release(pooled, broken=broken or bool(pooled.conn.closed))
+
+    # --- Chiusura e statistiche -------------------------------------------
+
+    def close(self) -> None:
+        """Chiude tutte le connessioni inattive e rifiuta nuovi checkout."""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.pop())
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "size": self._in_use + len(self._idle),
+                "created": self._created,
+                "recycled": self._recycled,
+                "failed_health_checks": self._failed_checks,
+                "acquired": self._acquired,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "wait_time_total": self._wait_time_total,
+                "wait_time_max": self._wait_time_max,
+            }
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def connect() -> Any:
+    """Apre una nuova connessione fisica (fuori dal pool) con la configurazione da env."""
+    import psycopg2
+
+    return psycopg2.connect(
+        host=os.getenv("POSTGRES_HOST", "db"),
+        port=int(os.getenv("POSTGRES_PORT", 5432)),
+        database=os.getenv("POSTGRES_DB", "mydb"),
+        user=os.getenv("POSTGRES_USER", "postgres"),
+        password=os.getenv("POSTGRES_PASSWORD", "supersecret"),
+        connect_timeout=int(os.getenv("DB_CONNECT_TIMEOUT", 5)),
+    )
+
+
+def get_pool() -> ConnectionPool:
+    '''
+    Restituisce il pool condiviso del processo, creandolo al primo utilizzo.
+
+    Configurazione tramite variabili d'ambiente (vedi `.env.example`).
+    '''
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    connect=connect,
+                    min_size=int(os.getenv("DB_POOL_MIN_SIZE", 1)),
+                    max_size=int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+                    max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", 1800)),
+                    acquire_timeout=float(os.getenv("DB_POOL_TIMEOUT", 10)),
+                    health_check_after=float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", 30)),
+                )
+                atexit.register(_pool.close)
+    return _pool
+
+
+@metrics.collector("db_pool", counters=("created", "recycled", "failed_health_checks", "acquired", "waits",
+                                       "timeouts", "wait_time_total"))
+def pool_metrics() -> Optional[Dict[str, Any]]:
+    return _pool.stats() if _pool is not None else None
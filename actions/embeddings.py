@@ -0,0 +1,373 @@
+# Indice semantico (embedding) sui chunk di tutte le pagine UnivPM.
+#
+# URL_MAP riconosce solo le parole chiave previste: una domanda riformulata
+# ("quanto si paga per studiare?") finisce sulla pagina generica. Qui i chunk
+# di tutte le pagine vengono trasformati in vettori una sola volta, salvati in
+# una matrice NumPy (.npy, letta con mmap) e interrogati con un unico prodotto
+# matrice-vettore: la similarità coseno con ogni chunk di ogni pagina costa
+# meno di un millisecondo. Il vettore di ogni domanda (normalizzata) resta in
+# cache, così le domande ripetute non richiamano il modello di embedding.
+# La ricerca usa solo l'indice salvato: le pagine vengono lette dopo, e solo
+# quelle dei chunk trovati. Ogni pagina scaricata aggiorna le proprie righe.
+#
+# Gli embedding vengono da Ollama (/api/embed, EMBEDDINGS_MODEL) oppure, con
+# EMBEDDINGS_MODEL=hashing, da un embedder locale deterministico basato sulle
+# parole (per i test e per usarlo senza un modello di embedding).
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from . import metrics
+from .answer_cache import normalize_question
+from .page_cache import CachedPage
+from .retrieval import page_index, tokenize
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class Hit(NamedTuple):
+    score: float
+    url: str
+    chunk_index: int
+    start: int
+    end: int
+
+
+def normalize_rows(vectors: "np.ndarray") -> "np.ndarray":
+    '''Vettori di norma 1 (float32), così la similarità coseno è un prodotto scalare.'''
+    import numpy as np
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class HashingEmbedder:
+    '''
+    Embedder locale e deterministico: parole e coppie di parole vengono
+    proiettate in `dim` dimensioni con un hash stabile (feature hashing).
+    Non capisce i sinonimi, ma non richiede modelli né rete.
+    '''
+
+    def __init__(self, dim: int = 384) -> None:
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> Iterable[str]:
+        words = tokenize(text)
+        yield from words
+        yield from (f"{a} {b}" for a, b in zip(words, words[1:]))
+
+    def embed_one(self, text: str) -> "np.ndarray":
+        import numpy as np
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dim] += 1.0 if (value >> 63) & 1 else -1.0
+        return vector
+
+    async def embed(self, texts: List[str]) -> "np.ndarray":
+        import numpy as np
+
+        return np.stack([self.embed_one(t) for t in texts]) if texts else np.zeros((0, self.dim), np.float32)
+
+
+class OllamaEmbedder:
+    '''
+    Embedding dal server Ollama, in lotti di `batch_size` testi.
+
+    :param client: OllamaClient condiviso (vedi actions/llm.py)
+    :param model: modello di embedding (es. "nomic-embed-text")
+    '''
+
+    def __init__(self, client: Any, model: str, batch_size: int = 32) -> None:
+        self.client = client
+        self.model = model
+        self.batch_size = batch_size
+        self.name = f"ollama-{model}"
+
+    async def embed(self, texts: List[str]) -> "np.ndarray":
+        import numpy as np
+
+        rows: List[List[float]] = []
+        for i in range(0, len(texts), self.batch_size):
+            rows.extend(await self.client.embed(texts[i:i + self.batch_size], model=self.model))
+        return np.asarray(rows, dtype=np.float32)
+
+
+class EmbeddingIndex:
+    '''
+    Matrice dei vettori dei chunk (una riga per chunk, norma 1) con, per ogni
+    riga, pagina e posizione del chunk.
+
+    :param pages: URL -> hash del contenuto indicizzato (per capire se è ancora valido)
+    '''
+
+    VECTORS = "vectors.npy"
+    META = "index.json"
+
+    def __init__(self, vectors: "np.ndarray", rows: List[Tuple[str, int, int, int]],
+                 model: str, pages: Dict[str, str]) -> None:
+        if len(vectors) != len(rows):
+            raise ValueError(f"{len(vectors)} vectors for {len(rows)} rows")
+        self.vectors = vectors
+        self.rows = rows
+        self.model = model
+        self.pages = pages
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def search(self, query: "np.ndarray", k: int = 4) -> List[Hit]:
+        '''I `k` chunk più simili al vettore della domanda (già normalizzato), dal più simile.'''
+        import numpy as np
+
+        if not self.rows or k <= 0:
+            return []
+        scores = self.vectors @ query
+        if k < len(scores):
+            top = np.argpartition(scores, -k)[-k:]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(scores[top])[::-1]]
+        return [Hit(float(scores[i]), *self.rows[i]) for i in top]
+
+    def page_rows(self, url: str, content_hash: str) -> Optional["np.ndarray"]:
+        '''Righe della pagina, se indicizzata con lo stesso contenuto.'''
+        import numpy as np
+
+        if self.pages.get(url) != content_hash:
+            return None
+        return np.array([i for i, row in enumerate(self.rows) if row[0] == url], dtype=np.int64)
+
+    def save(self, directory: str) -> None:
+        '''Scrittura atomica: prima la matrice, poi i metadati che la descrivono.'''
+        import numpy as np
+
+        os.makedirs(directory, exist_ok=True)
+        vectors_path = os.path.join(directory, self.VECTORS)
+        with open(f"{vectors_path}.tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(self.vectors, dtype=np.float32))
+        os.replace(f"{vectors_path}.tmp", vectors_path)
+
+        meta_path = os.path.join(directory, self.META)
+        meta = {"model": self.model, "pages": self.pages, "rows": self.rows}
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["EmbeddingIndex"]:
+        '''Indice salvato (matrice in memoria mappata, condivisa tra i processi) o None.'''
+        import numpy as np
+
+        try:
+            with open(os.path.join(directory, cls.META), encoding="utf-8") as f:
+                meta = json.load(f)
+            vectors = np.load(os.path.join(directory, cls.VECTORS), mmap_mode="r")
+            return cls(vectors, [tuple(row) for row in meta["rows"]], meta["model"], meta["pages"])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Embedding index in {directory} not usable: {e}")
+            return None
+
+
+class SemanticSearch:
+    '''
+    Ricerca semantica su tutte le pagine: mantiene l'indice allineato al
+    contenuto delle pagine (ricalcolando solo quelle cambiate) e tiene in
+    cache i vettori delle domande.
+
+    :param directory: cartella dove salvare l'indice (None = solo in memoria)
+    :param query_cache_size: domande normalizzate di cui ricordare il vettore
+    :param query_timeout: secondi massimi per l'embedding di una domanda (None = nessun limite)
+    '''
+
+    def __init__(self, embedder: Any, directory: Optional[str] = None, query_cache_size: int = 512,
+                 query_timeout: Optional[float] = 5.0) -> None:
+        self.embedder = embedder
+        self.directory = directory
+        self.query_cache_size = query_cache_size
+        self.query_timeout = query_timeout
+        self.index: Optional[EmbeddingIndex] = None
+        self._queries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._loaded = False
+        self._stats = {"builds": 0, "embedded_chunks": 0, "reused_chunks": 0,
+                       "searches": 0, "query_hits": 0, "query_misses": 0}
+
+    def _load_saved(self) -> None:
+        if not self._loaded and self.directory:
+            self._loaded = True
+            self.index = EmbeddingIndex.load(self.directory)
+
+    def _usable(self) -> Optional[EmbeddingIndex]:
+        '''Indice corrente, se calcolato con l'embedder in uso.'''
+        self._load_saved()
+        index = self.index
+        return index if index is not None and index.model == self.embedder.name else None
+
+    def _current(self, pages: List[CachedPage]) -> bool:
+        index = self.index
+        return (index is not None and index.model == self.embedder.name
+                and index.pages == {p.url: p.content_hash for p in pages})
+
+    async def ensure(self, pages: List[CachedPage]) -> EmbeddingIndex:
+        '''Indice delle pagine date, riusato se già aggiornato, altrimenti ricostruito.'''
+        if self._current(pages):
+            return self.index
+        async with self._lock:
+            self._load_saved()
+            if self._current(pages):
+                return self.index
+            self.index = await self._build(pages)
+            if self.directory:
+                self.index.save(self.directory)
+            return self.index
+
+    async def _build(self, pages: List[CachedPage]) -> EmbeddingIndex:
+        import numpy as np
+
+        started = time.perf_counter()
+        previous = self.index if self.index is not None and self.index.model == self.embedder.name else None
+        blocks: List["np.ndarray"] = []
+        rows: List[Tuple[str, int, int, int]] = []
+        for page in pages:
+            chunks = page_index(page).chunks
+            page_rows = [(page.url, c.index, c.start, c.end) for c in chunks]
+            reused = previous.page_rows(page.url, page.content_hash) if previous is not None else None
+            if reused is not None and len(reused) == len(chunks):
+                # Pagina invariata: vettori copiati dall'indice precedente
+                blocks.append(np.asarray(previous.vectors[reused]))
+                self._stats["reused_chunks"] += len(chunks)
+            elif chunks:
+                blocks.append(normalize_rows(await self.embedder.embed([c.text for c in chunks])))
+                self._stats["embedded_chunks"] += len(chunks)
+            rows.extend(page_rows)
+
+        vectors = np.concatenate(blocks) if blocks else np.zeros((0, 0), np.float32)
+        self._stats["builds"] += 1
+        logger.info(f"Embedding index built: {len(rows)} chunks from {len(pages)} pages "
+                    f"in {time.perf_counter() - started:.2f}s")
+        return EmbeddingIndex(vectors, rows, self.embedder.name, {p.url: p.content_hash for p in pages})
+
+    async def embed_query(self, question: str) -> "np.ndarray":
+        key = normalize_question(question)
+        vector = self._queries.get(key)
+        if vector is not None:
+            self._queries.move_to_end(key)
+            self._stats["query_hits"] += 1
+            return vector
+        self._stats["query_misses"] += 1
+        # La domanda aspetta l'embedding: meglio rinunciare presto (asyncio.TimeoutError)
+        # e usare la pagina generale che far attendere l'utente
+        vector = normalize_rows(await asyncio.wait_for(self.embedder.embed([key]), self.query_timeout))[0]
+        self._queries[key] = vector
+        if len(self._queries) > self.query_cache_size:
+            self._queries.popitem(last=False)
+        return vector
+
+    async def search(self, pages: List[CachedPage], question: str, k: int = 4) -> List[Hit]:
+        '''Chunk più simili alla domanda tra le pagine date (indice aggiornato se serve).'''
+        index = await self.ensure(pages)
+        query = await self.embed_query(question)
+        self._stats["searches"] += 1
+        return index.search(query, k)
+
+    async def search_index(self, question: str, k: int = 4) -> List[Hit]:
+        '''
+        Chunk più simili alla domanda nell'indice già costruito (o salvato su
+        disco), senza leggere le pagine. Lista vuota se l'indice non c'è ancora.
+        '''
+        index = self._usable()
+        if index is None or not len(index):
+            return []
+        query = await self.embed_query(question)
+        self._stats["searches"] += 1
+        return index.search(query, k)
+
+    def indexed_hash(self, url: str) -> Optional[str]:
+        '''Hash del contenuto della pagina com'era quando è stata indicizzata.'''
+        return self.index.pages.get(url) if self.index is not None else None
+
+    async def update_page(self, page: CachedPage) -> EmbeddingIndex:
+        '''Aggiorna nell'indice le sole righe della pagina, lasciando le altre com'erano.'''
+        import numpy as np
+
+        async with self._lock:
+            index = self._usable()
+            if index is not None and index.pages.get(page.url) == page.content_hash:
+                return index
+            chunks = page_index(page).chunks
+            blocks: List["np.ndarray"] = []
+            rows: List[Tuple[str, int, int, int]] = []
+            pages: Dict[str, str] = {}
+            if index is not None:
+                keep = [i for i, row in enumerate(index.rows) if row[0] != page.url]
+                if keep:
+                    blocks.append(np.asarray(index.vectors[keep]))
+                rows = [index.rows[i] for i in keep]
+                pages = {url: h for url, h in index.pages.items() if url != page.url}
+            if chunks:
+                blocks.append(normalize_rows(await self.embedder.embed([c.text for c in chunks])))
+                self._stats["embedded_chunks"] += len(chunks)
+            rows.extend((page.url, c.index, c.start, c.end) for c in chunks)
+            pages[page.url] = page.content_hash
+
+            vectors = np.concatenate(blocks) if blocks else np.zeros((0, 0), np.float32)
+            self.index = EmbeddingIndex(vectors, rows, self.embedder.name, pages)
+            if self.directory:
+                self.index.save(self.directory)
+            return self.index
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self._stats)
+        stats["chunks"] = len(self.index) if self.index is not None else 0
+        stats["query_cache_size"] = len(self._queries)
+        return stats
+
+
+_search: Optional[SemanticSearch] = None
+
+
+def get_semantic_search() -> Optional[SemanticSearch]:
+    '''
+    Ricerca semantica configurata da EMBEDDINGS_MODEL ("" = disattivata,
+    "hashing" = embedder locale, altrimenti un modello di Ollama),
+    EMBEDDINGS_DIR, EMBEDDINGS_QUERY_CACHE ed EMBEDDINGS_QUERY_TIMEOUT.
+    '''
+    global _search
+    model = os.getenv("EMBEDDINGS_MODEL", "")
+    if not model:
+        return None
+    if _search is None:
+        if model == "hashing":
+            embedder: Any = HashingEmbedder()
+        else:
+            from .llm import get_ollama_client
+            embedder = OllamaEmbedder(get_ollama_client(), model)
+        _search = SemanticSearch(
+            embedder,
+            directory=os.getenv("EMBEDDINGS_DIR", os.path.join(".cache", "embeddings")) or None,
+            query_cache_size=int(os.getenv("EMBEDDINGS_QUERY_CACHE", 512)),
+            query_timeout=float(os.getenv("EMBEDDINGS_QUERY_TIMEOUT", 5)) or None,
+        )
+    return _search
+
+
+@metrics.collector("embeddings", counters=("builds", "embedded_chunks", "reused_chunks", "searches",
+                                          "query_hits", "query_misses"))
+def embeddings_metrics() -> Optional[Dict[str, Any]]:
+    return _search.stats() if _search is not None else None
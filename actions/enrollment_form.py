@@ -0,0 +1,431 @@
+# Form di iscrizione: scelta di area, tipo e corso di laurea dal catalogo,
+# validazione degli slot, salvataggio del riepilogo e mail di conferma.
+
+import re
+from typing import Any, Text, Dict, List
+from rasa_sdk import Action, Tracker, FormValidationAction
+from rasa_sdk.executor import CollectingDispatcher
+from rasa_sdk.types import DomainDict
+from . import metrics
+from .db import get_pool
+from .catalog import get_catalog
+from .catalog_queries import fetch_enrollment_summary
+from .enrollments import get_enrollment_writer
+from .outbox import get_outbox, smtp_configured
+from .matcher import Matcher
+
+@metrics.instrument
+class ActionAskDegreeId(Action):
+    def name(self) -> Text:
+        return "action_ask_degree_id"
+
+    def run(self, dispatcher: CollectingDispatcher,
+            tracker: Tracker,
+            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+
+        degree_field = tracker.get_slot("degree_field")
+        degree_type = tracker.get_slot("degree_type")
+        lang = tracker.get_slot("language")
+        
+        if not degree_field:
+            msg = "Please select a degree field first." if lang != "it" else "Per favore seleziona prima un'area di studio."
+            dispatcher.utter_message(text=msg)
+            return []
+        
+        if not degree_type:
+            msg = "Please select a degree type first." if lang != "it" else "Per favore seleziona prima il tipo di laurea."
+            dispatcher.utter_message(text=msg)
+            return []
+
+        try:
+            # Lauree del field e type selezionati (dal catalogo in memoria)
+            with metrics.span("catalog"):
+                degrees = get_catalog().degrees_for(degree_field, degree_type)
+
+            if not degrees:
+                msg = f"No degrees found for field '{degree_field}' and type '{degree_type}'." if lang != "it" else f"Nessun corso di laurea trovato per l'area '{degree_field}' e tipo '{degree_type}'."
+                dispatcher.utter_message(text=msg)
+                return []
+
+            # Costruisci il messaggio con la lista
+            if lang == "it":
+                message = f"Ecco i corsi di laurea disponibili per {degree_field} ({degree_type}). Scrivi l'ID per sceglierne uno:\n"
+            else:
+                message = f"Here are the available degrees for {degree_field} ({degree_type}). Type the ID to choose one:\n"
+
+            for d in degrees:
+                message += f"- [{d.id}] {d.name}\n"
+
+            dispatcher.utter_message(text=message)
+
+        except Exception as e:
+            print(f"DB ERROR: {e}")
+            msg = "I cannot access the database right now." if lang != "it" else "Non riesco ad accedere al database al momento."
+            dispatcher.utter_message(text=msg)
+
+        return []
+
+
+@metrics.instrument
+class ActionAskSelectedCourses(Action):
+    """Mostra i corsi obbligatori e fa scegliere un corso opzionale."""
+    
+    def name(self) -> Text:
+        return "action_ask_selected_courses"
+
+    def run(self, dispatcher: CollectingDispatcher,
+            tracker: Tracker,
+            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+
+        degree_id = tracker.get_slot("degree_id")
+        lang = tracker.get_slot("language")
+        
+        if not degree_id:
+            msg = "Please select a degree first." if lang != "it" else "Per favore seleziona prima un corso di laurea."
+            dispatcher.utter_message(text=msg)
+            return []
+
+        try:
+            with metrics.span("catalog"):
+                catalog = get_catalog()
+
+            # Nome della laurea
+            degree = catalog.degree(degree_id)
+            degree_name = degree.name if degree else degree_id
+
+            # Corsi obbligatori e opzionali
+            mandatory_courses = catalog.courses_for(degree_id, mandatory=True)
+            optional_courses = catalog.courses_for(degree_id, mandatory=False)
+
+            # Costruisci il messaggio
+            if lang == "it":
+                message = f"📚 **{degree_name}**\n\n"
+                message += "📋 **Corsi Obbligatori** (inclusi automaticamente):\n"
+            else:
+                message = f"📚 **{degree_name}**\n\n"
+                message += "📋 **Mandatory Courses** (automatically included):\n"
+
+            for course in mandatory_courses:
+                message += f"  ✅ {course.name}\n"
+
+            if optional_courses:
+                if lang == "it":
+                    message += "\n🎯 **Corsi Opzionali** - Scegli uno scrivendo il numero:\n"
+                else:
+                    message += "\n🎯 **Optional Courses** - Choose one by typing the number:\n"
+                
+                for course in optional_courses:
+                    message += f"  [{course.id}] {course.name}\n"
+            else:
+                if lang == "it":
+                    message += "\n(Nessun corso opzionale disponibile)"
+                else:
+                    message += "\n(No optional courses available)"
+
+            dispatcher.utter_message(text=message)
+
+        except Exception as e:
+            print(f"DB ERROR: {e}")
+            msg = "I cannot access the database right now." if lang != "it" else "Non riesco ad accedere al database al momento."
+            dispatcher.utter_message(text=msg)
+
+        return []
+
+        return []
+
+
+@metrics.instrument
+class ValidateEnrollmentForm(FormValidationAction):
+    # Valid fields from DB Enum (Note: 'Enginering' has a typo in DB)
+    VALID_FIELDS = ['Enginering', 'Economics', 'Medicine', 'Science', 'Agriculture']
+
+    # Mapping for user input to DB values (costruiti una volta all'avvio)
+    DEGREE_FIELDS = Matcher({
+        "Ingegneria": "Enginering",
+        "Engineering": "Enginering",
+        "Enginering": "Enginering",
+        "Economia": "Economics",
+        "Economics": "Economics",
+        "Medicina": "Medicine",
+        "Medicine": "Medicine",
+        "Scienze": "Science",
+        "Science": "Science",
+        "Agraria": "Agriculture",
+        "Agriculture": "Agriculture",
+    })
+
+    _BACHELOR_KEYWORDS = [
+        "bachelor", "bachelors", "bachelor's", "bachelor's degree",
+        "undergraduate", "undergrad", "3-year", "three year", "3 year",
+        "first cycle", "triennale", "laurea triennale", "l1", "1st cycle"
+    ]
+    _MASTER_KEYWORDS = [
+        "master", "masters", "master's", "master's degree",
+        "graduate", "postgraduate", "post-graduate", "2-year", "two year", "2 year",
+        "second cycle", "magistrale", "laurea magistrale", "lm", "2nd cycle"
+    ]
+    _SINGLE_CYCLE_KEYWORDS = [
+        "single cycle", "single-cycle", "singlecycle", "single-cycle degree",
+        "5-year", "five year", "5 year", "6-year", "six year", "6 year",
+        "combined", "long cycle", "integrated", "ciclo unico", "laurea a ciclo unico",
+        "medicine single cycle", "lcu"
+    ]
+    DEGREE_TYPES = Matcher({
+        **{kw: "Bachelor's Degree" for kw in _BACHELOR_KEYWORDS},
+        **{kw: "Master's Degree" for kw in _MASTER_KEYWORDS},
+        **{kw: "Single-Cycle Degree" for kw in _SINGLE_CYCLE_KEYWORDS},
+    })
+
+    def name(self) -> Text:
+        return "validate_enrollment_form"
+
+    def validate_degree_field(
+        self,
+        slot_value: Any,
+        dispatcher: CollectingDispatcher,
+        tracker: Tracker,
+        domain: DomainDict,
+    ) -> Dict[Text, Any]:
+        """Validate `degree_field` value."""
+        match = self.DEGREE_FIELDS.match(slot_value)
+        if match is not None:
+            return {"degree_field": match.value}
+        
+        # Se non valido
+        lang = tracker.get_slot("language")
+        msg = f"'{slot_value}' is not a valid field. Please choose from: {', '.join(self.VALID_FIELDS)}"
+        if lang == "it":
+            msg = f"'{slot_value}' non è un'area valida. Scegli tra: {', '.join(self.VALID_FIELDS)}"
+            
+        dispatcher.utter_message(text=msg)
+        return {"degree_field": None}
+
+    def validate_degree_type(
+        self,
+        slot_value: Any,
+        dispatcher: CollectingDispatcher,
+        tracker: Tracker,
+        domain: DomainDict,
+    ) -> Dict[Text, Any]:
+        """Validate `degree_type` value and map user input to DB values."""
+        match = self.DEGREE_TYPES.match(slot_value)
+        if match is not None:
+            return {"degree_type": match.value}
+        
+        # Invalid input
+        lang = tracker.get_slot("language")
+        msg = f"'{slot_value}' is not a valid degree type. Please choose: Bachelor's Degree, Master's Degree, or Single-Cycle Degree."
+        if lang == "it":
+            msg = f"'{slot_value}' non è un tipo di laurea valido. Scegli tra: Laurea Triennale (Bachelor's), Laurea Magistrale (Master's), o Ciclo Unico (Single-Cycle)."
+            
+        dispatcher.utter_message(text=msg)
+        return {"degree_type": None}
+
+    def validate_degree_id(
+        self,
+        slot_value: Any,
+        dispatcher: CollectingDispatcher,
+        tracker: Tracker,
+        domain: DomainDict,
+    ) -> Dict[Text, Any]:
+        """Validate `degree_id` value against DB."""
+        degree_field = tracker.get_slot("degree_field")
+        degree_type = tracker.get_slot("degree_type")
+        
+        if not degree_field:
+            return {"degree_id": None} # Should not happen if flow is correct
+        if not degree_type:
+            return {"degree_id": None} # Should not happen if flow is correct
+
+        try:
+            # Id esatto o nome non ambiguo, tra i corsi dell'area e del tipo scelti
+            with metrics.span("catalog"):
+                match = get_catalog().match_degree(str(slot_value), degree_field, degree_type)
+
+            if match.degree:
+                # Valid ID
+                return {"degree_id": match.degree.id}
+
+            lang = tracker.get_slot("language")
+            if match.candidates:
+                msg = f"'{slot_value}' matches more than one degree. Please type the ID of the one you want:\n"
+                if lang == "it":
+                    msg = f"'{slot_value}' corrisponde a più corsi di laurea. Scrivi l'ID di quello che ti interessa:\n"
+                msg += "".join(f"- [{d.id}] {d.name}\n" for d in match.candidates)
+            else:
+                msg = f"ID '{slot_value}' not found for field '{degree_field}' ({degree_type}). Please try again."
+                if lang == "it":
+                    msg = f"ID '{slot_value}' non trovato per l'area '{degree_field}' ({degree_type}). Riprova."
+            dispatcher.utter_message(text=msg)
+            return {"degree_id": None}
+
+        except Exception as e:
+            print(f"DB ERROR: {e}")
+            return {"degree_id": None}
+
+    def validate_email(
+        self,
+        slot_value: Any,
+        dispatcher: CollectingDispatcher,
+        tracker: Tracker,
+        domain: DomainDict,
+    ) -> Dict[Text, Any]:
+        """Validate `email` value."""
+        # Simple regex for email validation
+        email_regex = r"(^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$)"
+        
+        if re.match(email_regex, slot_value):
+            return {"email": slot_value}
+        else:
+            lang = tracker.get_slot("language")
+            msg = "That doesn't look like a valid email. Please try again."
+            if lang == "it":
+                msg = "Non sembra un'email valida. Riprova per favore."
+            dispatcher.utter_message(text=msg)
+            return {"email": None}
+
+    def validate_selected_courses(
+        self,
+        slot_value: Any,
+        dispatcher: CollectingDispatcher,
+        tracker: Tracker,
+        domain: DomainDict,
+    ) -> Dict[Text, Any]:
+        """Validate `selected_courses` value - deve essere un ID di corso opzionale valido."""
+        
+        degree_id = tracker.get_slot("degree_id")
+        lang = tracker.get_slot("language")
+        
+        if not degree_id:
+            return {"selected_courses": None}
+        
+        try:
+            # Verifica che l'ID sia un corso opzionale valido per questa laurea
+            with metrics.span("catalog"):
+                course = get_catalog().optional_course(degree_id, slot_value)
+
+            if course:
+                return {"selected_courses": slot_value}
+            else:
+                msg = f"'{slot_value}' is not a valid optional course. Please choose from the list above."
+                if lang == "it":
+                    msg = f"'{slot_value}' non è un corso opzionale valido. Scegli dalla lista sopra."
+                dispatcher.utter_message(text=msg)
+                return {"selected_courses": None}
+
+        except Exception as e:
+            print(f"DB ERROR in validate_selected_courses: {e}")
+            return {"selected_courses": None}
+
+
+@metrics.instrument
+class ActionSendEnrollmentEmail(Action):
+    '''Invia una mail di conferma registrazione corso con i dettagli dell'utente.'''
+
+    def name(self) -> Text:
+        return "action_send_enrollment_email"
+
+    def run(self, dispatcher: CollectingDispatcher,
+            tracker: Tracker,
+            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+
+        # Recupero dati dagli slot
+        student_name = tracker.get_slot("student_name")
+        user_email = tracker.get_slot("email")
+        degree_field = tracker.get_slot("degree_field")
+        degree_id = tracker.get_slot("degree_id")
+        selected_course_id = tracker.get_slot("selected_courses")
+        lang = tracker.get_slot("language")
+        
+        if not user_email:
+            msg = "I couldn't find your email to send the confirmation." if lang != "it" else "Non ho trovato la mail per inviare la conferma."
+            dispatcher.utter_message(text=msg)
+            return []
+
+        # Riepilogo nella tabella enrollment: scritto a lotti in background
+        with metrics.span("enrollment_buffer"):
+            get_enrollment_writer().submit(
+                tracker.sender_id,
+                student_name=student_name,
+                email=user_email,
+                degree_field=degree_field,
+                degree_type=tracker.get_slot("degree_type"),
+                degree_id=degree_id,
+                selected_course=selected_course_id,
+                language=lang,
+            )
+
+        if not smtp_configured():
+            print("ERRORE CONFIGURAZIONE: Mancano le credenziali nel file .env")
+            msg = "I can't send the email because server configurations are missing." if lang != "it" else "Non posso inviare la mail perché mancano le configurazioni del server."
+            dispatcher.utter_message(text=msg)
+            return []
+
+        # Recupera dati completi dal database
+        degree_name = degree_id
+        degree_type = "N/A"
+        mandatory_courses_list = []
+        optional_course_name = selected_course_id
+        
+        try:
+            # Laurea, corsi obbligatori e corso opzionale scelto in un solo round-trip
+            with metrics.span("db"), get_pool().connection() as conn:
+                summary = fetch_enrollment_summary(conn, degree_id, selected_course_id)
+
+            if summary.degree_name:
+                degree_name = summary.degree_name
+                degree_type = summary.degree_type
+            mandatory_courses_list = summary.mandatory_courses
+            if summary.optional_course:
+                optional_course_name = summary.optional_course
+
+        except Exception as e:
+            print(f"DB ERROR in ActionSendEnrollmentEmail: {e}")
+            # Continua comunque con i dati che abbiamo
+
+        # Formatta la lista dei corsi obbligatori
+        mandatory_str = "\n".join([f"  - {c}" for c in mandatory_courses_list]) if mandatory_courses_list else "  (Nessun corso obbligatorio trovato)"
+
+        # Costruzione del corpo della mail
+        subject = f"Conferma Iscrizione: {degree_name}"
+        body = (
+            f"Ciao {student_name},\n\n"
+            f"Abbiamo registrato con successo il tuo interesse per il seguente percorso di studi:\n\n"
+            f"═══════════════════════════════════════\n"
+            f"📌 RIEPILOGO ISCRIZIONE\n"
+            f"═══════════════════════════════════════\n\n"
+            f"🎓 Area di Studio: {degree_field}\n"
+            f"📚 Corso di Laurea: {degree_name} ({degree_id})\n"
+            f"📋 Tipo: {degree_type}\n\n"
+            f"───────────────────────────────────────\n"
+            f"CORSI OBBLIGATORI:\n"
+            f"───────────────────────────────────────\n"
+            f"{mandatory_str}\n\n"
+            f"───────────────────────────────────────\n"
+            f"CORSO OPZIONALE SCELTO:\n"
+            f"───────────────────────────────────────\n"
+            f"  ⭐ {optional_course_name}\n\n"
+            f"═══════════════════════════════════════\n\n"
+            f"Un orientatore ti contatterà presto a questo indirizzo email ({user_email}) per fornirti maggiori dettagli.\n\n"
+            f"Cordiali saluti,\n"
+            f"Il tuo Assistente Virtuale UnivPM"
+        )
+
+        try:
+            # La mail parte in background dall'outbox: lo studente non aspetta il server SMTP
+            with metrics.span("smtp_enqueue"):
+                get_outbox().enqueue(user_email, subject, body)
+            print(f"DEBUG: Mail di enrollment per {user_email} messa in coda")
+            
+            # Conferma all'utente
+            if lang == "it":
+                dispatcher.utter_message(text=f"Perfetto {student_name}! 🎉 Ti sto inviando una mail di riepilogo a {user_email} con tutti i dettagli del corso '{degree_name}'.")
+            else:
+                dispatcher.utter_message(text=f"Perfect {student_name}! 🎉 I'm sending a summary email to {user_email} with all the details about '{degree_name}'.")
+            
+        except Exception as e:
+            print(f"ERRORE OUTBOX ENROLLMENT: {e}")
+            msg = "I saved your data, but there was a technical error sending the confirmation email." if lang != "it" else "Ho salvato i tuoi dati, ma c'è stato un errore tecnico nell'invio dell'email di conferma."
+            dispatcher.utter_message(text=msg)
+
+        return []
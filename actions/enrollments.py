@@ -0,0 +1,320 @@
+# Scrittura delle iscrizioni su PostgreSQL (write-behind).
+#
+# Quando il form di iscrizione è completo l'action mette il riepilogo in un
+# buffer in memoria e risponde subito; un worker in background lo scrive
+# nella tabella `enrollment` (database/04_enrollment.sql) a lotti: un solo
+# INSERT multi-riga e un solo commit per lotto, quando il buffer raggiunge
+# ENROLLMENT_BATCH_SIZE righe o al più ENROLLMENT_FLUSH_INTERVAL secondi dopo
+# la prima riga in attesa. La chiave è il sender_id: la stessa conversazione
+# scritta due volte aggiorna la riga esistente (ON CONFLICT), quindi riprovare
+# un lotto fallito è sicuro. Allo spegnimento il buffer viene svuotato.
+#
+# Se PostgreSQL rifiuta i dati del lotto (DataError/IntegrityError) il lotto
+# viene riscritto riga per riga: le righe rifiutate finiscono in un file di
+# scarto (ENROLLMENT_DEAD_LETTER) invece di bloccare le iscrizioni successive.
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import lifecycle, metrics
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("sender_id", "student_name", "email", "degree_field", "degree_type",
+           "degree_id", "selected_course", "language", "submitted_at")
+
+# Lunghezze massime delle colonne di testo (database/04_enrollment.sql)
+MAX_LENGTHS = {"sender_id": 255, "student_name": 255, "email": 255, "degree_field": 64,
+               "degree_type": 64, "degree_id": 5, "selected_course": 255, "language": 2}
+
+_UPDATE = ", ".join(f"{column} = EXCLUDED.{column}" for column in COLUMNS[1:])
+_ROW = "(" + ", ".join(["%s"] * len(COLUMNS)) + ")"
+
+
+def upsert_enrollments(conn: Any, rows: List[Dict[str, Any]]) -> None:
+    '''Scrive le iscrizioni con un solo INSERT ... ON CONFLICT (sender_id) multi-riga.'''
+    if not rows:
+        return
+    sql = (f"INSERT INTO enrollment ({', '.join(COLUMNS)}) VALUES {', '.join([_ROW] * len(rows))} "
+           f"ON CONFLICT (sender_id) DO UPDATE SET {_UPDATE}, updated_at = now()")
+    params = [row.get(column) for row in rows for column in COLUMNS]
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, params)
+    finally:
+        cur.close()
+
+
+def _is_row_error(error: Exception) -> bool:
+    '''Errori dovuti ai dati di una riga: riprovare lo stesso lotto non servirebbe.'''
+    try:
+        import psycopg2
+    except ImportError:
+        return False
+    return isinstance(error, (psycopg2.DataError, psycopg2.IntegrityError))
+
+
+class EnrollmentWriter:
+    '''
+    Buffer delle iscrizioni con scrittura a lotti in background.
+
+    :param write: funzione bloccante che scrive un lotto (gira in un thread)
+    :param batch_size: righe che fanno partire subito una scrittura
+    :param flush_interval: secondi massimi di attesa di una riga nel buffer
+    :param max_retry_delay: attesa massima tra due tentativi dopo un errore
+    :param dead_letter: file JSONL dove salvare le righe rifiutate dal DB (None = solo log)
+    :param is_row_error: riconosce gli errori causati dai dati di una riga
+    '''
+
+    def __init__(self,
+                 write: Callable[[List[Dict[str, Any]]], None],
+                 batch_size: int = 50,
+                 flush_interval: float = 2.0,
+                 max_retry_delay: float = 60.0,
+                 dead_letter: Optional[str] = None,
+                 is_row_error: Callable[[Exception], bool] = _is_row_error) -> None:
+        self.write = write
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retry_delay = max_retry_delay
+        self.dead_letter = dead_letter
+        self.is_row_error = is_row_error
+
+        # sender_id -> riga: una conversazione ha al più una riga in attesa (l'ultima)
+        self._buffer: Dict[str, Dict[str, Any]] = {}
+        self._oldest: Optional[float] = None
+        self._lock = threading.Lock()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._retry_delay = 0.0
+
+        self._stats = {"submitted": 0, "written": 0, "batches": 0, "failures": 0, "rejected": 0}
+        self.last_error: Optional[str] = None
+
+    # --- API usata dalle action -------------------------------------------
+
+    def submit(self, sender_id: str, **fields: Any) -> None:
+        '''Mette in coda il riepilogo dell'iscrizione della conversazione.'''
+        row = {column: fields.get(column) for column in COLUMNS}
+        row["sender_id"] = sender_id
+        row["submitted_at"] = row["submitted_at"] or datetime.now(timezone.utc)
+        for column, limit in MAX_LENGTHS.items():
+            value = row[column]
+            if isinstance(value, str) and len(value) > limit:
+                logger.warning(f"Enrollment {sender_id}: {column} truncated to {limit} characters")
+                row[column] = value[:limit]
+        with self._lock:
+            self._buffer[sender_id] = row
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._stats["submitted"] += 1
+            full = len(self._buffer) >= self.batch_size
+        self._wake(now=full)
+
+    def _wake(self, now: bool) -> None:
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if self._task is None and running is not None:
+            # Senza actions.server il worker parte alla prima iscrizione
+            self.start()
+        if self._loop is None or self._wakeup is None:
+            return
+        # Il worker conta già il tempo dalla prima riga: lo svegliamo solo a buffer pieno
+        # o per fargli calcolare la scadenza della prima riga arrivata
+        if now or self.pending() == 1:
+            if running is self._loop:
+                self._wakeup.set()
+            else:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    # --- Worker -----------------------------------------------------------
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._buffer)
+
+    def _take(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = list(self._buffer.values())
+            self._buffer.clear()
+            self._oldest = None
+        return rows
+
+    def _put_back(self, rows: List[Dict[str, Any]]) -> None:
+        '''Lotto non scritto: torna nel buffer senza sovrascrivere righe più recenti.'''
+        with self._lock:
+            for row in rows:
+                self._buffer.setdefault(row["sender_id"], row)
+            if self._buffer and self._oldest is None:
+                self._oldest = time.monotonic()
+
+    async def _write(self, rows: List[Dict[str, Any]]) -> None:
+        with metrics.span("db_write", action="enrollments"):
+            await asyncio.get_running_loop().run_in_executor(None, self.write, rows)
+
+    def _failed(self, rows: List[Dict[str, Any]], error: Exception) -> None:
+        self._put_back(rows)
+        self.last_error = f"{type(error).__name__}: {error}"
+        self._retry_delay = min(self.max_retry_delay, max(self.flush_interval, self._retry_delay * 2))
+        with self._lock:
+            self._stats["failures"] += 1
+        logger.warning(f"Could not write {len(rows)} enrollments, "
+                       f"retrying in {self._retry_delay:.0f}s: {self.last_error}")
+
+    def _reject(self, row: Dict[str, Any], error: Exception) -> None:
+        '''Riga rifiutata dal DB: niente altri tentativi, resta nel file di scarto.'''
+        logger.error(f"Enrollment {row['sender_id']} rejected by the database: {type(error).__name__}: {error}")
+        with self._lock:
+            self._stats["rejected"] += 1
+        if not self.dead_letter:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.dead_letter)), exist_ok=True)
+            with open(self.dead_letter, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"row": row, "error": str(error)}, default=str) + "\n")
+        except OSError as e:
+            logger.error(f"Could not save rejected enrollment {row['sender_id']}: {e}")
+
+    async def _write_rows(self, rows: List[Dict[str, Any]]) -> Tuple[int, bool]:
+        '''
+        Lotto con dati rifiutati: riga per riga, scartando solo quelle in errore.
+        Restituisce le righe scritte e se il DB è tornato in errore per altri motivi.
+        '''
+        written = 0
+        for i, row in enumerate(rows):
+            try:
+                await self._write([row])
+            except Exception as e:
+                if not self.is_row_error(e):
+                    self._failed(rows[i:], e)
+                    return written, True
+                self._reject(row, e)
+            else:
+                written += 1
+        return written, False
+
+    async def flush(self) -> int:
+        '''Scrive subito tutto il buffer; restituisce le righe scritte (0 se in errore).'''
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            rows = self._take()
+            if not rows:
+                return 0
+            failed = False
+            try:
+                await self._write(rows)
+                written = len(rows)
+            except Exception as e:
+                if not self.is_row_error(e):
+                    self._failed(rows, e)
+                    return 0
+                written, failed = await self._write_rows(rows)
+            if not failed:
+                self._retry_delay = 0.0
+            with self._lock:
+                self._stats["written"] += written
+                self._stats["batches"] += 1
+            return written
+
+    def _due_in(self) -> Optional[float]:
+        with self._lock:
+            if not self._buffer:
+                return None
+            if len(self._buffer) >= self.batch_size and not self._retry_delay:
+                return 0.0
+            waited = time.monotonic() - self._oldest
+        return max(0.0, max(self.flush_interval, self._retry_delay) - waited)
+
+    async def _run(self) -> None:
+        while True:
+            timeout = self._due_in()
+            if timeout == 0.0:
+                try:
+                    await self.flush()
+                except Exception as e:
+                    logger.exception(f"Enrollment writer error: {e}")
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        '''Ferma il worker e scrive le righe ancora nel buffer.'''
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        if self.pending():
+            logger.error(f"{self.pending()} enrollments not written at shutdown: {self.last_error}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["pending"] = len(self._buffer)
+        stats["last_error"] = self.last_error
+        return stats
+
+
+def _write_to_db(rows: List[Dict[str, Any]]) -> None:
+    from .db import get_pool
+
+    with get_pool().connection() as conn:
+        upsert_enrollments(conn, rows)
+
+
+_writer: Optional[EnrollmentWriter] = None
+
+
+def get_enrollment_writer() -> EnrollmentWriter:
+    '''
+    Writer condiviso dal processo, configurato da ENROLLMENT_BATCH_SIZE,
+    ENROLLMENT_FLUSH_INTERVAL ed ENROLLMENT_DEAD_LETTER (vedi .env.example).
+    '''
+    global _writer
+    if _writer is None:
+        _writer = EnrollmentWriter(
+            _write_to_db,
+            batch_size=int(os.getenv("ENROLLMENT_BATCH_SIZE", 50)),
+            flush_interval=float(os.getenv("ENROLLMENT_FLUSH_INTERVAL", 2)),
+            dead_letter=os.getenv("ENROLLMENT_DEAD_LETTER",
+                                  os.path.join(".cache", "enrollments_rejected.jsonl")) or None,
+        )
+    return _writer
+
+
+@lifecycle.on_startup
+async def start_enrollment_writer() -> None:
+    get_enrollment_writer().start()
+
+
+@lifecycle.on_shutdown
+async def stop_enrollment_writer() -> None:
+    if _writer is not None:
+        await _writer.stop()
+
+
+@metrics.collector("enrollments", counters=("submitted", "written", "batches", "failures", "rejected"))
+def enrollment_metrics() -> Optional[Dict[str, Any]]:
+    return _writer.stats() if _writer is not None else None
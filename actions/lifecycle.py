@@ -0,0 +1,67 @@
+# Hook di avvio/arresto dell'action server.
+#
+# I moduli che possiedono risorse condivise (browser, sessioni HTTP, pool DB)
+# registrano qui le loro coroutine di inizializzazione e chiusura, più eventuali
+# endpoint di stato; il server (actions/server.py) esegue gli hook quando Sanic
+# parte e prima che si fermi, ed espone gli endpoint accanto a /webhook.
+# Se le action girano con il semplice `python -m rasa_sdk`, le stesse risorse
+# vengono comunque create pigramente al primo utilizzo.
+
+import logging
+from typing import Any, Awaitable, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+Hook = Callable[[], Awaitable[None]]
+
+_startup_hooks: List[Hook] = []
+_shutdown_hooks: List[Hook] = []
+
+# path -> coroutine senza argomenti che restituisce un dict (JSON), una stringa
+# (testo) oppure una tupla (corpo, status HTTP)
+Route = Callable[[], Awaitable[Any]]
+_routes: Dict[str, Route] = {}
+
+
+def on_startup(hook: Hook) -> Hook:
+    """Registra una coroutine da eseguire all'avvio del server (usabile come decoratore)."""
+    if hook not in _startup_hooks:
+        _startup_hooks.append(hook)
+    return hook
+
+
+def on_shutdown(hook: Hook) -> Hook:
+    """Registra una coroutine da eseguire all'arresto del server (usabile come decoratore)."""
+    if hook not in _shutdown_hooks:
+        _shutdown_hooks.append(hook)
+    return hook
+
+
+def route(path: str) -> Callable[[Route], Route]:
+    """Registra un endpoint GET dell'action server (decoratore)."""
+    def register(handler: Route) -> Route:
+        _routes[path] = handler
+        return handler
+    return register
+
+
+def routes() -> Dict[str, Route]:
+    return dict(_routes)
+
+
+async def startup() -> None:
+    for hook in _startup_hooks:
+        try:
+            await hook()
+        except Exception as e:
+            # Un servizio non disponibile non deve impedire l'avvio del server
+            logger.exception(f"Startup hook {hook.__qualname__} failed: {e}")
+
+
+async def shutdown() -> None:
+    # Ordine inverso rispetto all'avvio
+    for hook in reversed(_shutdown_hooks):
+        try:
+            await hook()
+        except Exception as e:
+            logger.exception(f"Shutdown hook {hook.__qualname__} failed: {e}")
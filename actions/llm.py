@@ -0,0 +1,390 @@
+# Client asincrono per Ollama (/api/generate, /api/embed).
+#
+# Le action girano nell'event loop del server Sanic: una chiamata HTTP
+# sincrona al modello bloccherebbe tutte le altre conversazioni per l'intera
+# durata della generazione. Qui usiamo invece una sessione aiohttp persistente
+# (keep-alive) e un semaforo che limita le generazioni contemporanee; gli
+# embedding (brevi, usati per cercare il contesto prima di generare) hanno un
+# semaforo e connessioni loro, così non aspettano dietro le generazioni lunghe.
+#
+# In modalità streaming (`OllamaClient.stream`) leggiamo l'NDJSON di Ollama
+# man mano che arriva, possiamo fermarci su limite di token o scadenza e
+# misuriamo time-to-first-token e token/s di ogni richiesta.
+
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from . import lifecycle, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaError(Exception):
+    """Errore HTTP o di rete durante una chiamata a Ollama."""
+
+
+class GenerationStats:
+    '''Misure di una singola generazione in streaming.'''
+
+    def __init__(self) -> None:
+        self.started_at = time.monotonic()
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.tokens = 0
+        # "done" (fine naturale), "max_tokens" o "deadline"
+        self.stop_reason: Optional[str] = None
+        # Tempi riportati da Ollama nell'ultimo messaggio (secondi)
+        self.prompt_eval_duration: Optional[float] = None
+        self.eval_duration: Optional[float] = None
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """Time-to-first-token in secondi."""
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def duration(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return end - self.started_at
+
+    @property
+    def tokens_per_second(self) -> float:
+        if self.first_token_at is None or self.tokens < 2:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        elapsed = end - self.first_token_at
+        return (self.tokens - 1) / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "ttft": self.ttft,
+            "duration": self.duration,
+            "tokens": self.tokens,
+            "tokens_per_second": self.tokens_per_second,
+            "stop_reason": self.stop_reason,
+            "prompt_eval_duration": self.prompt_eval_duration,
+            "eval_duration": self.eval_duration,
+        }
+
+
+class SentenceBuffer:
+    '''
+    Accumula i pezzi di testo in arrivo e restituisce frasi complete,
+    raggruppate fino ad almeno `min_chars` caratteri per messaggio.
+    '''
+
+    _BOUNDARY_RE = re.compile(r"(?<=[.!?…])\s+|\n{2,}")
+
+    def __init__(self, min_chars: int = 80) -> None:
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buffer += text
+        parts = self._BOUNDARY_RE.split(self._buffer)
+        # L'ultimo pezzo potrebbe essere una frase non ancora finita
+        self._buffer = parts.pop()
+
+        messages: List[str] = []
+        current = ""
+        for part in parts:
+            part = part.strip()
+            if not part:
+                continue
+            current = f"{current} {part}".strip()
+            if len(current) >= self.min_chars:
+                messages.append(current)
+                current = ""
+        if current:
+            self._buffer = f"{current} {self._buffer}" if self._buffer else current + " "
+        return messages
+
+    def flush(self) -> Optional[str]:
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return rest or None
+
+
+class OllamaClient:
+    '''
+    Client Ollama con sessione HTTP condivisa.
+
+    :param base_url: URL del server Ollama (es. http://ollama:11434)
+    :param model: nome del modello da usare di default
+    :param connect_timeout: secondi massimi per stabilire la connessione
+    :param read_timeout: secondi massimi di attesa tra un chunk di risposta e il successivo
+    :param max_concurrency: generazioni contemporanee ammesse verso Ollama
+    :param max_embed_concurrency: richieste di embedding contemporanee, separate dalle generazioni
+    '''
+
+    def __init__(self,
+                 base_url: str,
+                 model: str,
+                 connect_timeout: float = 5.0,
+                 read_timeout: float = 60.0,
+                 max_concurrency: int = 2,
+                 keepalive_timeout: float = 60.0,
+                 max_embed_concurrency: int = 2) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_concurrency = max_concurrency
+        self.max_embed_concurrency = max_embed_concurrency
+        self.keepalive_timeout = keepalive_timeout
+
+        self._session: Any = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._embed_semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Aggregati delle generazioni in streaming
+        self._stream_stats = {
+            "streams": 0,
+            "ttft_total": 0.0,
+            "ttft_max": 0.0,
+            "tokens_total": 0,
+            "generation_time_total": 0.0,
+            "prefill_time_total": 0.0,
+            "stopped_max_tokens": 0,
+            "stopped_deadline": 0,
+        }
+
+    async def _get_session(self) -> Any:
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                # Connessioni per le generazioni più quelle riservate agli embedding
+                limit=self.max_concurrency + self.max_embed_concurrency,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=None,
+                sock_connect=self.connect_timeout,
+                sock_read=self.read_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._embed_semaphore = asyncio.Semaphore(self.max_embed_concurrency)
+            self._loop = loop
+        return self._session
+
+    async def generate(self, prompt: str, model: Optional[str] = None, **fields: Any) -> str:
+        '''
+        Genera una risposta completa (stream disattivato).
+
+        Eventuali campi extra (es. `options`, `keep_alive`) vengono inoltrati
+        così come sono nel corpo della richiesta.
+        '''
+        import aiohttp
+
+        session = await self._get_session()
+        payload: Dict[str, Any] = {
+            "model": model or self.model,
+            "prompt": prompt,
+            "stream": False,
+        }
+        payload.update(fields)
+
+        async with self._semaphore:
+            try:
+                async with session.post(f"{self.base_url}/api/generate", json=payload) as resp:
+                    if resp.status != 200:
+                        body = await resp.text()
+                        raise OllamaError(f"HTTP {resp.status}: {body[:500]}")
+                    data = await resp.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise OllamaError(f"{type(e).__name__}: {e}") from e
+
+        return data.get("response", "")
+
+    async def embed(self, texts: List[str], model: Optional[str] = None, **fields: Any) -> List[List[float]]:
+        '''
+        Vettori di embedding dei testi (/api/embed), uno per testo e nello stesso
+        ordine. Non occupa i posti delle generazioni (semaforo separato).
+        '''
+        import aiohttp
+
+        session = await self._get_session()
+        payload: Dict[str, Any] = {"model": model or self.model, "input": texts}
+        payload.update(fields)
+
+        async with self._embed_semaphore:
+            try:
+                async with session.post(f"{self.base_url}/api/embed", json=payload) as resp:
+                    if resp.status != 200:
+                        body = await resp.text()
+                        raise OllamaError(f"HTTP {resp.status}: {body[:500]}")
+                    data = await resp.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise OllamaError(f"{type(e).__name__}: {e}") from e
+
+        embeddings = data.get("embeddings") or []
+        if len(embeddings) != len(texts):
+            raise OllamaError(f"expected {len(texts)} embeddings, got {len(embeddings)}")
+        return embeddings
+
+    async def stream(self,
+                     prompt: str,
+                     stats: Optional[GenerationStats] = None,
+                     max_tokens: Optional[int] = None,
+                     timeout: Optional[float] = None,
+                     model: Optional[str] = None,
+                     **fields: Any) -> AsyncIterator[str]:
+        '''
+        Genera in streaming, restituendo i pezzi di testo man mano che arrivano.
+
+        :param stats: oggetto da riempire con TTFT, token/s e motivo di arresto
+        :param max_tokens: ci si ferma dopo questo numero di token
+        :param timeout: secondi complessivi concessi; allo scadere ci si ferma
+            restituendo quanto generato fino a quel momento
+        '''
+        import aiohttp
+
+        stats = stats if stats is not None else GenerationStats()
+        deadline = stats.started_at + timeout if timeout else None
+
+        session = await self._get_session()
+        payload: Dict[str, Any] = {
+            "model": model or self.model,
+            "prompt": prompt,
+            "stream": True,
+        }
+        payload.update(fields)
+        if max_tokens:
+            # Chiediamo anche a Ollama di fermarsi, non solo di smettere di leggere
+            payload["options"] = {**payload.get("options", {}), "num_predict": max_tokens}
+
+        async with self._semaphore:
+            try:
+                async with session.post(f"{self.base_url}/api/generate", json=payload) as resp:
+                    if resp.status != 200:
+                        body = await resp.text()
+                        raise OllamaError(f"HTTP {resp.status}: {body[:500]}")
+
+                    while True:
+                        remaining = None
+                        if deadline is not None:
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                stats.stop_reason = "deadline"
+                                break
+                        try:
+                            line = await asyncio.wait_for(resp.content.readline(), remaining)
+                        except asyncio.TimeoutError:
+                            stats.stop_reason = "deadline"
+                            break
+                        if not line:
+                            stats.stop_reason = stats.stop_reason or "done"
+                            break
+                        line = line.strip()
+                        if not line:
+                            continue
+
+                        try:
+                            data = json.loads(line)
+                        except ValueError as e:
+                            raise OllamaError(f"Invalid response line: {line[:200]!r}") from e
+                        if not isinstance(data, dict):
+                            raise OllamaError(f"Invalid response line: {line[:200]!r}")
+                        if data.get("error"):
+                            raise OllamaError(data["error"])
+
+                        piece = data.get("response", "")
+                        if piece:
+                            if stats.first_token_at is None:
+                                stats.first_token_at = time.monotonic()
+                            stats.tokens += 1
+                            yield piece
+
+                        if data.get("done"):
+                            stats.stop_reason = "done"
+                            if data.get("prompt_eval_duration"):
+                                stats.prompt_eval_duration = data["prompt_eval_duration"] / 1e9
+                            if data.get("eval_duration"):
+                                stats.eval_duration = data["eval_duration"] / 1e9
+                            break
+                        if max_tokens and stats.tokens >= max_tokens:
+                            stats.stop_reason = "max_tokens"
+                            break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise OllamaError(f"{type(e).__name__}: {e}") from e
+            finally:
+                stats.finished_at = time.monotonic()
+                self._record_stream(stats)
+
+    def _record_stream(self, stats: GenerationStats) -> None:
+        agg = self._stream_stats
+        agg["streams"] += 1
+        if stats.ttft is not None:
+            agg["ttft_total"] += stats.ttft
+            agg["ttft_max"] = max(agg["ttft_max"], stats.ttft)
+        agg["tokens_total"] += stats.tokens
+        if stats.prompt_eval_duration is not None:
+            # Cala quando Ollama riusa il prefisso già in cache
+            agg["prefill_time_total"] += stats.prompt_eval_duration
+        if stats.first_token_at is not None:
+            agg["generation_time_total"] += stats.finished_at - stats.first_token_at
+        if stats.stop_reason == "max_tokens":
+            agg["stopped_max_tokens"] += 1
+        elif stats.stop_reason == "deadline":
+            agg["stopped_deadline"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        '''Medie di TTFT, prefill e token/s sulle generazioni in streaming.'''
+        stats: Dict[str, Any] = dict(self._stream_stats)
+        streams = stats["streams"]
+        stats["ttft_avg"] = stats["ttft_total"] / streams if streams else 0.0
+        stats["prefill_time_avg"] = stats["prefill_time_total"] / streams if streams else 0.0
+        gen_time = stats["generation_time_total"]
+        stats["tokens_per_second_avg"] = stats["tokens_total"] / gen_time if gen_time else 0.0
+        return stats
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+_client: Optional[OllamaClient] = None
+
+
+def get_ollama_client() -> OllamaClient:
+    '''
+    Client Ollama condiviso dal processo, configurato da variabili d'ambiente:
+    OLLAMA_URL, OLLAMA_MODEL, OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT,
+    OLLAMA_MAX_CONCURRENCY, OLLAMA_EMBED_CONCURRENCY.
+    '''
+    global _client
+    if _client is None:
+        _client = OllamaClient(
+            # Con Docker Compose il nome del servizio 'ollama' viene risolto automaticamente
+            base_url=os.getenv("OLLAMA_URL", "http://ollama:11434"),
+            model=os.getenv("OLLAMA_MODEL", "qwen3:0.6b"),
+            connect_timeout=float(os.getenv("OLLAMA_CONNECT_TIMEOUT", 5)),
+            read_timeout=float(os.getenv("OLLAMA_READ_TIMEOUT", 60)),
+            max_concurrency=int(os.getenv("OLLAMA_MAX_CONCURRENCY", 2)),
+            max_embed_concurrency=int(os.getenv("OLLAMA_EMBED_CONCURRENCY", 2)),
+        )
+    return _client
+
+
+@lifecycle.on_shutdown
+async def close_ollama_client() -> None:
+    if _client is not None:
+        await _client.close()
+
+
+@metrics.collector("ollama", counters=("streams", "ttft_total", "tokens_total", "generation_time_total",
+                                      "prefill_time_total", "stopped_max_tokens", "stopped_deadline"))
+def ollama_metrics() -> Optional[Dict[str, Any]]:
+    return _client.stats() if _client is not None else None
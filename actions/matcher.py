@@ -0,0 +1,176 @@
+# Riconoscimento di parole chiave nel testo dell'utente.
+#
+# Argomenti (URL_MAP), aree e tipi di laurea e nomi dei corsi di laurea passano
+# tutti da qui: il testo viene normalizzato (minuscole, senza accenti né
+# punteggiatura), cercato con un automa Aho-Corasick costruito una sola volta
+# su tutte le parole chiave (un'unica scansione del testo, qualunque sia il
+# numero di parole chiave) e, se non c'è una corrispondenza esatta, confrontato
+# con un indice di trigrammi per tollerare errori di battitura ("ingegneira",
+# "iscrizioni").
+
+import re
+import unicodedata
+from collections import Counter, deque
+from typing import Any, Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+_NON_WORD_RE = re.compile(r"[^\w]+", re.UNICODE)
+_APOSTROPHE_RE = re.compile(r"(?<=\w)['’](?=s\b)")
+
+
+def fold(text: str) -> str:
+    '''
+    Minuscole, senza accenti, punteggiatura e trattini come spazi
+    ("Master's Degree" -> "masters degree", "Università" -> "universita").
+    '''
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    # Il genitivo inglese resta attaccato: "master's" -> "masters"
+    text = _APOSTROPHE_RE.sub("", text)
+    return _NON_WORD_RE.sub(" ", text).strip()
+
+
+class Match(NamedTuple):
+    value: Any
+    keyword: str
+    score: float      # 1.0 per le corrispondenze esatte
+    exact: bool
+
+
+class AhoCorasick:
+    '''Automa Aho-Corasick su stringhe: trova tutte le occorrenze in tempo lineare.'''
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+
+        for pattern in patterns:
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(pattern)
+
+        # Link di fallimento in ampiezza
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find_all(self, text: str) -> List[Tuple[int, str]]:
+        '''Restituisce (posizione iniziale, pattern) per ogni occorrenza.'''
+        found = []
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for pattern in self._out[state]:
+                found.append((i - len(pattern) + 1, pattern))
+        return found
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    '''Indice invertito trigramma -> chiavi, con similarità di Dice.'''
+
+    def __init__(self, keys: Iterable[str]) -> None:
+        self._sizes: Dict[str, int] = {}
+        self._postings: Dict[str, List[str]] = {}
+        for key in keys:
+            grams = trigrams(key)
+            self._sizes[key] = len(grams)
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(key)
+
+    def search(self, text: str) -> List[Tuple[float, str]]:
+        '''Chiavi con almeno un trigramma in comune, ordinate per similarità.'''
+        grams = trigrams(text)
+        overlap: Counter = Counter()
+        for gram in grams:
+            overlap.update(self._postings.get(gram, ()))
+        scored = [(2 * shared / (len(grams) + self._sizes[key]), key) for key, shared in overlap.items()]
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored
+
+
+class Matcher:
+    '''
+    Associa parole chiave (in qualunque lingua) a un valore.
+
+    :param keywords: parola chiave -> valore (es. "triennale" -> "Bachelor's Degree")
+    :param min_score: similarità minima (0-1) per accettare una corrispondenza approssimata
+    :param fuzzy: se False accetta solo corrispondenze esatte
+    '''
+
+    def __init__(self, keywords: Dict[str, Hashable], min_score: float = 0.6, fuzzy: bool = True) -> None:
+        self.min_score = min_score
+        self.fuzzy = fuzzy
+        self._values: Dict[str, Hashable] = {}
+        for keyword, value in keywords.items():
+            folded = fold(keyword)
+            if folded:
+                self._values.setdefault(folded, value)
+
+        # Spazi ai lati: le parole chiave corrispondono solo a parole intere
+        self._automaton = AhoCorasick(f" {k} " for k in self._values)
+        self._trigrams = TrigramIndex(self._values) if fuzzy else None
+        self._max_words = max((k.count(" ") + 1 for k in self._values), default=1)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def find_exact(self, text: str) -> List[Match]:
+        '''Tutte le parole chiave presenti nel testo, dalla più lunga.'''
+        folded = f" {fold(text)} "
+        found = {pattern.strip() for _, pattern in self._automaton.find_all(folded)}
+        ordered = sorted(found, key=lambda k: (-len(k), folded.find(f" {k} ")))
+        return [Match(self._values[k], k, 1.0, True) for k in ordered]
+
+    def find_fuzzy(self, text: str) -> List[Match]:
+        '''Parole chiave simili a qualche gruppo di parole consecutive del testo.'''
+        if self._trigrams is None:
+            return []
+        words = fold(text).split()
+        best: Dict[str, float] = {}
+        for size in range(1, min(self._max_words, len(words)) + 1):
+            for start in range(len(words) - size + 1):
+                window = " ".join(words[start:start + size])
+                for score, key in self._trigrams.search(window):
+                    if score < self.min_score:
+                        break
+                    if score > best.get(key, 0.0):
+                        best[key] = score
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        return [Match(self._values[k], k, score, False) for k, score in ranked]
+
+    def match(self, text: str, accept: Optional[Callable[[Any], bool]] = None) -> Optional[Match]:
+        '''
+        Miglior corrispondenza nel testo: prima le esatte (la parola chiave più
+        lunga vince), poi le approssimate sopra `min_score`.
+
+        :param accept: filtro sui valori (es. solo i corsi di una certa area)
+        '''
+        if not text:
+            return None
+        for candidates in (self.find_exact, self.find_fuzzy):
+            for match in candidates(text):
+                if accept is None or accept(match.value):
+                    return match
+        return None
@@ -0,0 +1,306 @@
+# Metriche dell'action server in formato Prometheus.
+#
+# Ogni action viene cronometrata per intero (decoratore `instrument`) e per
+# fasi (`span`: crawl, clean, llm, db, smtp...), con etichette action, topic ed
+# esito. Le statistiche dei componenti condivisi (pool DB, cache, browser,
+# outbox...) vengono lette al momento della richiesta dai collector che ogni
+# modulo registra. Tutto è esposto in formato testo su /metrics, senza
+# dipendenze esterne.
+
+import time
+import asyncio
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, FrozenSet, Iterator, List, Optional, Sequence, Tuple
+
+from . import lifecycle
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def expose(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def expose(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # chiave -> [conteggi per bucket..., somma, conteggio]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def count(self, **labels: Any) -> int:
+        data = self._values.get(self._key(labels))
+        return data[-1] if data else 0
+
+    def expose(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(data)) for key, data in self._values.items())
+        lines = self.header()
+        for key, data in items:
+            for bound, count in zip(self.buckets + (float("inf"),), data[:-2] + [data[-1]]):
+                le = 'le="%s"' % _format_value(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(data[-2])}")
+            lines.append(f"{self.name}_count{labels} {data[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Tuple[Callable[[], Optional[Dict[str, Any]]], FrozenSet[str]]] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def collector(self, prefix: str, counters: Sequence[str] = ()) -> Callable:
+        '''
+        Registra una funzione che restituisce le statistiche correnti di un
+        componente (dict nome -> numero, oppure None se non è attivo).
+
+        :param counters: nomi dei totali che crescono soltanto, esposti come
+            counter `<prefix>_<nome>_total`; gli altri valori (livelli come
+            active, queued, pending) sono gauge `<prefix>_<nome>`
+        '''
+        def register(fn: Callable[[], Optional[Dict[str, Any]]]) -> Callable:
+            self._collectors[prefix] = (fn, frozenset(counters))
+            return fn
+        return register
+
+    def expose(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.expose())
+        for prefix, (fn, counters) in self._collectors.items():
+            try:
+                stats = fn()
+            except Exception as e:
+                lines.append(f"# collector {prefix} failed: {_escape(e)}")
+                continue
+            for name, value in sorted((stats or {}).items()):
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                if name in counters:
+                    metric, kind = f"{prefix}_{name}", "counter"
+                    if not metric.endswith("_total"):
+                        metric += "_total"
+                else:
+                    metric, kind = f"{prefix}_{name}", "gauge"
+                lines.append(f"# TYPE {metric} {kind}")
+                lines.append(f"{metric} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+collector = REGISTRY.collector
+
+ACTION_DURATION = REGISTRY.register(Histogram(
+    "rasa_action_duration_seconds", "Durata complessiva delle action.", ("action", "topic", "outcome"),
+))
+STAGE_DURATION = REGISTRY.register(Histogram(
+    "rasa_action_stage_duration_seconds", "Durata delle fasi delle action (crawl, clean, llm, db, smtp...).",
+    ("action", "stage", "topic", "outcome"),
+))
+STAGE_TOTAL = REGISTRY.register(Counter(
+    "rasa_action_stage_total", "Fasi eseguite, per esito.", ("action", "stage", "topic", "outcome"),
+))
+
+
+# Action e topic della richiesta in corso: le fasi eseguite più in profondità
+# (es. il crawl dentro pages.py) ereditano le etichette senza doverle passare
+_context: ContextVar[Optional[Dict[str, str]]] = ContextVar("metrics_context", default=None)
+
+
+def set_topic(topic: str) -> None:
+    '''Etichetta topic per il resto dell'action (usare solo valori di un insieme chiuso).'''
+    context = _context.get()
+    if context is not None:
+        context["topic"] = topic
+
+
+class Span:
+    '''Fase in corso: `outcome` può essere cambiato prima della fine (es. "hit").'''
+
+    __slots__ = ("stage", "outcome", "started")
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+        self.outcome = "ok"
+        self.started = time.perf_counter()
+
+
+@contextmanager
+def span(stage: str, action: Optional[str] = None, topic: Optional[str] = None) -> Iterator[Span]:
+    '''
+    Cronometra una fase. Action e topic, se non indicati, sono quelli
+    dell'action in corso ("background" fuori da un'action). Un'eccezione
+    registra l'esito "error".
+    '''
+    context = _context.get() or {}
+    current = Span(stage)
+    try:
+        yield current
+    except BaseException as e:
+        if current.outcome == "ok":
+            current.outcome = "cancelled" if isinstance(e, asyncio.CancelledError) else "error"
+        raise
+    finally:
+        labels = {
+            "action": action or context.get("action", "background"),
+            "stage": stage,
+            "topic": topic or context.get("topic", ""),
+            "outcome": current.outcome,
+        }
+        STAGE_DURATION.observe(time.perf_counter() - current.started, **labels)
+        STAGE_TOTAL.inc(**labels)
+
+
+def _finish(context: Dict[str, str], started: float, outcome: str) -> None:
+    ACTION_DURATION.observe(time.perf_counter() - started,
+                            action=context["action"], topic=context.get("topic", ""), outcome=outcome)
+
+
+def instrument(cls: type) -> type:
+    '''Decoratore di classe: cronometra `run` dell'action e imposta il contesto delle fasi.'''
+    run = cls.run
+
+    if asyncio.iscoroutinefunction(run):
+        @functools.wraps(run)
+        async def timed_run(self, *args: Any, **kwargs: Any) -> Any:
+            context = {"action": self.name(), "topic": ""}
+            token = _context.set(context)
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = await run(self, *args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                _finish(context, started, outcome)
+                _context.reset(token)
+    else:
+        @functools.wraps(run)
+        def timed_run(self, *args: Any, **kwargs: Any) -> Any:
+            context = {"action": self.name(), "topic": ""}
+            token = _context.set(context)
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = run(self, *args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                _finish(context, started, outcome)
+                _context.reset(token)
+
+    cls.run = timed_run
+    return cls
+
+
+@lifecycle.route("/metrics")
+async def metrics_endpoint() -> str:
+    return REGISTRY.expose()
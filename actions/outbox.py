@@ -0,0 +1,588 @@
+# Coda di uscita delle email (outbox).
+#
+# Le action non parlano più direttamente con il server SMTP: mettono il
+# messaggio in coda e rispondono subito allo studente. Un worker in background
+# invia i messaggi a lotti riusando una sola connessione autenticata (chiusa
+# dopo un periodo di inattività), riprova con backoff esponenziale in caso di
+# errore e tiene ogni messaggio non ancora inviato come file JSON nella
+# cartella di spool, così nessuna mail si perde se l'action server si riavvia.
+# Con più worker Sanic lo spool è condiviso: ogni processo tiene i suoi
+# messaggi in una propria cartella inflight/<processo>/, protetta da un lock
+# finché il processo vive, e prende in carico quelli senza proprietario
+# (radice dello spool, cartelle di processi terminati) spostandoli con un
+# rename atomico, così ogni mail parte da un solo worker.
+# smtplib (e con lui ssl, socket ed email) si importa solo al primo invio.
+
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from . import lifecycle, metrics
+
+if TYPE_CHECKING:
+    import smtplib
+
+logger = logging.getLogger(__name__)
+
+# Cartella dello spool con i messaggi presi in carico da ciascun processo
+INFLIGHT = "inflight"
+LOCK_NAME = ".lock"
+
+
+def _try_lock(path: str) -> Optional[Any]:
+    '''
+    Lock esclusivo non bloccante su `path`, rilasciato dal sistema quando il
+    processo termina; None se è di un altro processo (o senza fcntl).
+    '''
+    try:
+        import fcntl
+    except ImportError:
+        return None
+    f = open(path, "a")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+class SmtpSender:
+    '''
+    Connessione SMTP persistente: apre (SSL sulla 465, altrimenti STARTTLS),
+    autentica una volta e invia più messaggi sulla stessa sessione.
+
+    Va usata da un solo thread alla volta (il worker dell'outbox).
+    '''
+
+    def __init__(self,
+                 host: str,
+                 port: int,
+                 user: Optional[str] = None,
+                 password: Optional[str] = None,
+                 starttls: bool = True,
+                 timeout: float = 30.0) -> None:
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self._server: Optional["smtplib.SMTP"] = None
+        self.connections = 0
+
+    def _connect(self) -> "smtplib.SMTP":
+        import smtplib
+
+        if self.port == 465:
+            server: smtplib.SMTP = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                server.starttls()
+        try:
+            server.ehlo_or_helo_if_needed()
+            if self.user and self.password and server.has_extn("auth"):
+                server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        self.connections += 1
+        return server
+
+    def _ensure_connected(self) -> "smtplib.SMTP":
+        import smtplib
+
+        if self._server is not None:
+            try:
+                # La connessione potrebbe essere stata chiusa dal server mentre era inattiva
+                if self._server.noop()[0] == 250:
+                    return self._server
+            except smtplib.SMTPException:
+                pass
+            self.close()
+        self._server = self._connect()
+        return self._server
+
+    def send(self, sender: str, to: str, message: str) -> None:
+        '''Invia un messaggio, riaprendo la connessione una volta se il server l'ha chiusa.'''
+        import smtplib
+
+        server = self._ensure_connected()
+        try:
+            server.sendmail(sender, [to], message)
+        except smtplib.SMTPServerDisconnected:
+            self.close()
+            self._ensure_connected().sendmail(sender, [to], message)
+
+    def close(self) -> None:
+        if self._server is None:
+            return
+        import smtplib
+
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            self._server.close()
+        self._server = None
+
+    @property
+    def connected(self) -> bool:
+        return self._server is not None
+
+
+def _is_message_error(error: Exception) -> bool:
+    '''Errori che riguardano il singolo messaggio: il resto del lotto può proseguire.'''
+    import smtplib
+
+    return isinstance(error, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError))
+
+
+def _is_permanent(error: Exception) -> bool:
+    '''
+    Errori 5xx sul messaggio (es. destinatario inesistente) non si risolvono
+    riprovando. Le credenziali errate invece sono un problema di configurazione:
+    si continua a riprovare finché non vengono corrette.
+    '''
+    import smtplib
+
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+class Outbox:
+    '''
+    Coda persistente delle email in uscita con worker asincrono.
+
+    :param sender: connessione SMTP usata dal worker
+    :param from_address: mittente dei messaggi
+    :param spool_dir: cartella dei messaggi in attesa (None = solo in memoria)
+    :param batch_size: messaggi inviati al massimo per ogni giro sulla connessione
+    :param max_attempts: tentativi prima di considerare un messaggio fallito
+    :param retry_delay: attesa dopo il primo errore (raddoppia ad ogni tentativo)
+    :param max_retry_delay: attesa massima tra due tentativi
+    :param idle_timeout: secondi di inattività dopo cui si chiude la connessione SMTP
+    :param claim_interval: ogni quanti secondi cercare messaggi di worker terminati
+    '''
+
+    def __init__(self,
+                 sender: SmtpSender,
+                 from_address: str,
+                 spool_dir: Optional[str] = None,
+                 batch_size: int = 20,
+                 max_attempts: int = 8,
+                 retry_delay: float = 30.0,
+                 max_retry_delay: float = 3600.0,
+                 idle_timeout: float = 60.0,
+                 claim_interval: float = 60.0) -> None:
+        self.sender = sender
+        self.from_address = from_address
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.idle_timeout = idle_timeout
+
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self._stats = {"enqueued": 0, "sent": 0, "failed": 0, "retries": 0, "batches": 0, "claimed": 0}
+        self.last_error: Optional[str] = None
+
+        # Cartella dei messaggi di questo processo (relativa allo spool) e suo lock
+        self._folder = ""
+        self._folder_lock: Optional[Any] = None
+        self.claim_interval = claim_interval
+        self._claimed_at = float("-inf")
+
+        if spool_dir:
+            try:
+                os.makedirs(os.path.join(spool_dir, "failed"), exist_ok=True)
+                os.makedirs(os.path.join(spool_dir, INFLIGHT), exist_ok=True)
+                self._folder = self._make_folder()
+            except OSError as e:
+                logger.warning(f"Outbox spool directory {spool_dir} not usable, mail kept in memory: {e}")
+                self.spool_dir = None
+        self._load_spool()
+
+    # --- Spool su disco ---------------------------------------------------
+
+    def _make_folder(self) -> str:
+        '''
+        Crea la cartella inflight/ del processo già sotto lock: nasce con un
+        nome nascosto, ignorato dagli altri processi, e viene rinominata dopo.
+        '''
+        name = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        hidden = os.path.join(self.spool_dir, INFLIGHT, f".{name}")
+        os.makedirs(hidden)
+        self._folder_lock = _try_lock(os.path.join(hidden, LOCK_NAME))
+        os.rename(hidden, os.path.join(self.spool_dir, INFLIGHT, name))
+        return os.path.join(INFLIGHT, name)
+
+    def _path(self, message_id: str, folder: Optional[str] = None) -> str:
+        return os.path.join(self.spool_dir, self._folder if folder is None else folder, f"{message_id}.json")
+
+    def _save(self, message: Dict[str, Any]) -> None:
+        if not self.spool_dir:
+            return
+        path = self._path(message["id"])
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(message, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _remove(self, message_id: str, failed: bool = False) -> None:
+        if not self.spool_dir:
+            return
+        try:
+            if failed:
+                # I messaggi falliti restano consultabili in spool/failed
+                os.replace(self._path(message_id), self._path(message_id, "failed"))
+            else:
+                os.remove(self._path(message_id))
+        except OSError as e:
+            logger.warning(f"Could not update outbox spool for {message_id}: {e}")
+
+    def _orphans(self) -> List[Any]:
+        '''Cartelle inflight/ di processi terminati (lock libero), con il loro lock ora preso da noi.'''
+        inflight = os.path.join(self.spool_dir, INFLIGHT)
+        orphans = []
+        for name in os.listdir(inflight):
+            folder = os.path.join(inflight, name)
+            if name.startswith(".") or os.path.join(INFLIGHT, name) == self._folder or not os.path.isdir(folder):
+                continue
+            lock = _try_lock(os.path.join(folder, LOCK_NAME))
+            if lock is not None:
+                orphans.append((folder, lock))
+        return orphans
+
+    def _claim(self) -> int:
+        '''
+        Prende in carico i messaggi senza proprietario: quelli nella radice dello
+        spool e quelli di processi terminati. Il rename è atomico: se due worker
+        provano a prendere lo stesso messaggio, uno solo ci riesce.
+        '''
+        if not self.spool_dir:
+            return 0
+        self._claimed_at = time.monotonic()
+        orphans = self._orphans()
+        claimed = 0
+        for source in [self.spool_dir] + [folder for folder, _ in orphans]:
+            for name in os.listdir(source):
+                if not name.endswith(".json"):
+                    continue
+                target = os.path.join(self.spool_dir, self._folder, name)
+                try:
+                    os.rename(os.path.join(source, name), target)
+                except FileNotFoundError:
+                    # Preso da un altro worker
+                    continue
+                except OSError as e:
+                    logger.warning(f"Could not claim outbox entry {name}: {e}")
+                    continue
+                try:
+                    with open(target, "r", encoding="utf-8") as f:
+                        message = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Corrupted outbox entry {name}: {e}")
+                    continue
+                with self._lock:
+                    if "id" not in message or message["id"] in self._pending:
+                        continue
+                    self._pending[message["id"]] = message
+                    self._stats["claimed"] += 1
+                claimed += 1
+        for folder, lock in orphans:
+            try:
+                os.remove(os.path.join(folder, LOCK_NAME))
+                os.rmdir(folder)
+            except OSError:
+                # Contiene ancora file (es. .tmp di una scrittura interrotta)
+                pass
+            lock.close()
+        return claimed
+
+    def _release(self) -> None:
+        '''Rimette nella radice dello spool i messaggi non inviati, per gli altri worker.'''
+        if not self.spool_dir:
+            return
+        with self._lock:
+            message_ids, self._pending = list(self._pending), {}
+        for message_id in message_ids:
+            try:
+                os.replace(self._path(message_id), self._path(message_id, ""))
+            except OSError as e:
+                logger.warning(f"Could not release outbox entry {message_id}: {e}")
+        # Un nuovo start() li riprenderà in carico
+        self._claimed_at = float("-inf")
+
+    def _load_spool(self) -> None:
+        claimed = self._claim()
+        if claimed:
+            logger.info(f"Outbox: {claimed} unsent messages recovered from {self.spool_dir}")
+
+    # --- API usata dalle action -------------------------------------------
+
+    def enqueue(self, to: str, subject: str, body: str) -> str:
+        '''
+        Mette in coda un messaggio e restituisce il suo id.
+        Il messaggio è già su disco quando la funzione ritorna.
+        '''
+        now = time.time()
+        message = {
+            "id": uuid.uuid4().hex,
+            "to": to,
+            "subject": subject,
+            "body": body,
+            "created_at": now,
+            "attempts": 0,
+            "next_attempt": now,
+            "last_error": None,
+        }
+        self._save(message)
+        with self._lock:
+            self._pending[message["id"]] = message
+            self._stats["enqueued"] += 1
+        self._wake()
+        return message["id"]
+
+    def _wake(self) -> None:
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if self._task is None and running is not None:
+            # Senza actions.server il worker parte al primo messaggio
+            self.start()
+        if self._loop is None or self._wakeup is None:
+            return
+        if running is self._loop:
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    # --- Worker -----------------------------------------------------------
+
+    def _due(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            due = [m for m in self._pending.values() if m["next_attempt"] <= now]
+        due.sort(key=lambda m: m["created_at"])
+        return due[:self.batch_size]
+
+    def _next_wakeup(self) -> Optional[float]:
+        with self._lock:
+            if not self._pending:
+                return None
+            return min(m["next_attempt"] for m in self._pending.values())
+
+    def _build(self, message: Dict[str, Any]) -> str:
+        from email.mime.text import MIMEText
+
+        mime = MIMEText(message["body"])
+        mime["Subject"] = message["subject"]
+        mime["From"] = self.from_address
+        mime["To"] = message["to"]
+        return mime.as_string()
+
+    def _send_batch(self, batch: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+        '''Invia il lotto sulla connessione condivisa (gira in un thread).'''
+        import smtplib
+
+        results: List[Optional[Exception]] = []
+        for message in batch:
+            with metrics.span("smtp", action="outbox") as stage:
+                try:
+                    self.sender.send(self.from_address, message["to"], self._build(message))
+                    results.append(None)
+                except (smtplib.SMTPException, OSError) as e:
+                    stage.outcome = "error"
+                    results.append(e)
+            if results[-1] is not None and not _is_message_error(results[-1]):
+                # Connessione o autenticazione in errore: inutile proseguire il lotto
+                self.sender.close()
+                results.extend([results[-1]] * (len(batch) - len(results)))
+                break
+        return results
+
+    def _record(self, message: Dict[str, Any], error: Optional[Exception]) -> None:
+        if error is None:
+            with self._lock:
+                self._pending.pop(message["id"], None)
+                self._stats["sent"] += 1
+            self._remove(message["id"])
+            return
+
+        message["attempts"] += 1
+        message["last_error"] = f"{type(error).__name__}: {error}"
+        self.last_error = message["last_error"]
+
+        if _is_permanent(error) or message["attempts"] >= self.max_attempts:
+            logger.error(f"Giving up on mail {message['id']} to {message['to']}: {message['last_error']}")
+            with self._lock:
+                self._pending.pop(message["id"], None)
+                self._stats["failed"] += 1
+            try:
+                self._save(message)
+            except OSError:
+                pass
+            self._remove(message["id"], failed=True)
+            return
+
+        delay = min(self.max_retry_delay, self.retry_delay * 2 ** (message["attempts"] - 1))
+        message["next_attempt"] = time.time() + delay * random.uniform(0.9, 1.1)
+        with self._lock:
+            self._stats["retries"] += 1
+        try:
+            self._save(message)
+        except OSError as e:
+            logger.warning(f"Could not update outbox spool for {message['id']}: {e}")
+        logger.warning(f"Mail {message['id']} to {message['to']} failed "
+                       f"(attempt {message['attempts']}), retrying in {delay:.0f}s: {message['last_error']}")
+
+    async def process_due(self) -> int:
+        '''Invia un lotto di messaggi pronti; restituisce quanti erano nel lotto.'''
+        batch = self._due()
+        if not batch:
+            return 0
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(None, self._send_batch, batch)
+        for message, error in zip(batch, results):
+            self._record(message, error)
+        with self._lock:
+            self._stats["batches"] += 1
+        return len(batch)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                # Messaggi rimasti senza proprietario (es. worker terminato)
+                if self.spool_dir and time.monotonic() - self._claimed_at >= self.claim_interval:
+                    await loop.run_in_executor(None, self._claim)
+                while await self.process_due():
+                    pass
+            except Exception as e:
+                logger.exception(f"Outbox worker error: {e}")
+
+            # Si dorme fino al prossimo tentativo, a un nuovo messaggio o, con la
+            # connessione aperta e niente da fare, fino alla sua chiusura per inattività
+            next_attempt = self._next_wakeup()
+            timeout = None if next_attempt is None else max(0.0, next_attempt - time.time())
+            if self.sender.connected:
+                timeout = self.idle_timeout if timeout is None else min(timeout, self.idle_timeout)
+            if self.spool_dir:
+                timeout = self.claim_interval if timeout is None else min(timeout, self.claim_interval)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                if self.sender.connected and not self._due():
+                    await loop.run_in_executor(None, self.sender.close)
+
+    def start(self) -> None:
+        '''Avvia il worker sul loop corrente (i messaggi già in spool partono subito).'''
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        '''
+        Ferma il worker e chiude la connessione; i messaggi non inviati restano
+        in spool, a disposizione degli altri worker o del prossimo avvio.
+        '''
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.sender.close)
+        await loop.run_in_executor(None, self._release)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["pending"] = len(self._pending)
+        stats["connections"] = self.sender.connections
+        stats["connected"] = self.sender.connected
+        stats["last_error"] = self.last_error
+        return stats
+
+
+_outbox: Optional[Outbox] = None
+
+
+def smtp_configured() -> bool:
+    return bool(os.getenv("SMTP_EMAIL") and os.getenv("SMTP_PASSWORD"))
+
+
+def get_outbox() -> Outbox:
+    '''
+    Outbox condivisa dal processo, configurata da SMTP_SERVER, SMTP_PORT,
+    SMTP_EMAIL, SMTP_PASSWORD e OUTBOX_* (vedi .env.example).
+    '''
+    global _outbox
+    if _outbox is None:
+        sender_email = os.getenv("SMTP_EMAIL")
+        _outbox = Outbox(
+            sender=SmtpSender(
+                host=os.getenv("SMTP_SERVER", "smtp.gmail.com"),
+                port=int(os.getenv("SMTP_PORT", 465)),
+                user=sender_email,
+                password=os.getenv("SMTP_PASSWORD"),
+                starttls=os.getenv("SMTP_STARTTLS", "1") != "0",
+                timeout=float(os.getenv("SMTP_TIMEOUT", 30)),
+            ),
+            from_address=sender_email,
+            spool_dir=os.getenv("OUTBOX_DIR", os.path.join(".cache", "outbox")) or None,
+            batch_size=int(os.getenv("OUTBOX_BATCH_SIZE", 20)),
+            max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", 8)),
+            retry_delay=float(os.getenv("OUTBOX_RETRY_DELAY", 30)),
+            idle_timeout=float(os.getenv("SMTP_IDLE_TIMEOUT", 60)),
+        )
+    return _outbox
+
+
+@lifecycle.on_startup
+async def start_outbox() -> None:
+    # Riprende subito l'invio dei messaggi rimasti in spool dall'ultima esecuzione
+    if smtp_configured():
+        get_outbox().start()
+
+
+@lifecycle.on_shutdown
+async def stop_outbox() -> None:
+    if _outbox is not None:
+        await _outbox.stop()
+
+
+@lifecycle.route("/status/outbox")
+async def outbox_status() -> Dict[str, Any]:
+    if _outbox is None:
+        return {"enabled": smtp_configured()}
+    return {"enabled": True, **_outbox.stats()}
+
+
+@metrics.collector("outbox", counters=("enqueued", "sent", "failed", "retries", "batches", "connections",
+                                      "claimed"))
+def outbox_metrics() -> Optional[Dict[str, Any]]:
+    return _outbox.stats() if _outbox is not None else None
@@ -0,0 +1,205 @@
+# Cache dei contenuti delle pagine del sito UnivPM.
+#
+# URL_MAP associa decine di argomenti a pochissimi URL: invece di lanciare
+# Crawl4AI ad ogni domanda teniamo il markdown già pulito, con una scadenza
+# (TTL) configurabile. Due livelli:
+#   - memoria: LRU limitata a `max_entries` pagine;
+#   - disco: un file JSON per URL, sopravvive ai riavvii dell'action server.
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CachedPage:
+    '''
+    Contenuto pulito di una pagina con il momento in cui è stato scaricato.
+
+    `derived` contiene strutture calcolate dal contenuto (es. l'indice di
+    ricerca) che vivono e scadono insieme alla pagina.
+    '''
+
+    __slots__ = ("url", "content", "fetched_at", "content_hash", "derived")
+
+    def __init__(self, url: str, content: str, fetched_at: Optional[float] = None) -> None:
+        self.url = url
+        self.content = content
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+        self.content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        self.derived: Dict[str, Any] = {}
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+class PageCache:
+    '''
+    Cache a due livelli (memoria LRU + disco) indicizzata per URL.
+
+    :param ttl: secondi di validità di una pagina
+    :param max_entries: numero massimo di pagine tenute in memoria
+    :param directory: cartella del livello su disco (None per disattivarlo)
+    '''
+
+    def __init__(self, ttl: float, max_entries: int = 32, directory: Optional[str] = None) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.directory = directory
+        self._memory: "OrderedDict[str, CachedPage]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "writes": 0,
+            "hit_age_total": 0.0,
+            "hit_age_max": 0.0,
+        }
+
+        if directory:
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except OSError as e:
+                logger.warning(f"Page cache directory {directory} not usable, disk tier disabled: {e}")
+                self.directory = None
+
+    # --- Livello su disco -------------------------------------------------
+
+    def _path(self, url: str) -> str:
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    def _read_disk(self, url: str) -> Optional[CachedPage]:
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(url), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("url") != url:
+                return None
+            return CachedPage(url, data["content"], data["fetched_at"])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Corrupted page cache entry for {url}: {e}")
+            return None
+
+    def _write_disk(self, page: CachedPage) -> None:
+        if not self.directory:
+            return
+        path = self._path(page.url)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"url": page.url, "fetched_at": page.fetched_at, "content": page.content}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write page cache entry for {page.url}: {e}")
+
+    def _delete_disk(self, url: str) -> None:
+        if not self.directory:
+            return
+        try:
+            os.remove(self._path(url))
+        except OSError:
+            pass
+
+    # --- Livello in memoria -----------------------------------------------
+
+    def _remember(self, page: CachedPage) -> None:
+        self._memory[page.url] = page
+        self._memory.move_to_end(page.url)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _record_hit(self, tier: str, page: CachedPage) -> None:
+        age = page.age()
+        self._stats[f"{tier}_hits"] += 1
+        self._stats["hit_age_total"] += age
+        self._stats["hit_age_max"] = max(self._stats["hit_age_max"], age)
+
+    # --- API pubblica -----------------------------------------------------
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        """Restituisce la pagina se presente e non scaduta, altrimenti None."""
+        with self._lock:
+            page = self._memory.get(url)
+            if page is not None:
+                if page.age() <= self.ttl:
+                    self._memory.move_to_end(url)
+                    self._record_hit("memory", page)
+                    return page
+                del self._memory[url]
+
+            disk_page = self._read_disk(url)
+            if disk_page is not None and disk_page.age() <= self.ttl:
+                self._remember(disk_page)
+                self._record_hit("disk", disk_page)
+                return disk_page
+
+            if page is not None or disk_page is not None:
+                self._stats["expired"] += 1
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, url: str, content: str) -> CachedPage:
+        page = CachedPage(url, content)
+        with self._lock:
+            self._remember(page)
+            self._write_disk(page)
+            self._stats["writes"] += 1
+        return page
+
+    def invalidate(self, url: str) -> None:
+        with self._lock:
+            self._memory.pop(url, None)
+            self._delete_disk(url)
+
+    def stats(self) -> Dict[str, Any]:
+        '''Contatori hit/miss ed età delle pagine in memoria (in secondi).'''
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            hits = stats["memory_hits"] + stats["disk_hits"]
+            lookups = hits + stats["misses"]
+            stats["hit_ratio"] = hits / lookups if lookups else 0.0
+            stats["hit_age_avg"] = stats["hit_age_total"] / hits if hits else 0.0
+            stats["ttl"] = self.ttl
+            stats["entries"] = {url: round(p.age(), 1) for url, p in self._memory.items()}
+        return stats
+
+
+_cache: Optional[PageCache] = None
+
+
+def get_page_cache() -> PageCache:
+    '''
+    Cache condivisa dal processo, configurata da PAGE_CACHE_TTL (secondi),
+    PAGE_CACHE_SIZE (pagine in memoria) e PAGE_CACHE_DIR ("" disattiva il disco).
+    '''
+    global _cache
+    if _cache is None:
+        _cache = PageCache(
+            ttl=float(os.getenv("PAGE_CACHE_TTL", 6 * 3600)),
+            max_entries=int(os.getenv("PAGE_CACHE_SIZE", 32)),
+            directory=os.getenv("PAGE_CACHE_DIR", os.path.join(".cache", "pages")) or None,
+        )
+    return _cache
+
+
+@metrics.collector("page_cache", counters=("memory_hits", "disk_hits", "misses", "expired", "evictions",
+                                          "writes", "hit_age_total"))
+def page_cache_metrics() -> Optional[Dict[str, Any]]:
+    return _cache.stats() if _cache is not None else None
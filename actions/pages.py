@@ -0,0 +1,210 @@
+# Pagine del sito UnivPM usate da action_get_university_info.
+#
+# Qui vivono la mappa argomento -> URL e il recupero delle pagine (cache
+# prima, Crawl4AI solo se necessario), condivisi tra l'action e il refresher
+# in background (actions/refresher.py). La pulizia del markdown è in
+# actions/cleaner.py, lo snapshot su disco delle pagine in actions/snapshot.py.
+
+import os
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from . import metrics
+from .cleaner import clean_content
+from .matcher import Match, Matcher
+from .page_cache import CachedPage, get_page_cache
+from .crawler_pool import get_crawler_pool
+from .retrieval import Chunk, page_index
+from .answer_cache import get_answer_cache
+from .singleflight import SingleFlight
+from .snapshot import get_snapshot_store
+
+logger = logging.getLogger(__name__)
+
+
+class PageUnavailable(Exception):
+    """La pagina è stata scaricata ma non contiene testo utilizzabile."""
+
+
+# Sito dell'università: sovrascrivibile con UNIVPM_BASE_URL (es. un server locale
+# con le pagine salvate per i test di carico, vedi benchmarks/load_test.py)
+BASE_URL = os.getenv("UNIVPM_BASE_URL", "https://www.univpm.it").rstrip("/")
+
+# Mappa degli argomenti agli URL (IT + EN support)
+URL_MAP = {
+    # Italian keys
+    "tasse": f"{BASE_URL}/Entra/Tasse_e_contributi",
+    "tasse universitarie": f"{BASE_URL}/Entra/Tasse_e_contributi",
+    "retta": f"{BASE_URL}/Entra/Tasse_e_contributi",
+    "costo annuale": f"{BASE_URL}/Entra/Tasse_e_contributi",
+    "borse di studio": f"{BASE_URL}/Entra/Tasse_e_contributi",
+    "corsi": f"{BASE_URL}/Entra/Offerta_formativa",
+    "iscrizione": f"{BASE_URL}/Entra/Immatricolazioni",
+    "alloggi": f"{BASE_URL}/Entra/Servizi_agli_studenti/Alloggi",
+    "generale": f"{BASE_URL}/Entra",
+
+    # English keys (mapping to same URLs)
+    "fees": f"{BASE_URL}/Entra/Tasse_e_contributi",
+    "tuition fees": f"{BASE_URL}/Entra/Tasse_e_contributi",
+    "tuition fee": f"{BASE_URL}/Entra/Tasse_e_contributi",
+    "annual fee": f"{BASE_URL}/Entra/Tasse_e_contributi",
+    "prices": f"{BASE_URL}/Entra/Tasse_e_contributi",
+    "tuition": f"{BASE_URL}/Entra/Tasse_e_contributi",
+    "courses": f"{BASE_URL}/Entra/Offerta_formativa",
+    "degrees": f"{BASE_URL}/Entra/Offerta_formativa",
+    "enrollment": f"{BASE_URL}/Entra/Immatricolazioni",
+    "admission": f"{BASE_URL}/Entra/Immatricolazioni",
+    "housing": f"{BASE_URL}/Entra/Servizi_agli_studenti/Alloggi",
+    "accommodation": f"{BASE_URL}/Entra/Servizi_agli_studenti/Alloggi",
+    "scholarships": f"{BASE_URL}/Entra/Tasse_e_contributi", # Often related
+}
+
+
+# Argomento (anche scritto in modo approssimato) -> URL, costruito all'avvio
+_topics = Matcher(URL_MAP)
+
+
+def resolve_topic(*texts: Optional[str]) -> Optional[Match]:
+    '''
+    Trova l'argomento nel primo testo che ne contiene uno (es. lo slot `topic`,
+    poi il messaggio dell'utente). Il valore del risultato è l'URL.
+    '''
+    for text in texts:
+        match = _topics.match(text or "")
+        if match is not None:
+            return match
+    return None
+
+
+def unique_urls() -> List[str]:
+    """URL distinti di URL_MAP, nell'ordine in cui compaiono."""
+    return list(dict.fromkeys(URL_MAP.values()))
+
+
+async def crawl_page(url: str) -> str:
+    '''Scarica la pagina con un browser del pool e restituisce il markdown pulito.'''
+    with metrics.span("crawl"):
+        async with get_crawler_pool().lease() as crawler:
+            result = await crawler.arun(url=url)
+
+        extracted_text = result.markdown  # Otteniamo il markdown pulito
+        if not extracted_text:
+            raise PageUnavailable(url)
+    # Oltre PAGE_MAX_CHARS caratteri puliti il resto della pagina viene ignorato
+    with metrics.span("clean"):
+        return clean_content(extracted_text, max_chars=int(os.getenv("PAGE_MAX_CHARS", 200000)) or None)
+
+
+# Crawl in corso per URL: richieste contemporanee della stessa pagina ne
+# attendono uno solo
+crawls = SingleFlight()
+metrics.collector("page_crawls", counters=SingleFlight.COUNTERS)(crawls.stats)
+
+
+async def _fetch_page(url: str) -> CachedPage:
+    content = await crawl_page(url)
+    page = get_page_cache().put(url, content)
+    page_index(page)
+    # Le risposte ricavate da una versione precedente della pagina non valgono più
+    get_answer_cache().invalidate_page(url, page.content_hash)
+    await _update_semantic_index(page)
+    return page
+
+
+async def _update_semantic_index(page: CachedPage) -> None:
+    '''Riporta nell'indice semantico (se attivo) il nuovo contenuto della pagina.'''
+    from .embeddings import get_semantic_search
+
+    search = get_semantic_search()
+    if search is None:
+        return
+    try:
+        await search.update_page(page)
+    except Exception as e:
+        logger.warning(f"Embedding index not updated for {page.url} ({type(e).__name__}: {e})")
+
+
+async def fetch_page(url: str) -> CachedPage:
+    '''
+    Scarica sempre la pagina (ignorando la cache), aggiorna la cache e
+    prepara subito l'indice di ricerca, così l'action non deve costruirlo.
+    Se la stessa pagina è già in download si attende quel crawl.
+    '''
+    return await crawls.do(url, lambda: _fetch_page(url))
+
+
+async def get_page(url: str) -> CachedPage:
+    '''
+    Restituisce la pagina dalla cache se ancora valida, poi dallo snapshot su
+    disco se abbastanza recente (SNAPSHOT_MAX_AGE), altrimenti la scarica.
+    Se il crawl fallisce si ripiega sulla versione dello snapshot, anche vecchia.
+
+    Con il refresher attivo la cache è già calda e il crawl qui non avviene.
+    '''
+    with metrics.span("page_cache") as stage:
+        page = get_page_cache().get(url)
+        stage.outcome = "hit" if page is not None else "miss"
+    if page is not None:
+        return page
+
+    store = get_snapshot_store()
+    snapshot_page = None
+    if store is not None:
+        with metrics.span("snapshot") as stage:
+            snapshot_page = store.page(url)
+            if snapshot_page is None:
+                stage.outcome = "miss"
+            elif snapshot_page.age() > store.max_age:
+                stage.outcome = "stale"
+            else:
+                stage.outcome = "hit"
+        if stage.outcome == "hit":
+            return snapshot_page
+
+    try:
+        return await fetch_page(url)
+    except Exception as e:
+        if snapshot_page is None:
+            raise
+        logger.warning(f"Crawl of {url} failed ({type(e).__name__}: {e}), serving snapshot")
+        return snapshot_page
+
+
+async def semantic_passages(question: Optional[str], k: Optional[int] = None) -> List[Tuple[CachedPage, Chunk]]:
+    '''
+    Passaggi più pertinenti alla domanda tra tutte le pagine, dal più simile,
+    secondo l'indice semantico (actions/embeddings.py): per le domande senza
+    parole chiave di URL_MAP. Si leggono solo le pagine dei chunk trovati;
+    quelli di pagine cambiate dopo l'indicizzazione vengono scartati. Lista
+    vuota se la ricerca semantica è disattivata o non trova nulla.
+    '''
+    if not (question or "").strip():
+        return []
+    from .embeddings import get_semantic_search
+
+    search = get_semantic_search()
+    if search is None:
+        return []
+    with metrics.span("embeddings") as stage:
+        try:
+            hits = await search.search_index(question, k or int(os.getenv("RETRIEVAL_TOP_K", 4)))
+        except Exception as e:
+            logger.warning(f"Semantic search failed ({type(e).__name__}: {e})")
+            stage.outcome = "error"
+            return []
+        hits = [hit for hit in hits if hit.score > 0]
+        urls = list(dict.fromkeys(hit.url for hit in hits))
+        results = await asyncio.gather(*(get_page(url) for url in urls), return_exceptions=True)
+        pages = {url: page for url, page in zip(urls, results) if isinstance(page, CachedPage)}
+
+        passages = []
+        for hit in hits:
+            page = pages.get(hit.url)
+            if page is None or search.indexed_hash(hit.url) != page.content_hash:
+                continue
+            chunks = page_index(page).chunks
+            if hit.chunk_index < len(chunks):
+                passages.append((page, chunks[hit.chunk_index]))
+        stage.outcome = "hit" if passages else "miss"
+    return passages
@@ -0,0 +1,268 @@
+# Costruzione del prompt per action_get_university_info.
+#
+# Il prompt è ordinato dalla parte più stabile alla più variabile:
+#   1. istruzioni di sistema (uguali per tutti, per lingua);
+#   2. fonte e inizio della pagina (uguali per tutte le domande sulla pagina);
+#   3. passaggi pertinenti alla domanda (BM25);
+#   4. domanda dell'utente.
+# Così Ollama riusa il prefill già calcolato (KV cache) per 1 e 2 quando più
+# utenti chiedono della stessa pagina, e rielabora solo la coda. Le domande
+# senza argomento riconosciuto usano invece i passaggi più pertinenti di tutte
+# le pagine (ricerca semantica), ciascuno con la sua fonte (`build_passages`).
+# Le dimensioni sono misurate in token col tokenizer del modello (se
+# disponibile, altrimenti con una stima) e stanno dentro num_ctx lasciando
+# spazio alla risposta.
+# keep_alive tiene il modello in memoria tra una richiesta e l'altra.
+
+import os
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from . import metrics
+from .page_cache import CachedPage
+from .retrieval import Chunk, estimate_tokens, page_index
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPTS = {
+    "it": ("Sei un assistente utile per l'Università UnivPM. Rispondi in ITALIANO.\n"
+           "Rispondi alla domanda dell'utente usando SOLO il contesto fornito."),
+    "en": ("You are a helpful assistant for UnivPM University. Answer in ENGLISH.\n"
+           "Answer the user's question using ONLY the context provided."),
+}
+INSTRUCTIONS = {
+    "it": "RISPOSTA (sii conciso, in italiano, e cita la fonte se utile):",
+    "en": "ANSWER (be concise, in English, and cite the source if useful):",
+}
+
+# Token aggiunti dal template del modello (ruoli, separatori) attorno a system e prompt
+TEMPLATE_OVERHEAD = 32
+# La domanda dell'utente non può occupare il contesto destinato alla pagina
+QUESTION_MAX_CHARS = 1000
+# Tokenizer del modello predefinito (OLLAMA_MODEL=qwen3:0.6b)
+DEFAULT_TOKENIZER = "Qwen/Qwen3-0.6B"
+
+PROMPT_TOKENS = metrics.REGISTRY.register(metrics.Histogram(
+    "llm_prompt_tokens", "Token del prompt inviato al modello.", ("part",),
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192),
+))
+
+
+def load_token_counter(source: Optional[str]) -> Callable[[str], int]:
+    '''
+    Contatore di token col tokenizer del modello (libreria `tokenizers`):
+    `source` è un file tokenizer.json o un id Hugging Face (es. "Qwen/Qwen3-0.6B").
+    Se vuoto o non caricabile (libreria mancante, niente rete) si usa la
+    stima di retrieval.py.
+    '''
+    if source:
+        try:
+            from tokenizers import Tokenizer
+
+            if os.path.exists(source):
+                tokenizer = Tokenizer.from_file(source)
+            else:
+                tokenizer = Tokenizer.from_pretrained(source)
+            return lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+        except Exception as e:
+            logger.warning(f"Tokenizer {source} not available, falling back to estimate: {e}")
+    return estimate_tokens
+
+
+class Prompt(NamedTuple):
+    system: str
+    prompt: str
+    context: str         # testo della pagina incluso (chiave della cache delle risposte)
+    prefix_tokens: int   # system + inizio pagina: la parte riutilizzabile tra utenti
+    tokens: int
+    options: Dict[str, Any]
+
+    def fields(self) -> Dict[str, Any]:
+        '''Campi della richiesta /api/generate oltre al prompt.'''
+        return {"system": self.system, **self.options}
+
+
+class PromptBuilder:
+    '''
+    :param count_tokens: funzione testo -> numero di token
+    :param num_ctx: finestra di contesto chiesta a Ollama (fissa: cambiarla ricarica il modello)
+    :param max_output_tokens: token riservati alla risposta
+    :param prefix_tokens: token massimi dell'inizio pagina nel prefisso stabile
+    :param context_tokens: token massimi di testo della pagina (prefisso + passaggi)
+    :param top_k: passaggi pertinenti cercati per domanda
+    :param keep_alive: quanto Ollama tiene il modello in memoria (es. "30m", -1 per sempre)
+    '''
+
+    def __init__(self,
+                 count_tokens: Callable[[str], int] = estimate_tokens,
+                 num_ctx: int = 4096,
+                 max_output_tokens: int = 512,
+                 prefix_tokens: int = 600,
+                 context_tokens: int = 1600,
+                 top_k: int = 4,
+                 keep_alive: Union[str, int, None] = "30m") -> None:
+        self.count_tokens = count_tokens
+        self.num_ctx = num_ctx
+        self.max_output_tokens = max_output_tokens
+        self.prefix_tokens = min(prefix_tokens, context_tokens)
+        self.context_tokens = context_tokens
+        self.top_k = top_k
+        self.keep_alive = keep_alive
+
+    def options(self) -> Dict[str, Any]:
+        fields: Dict[str, Any] = {"options": {"num_ctx": self.num_ctx}}
+        if self.keep_alive is not None:
+            fields["keep_alive"] = self.keep_alive
+        return fields
+
+    def _chunk_tokens(self, page: CachedPage, chunk: Chunk) -> int:
+        counts = page.derived.setdefault("chunk_tokens", {})
+        if chunk.index not in counts:
+            counts[chunk.index] = self.count_tokens(chunk.text)
+        return counts[chunk.index]
+
+    def lead(self, page: CachedPage) -> Tuple[str, int, int]:
+        '''
+        Inizio della pagina entro `prefix_tokens`: (testo, token, chunk coperti).
+        Dipende solo dal contenuto, quindi è calcolato una volta per pagina.
+        '''
+        key = ("prompt_lead", self.prefix_tokens)
+        cached = page.derived.get(key)
+        if cached is not None:
+            return cached
+
+        chunks = page_index(page).chunks
+        text, tokens, covered = "", 0, 0
+        for chunk in chunks:
+            candidate = page.content[:chunk.end].strip()
+            cost = self.count_tokens(candidate)
+            if cost > self.prefix_tokens:
+                break
+            text, tokens, covered = candidate, cost, chunk.index + 1
+        if not text and chunks:
+            # Nemmeno il primo chunk entra: lo tronchiamo (circa 4 caratteri per token)
+            text = chunks[0].text[:self.prefix_tokens * 4]
+            tokens, covered = self.count_tokens(text), 1
+        page.derived[key] = (text, tokens, covered)
+        return page.derived[key]
+
+    def build(self, page: CachedPage, question: str, language: str) -> Prompt:
+        language = language if language in SYSTEM_PROMPTS else "en"
+        question = (question or "").strip()[:QUESTION_MAX_CHARS]
+        system = SYSTEM_PROMPTS[language]
+        lead, lead_tokens, covered = self.lead(page)
+
+        header = f"SOURCE: {page.url}\n\nCONTEXT:\n"
+        tail = f"\n\nUSER QUESTION: {question}\n\n{INSTRUCTIONS[language]}"
+        fixed = self.count_tokens(system) + self.count_tokens(header) + self.count_tokens(tail) + TEMPLATE_OVERHEAD
+        budget = min(self.context_tokens - lead_tokens,
+                     self.num_ctx - self.max_output_tokens - fixed - lead_tokens)
+
+        # Passaggi pertinenti che non sono già nell'inizio pagina, entro il budget
+        passages: List[Chunk] = []
+        for _, chunk in page_index(page).search(question, self.top_k):
+            if chunk.index < covered:
+                continue
+            cost = self._chunk_tokens(page, chunk)
+            if cost > budget:
+                continue
+            passages.append(chunk)
+            budget -= cost
+        passages.sort(key=lambda c: c.start)
+
+        context = lead
+        if passages:
+            context += "\n[...]\n" + "\n[...]\n".join(c.text for c in passages)
+        prefix_tokens = self.count_tokens(system) + self.count_tokens(header) + lead_tokens
+        tokens = fixed + self.count_tokens(context)
+        if tokens + self.max_output_tokens > self.num_ctx:
+            logger.warning(f"Prompt of {tokens} tokens leaves less than {self.max_output_tokens} "
+                           f"for the answer with num_ctx={self.num_ctx}")
+
+        PROMPT_TOKENS.observe(prefix_tokens, part="prefix")
+        PROMPT_TOKENS.observe(tokens, part="total")
+        return Prompt(system, f"{header}{context}{tail}", context, prefix_tokens, tokens, self.options())
+
+    def build_passages(self, passages: List[Tuple[CachedPage, Chunk]], question: str, language: str) -> Prompt:
+        '''
+        Prompt con i passaggi di più pagine (dal più pertinente), raggruppati
+        per pagina sotto la rispettiva fonte, entro lo stesso budget di token.
+        '''
+        language = language if language in SYSTEM_PROMPTS else "en"
+        question = (question or "").strip()[:QUESTION_MAX_CHARS]
+        system = SYSTEM_PROMPTS[language]
+
+        header = "CONTEXT:\n"
+        tail = f"\n\nUSER QUESTION: {question}\n\n{INSTRUCTIONS[language]}"
+        fixed = self.count_tokens(system) + self.count_tokens(header) + self.count_tokens(tail) + TEMPLATE_OVERHEAD
+        budget = min(self.context_tokens, self.num_ctx - self.max_output_tokens - fixed)
+
+        # Pagine nell'ordine del loro passaggio più pertinente
+        by_url: Dict[str, List[Chunk]] = {}
+        for page, chunk in passages:
+            cost = self._chunk_tokens(page, chunk)
+            if page.url not in by_url:
+                cost += self.count_tokens(f"SOURCE: {page.url}\n")
+            if cost > budget:
+                continue
+            by_url.setdefault(page.url, []).append(chunk)
+            budget -= cost
+
+        sections = []
+        for url, chunks in by_url.items():
+            chunks.sort(key=lambda c: c.start)
+            sections.append(f"SOURCE: {url}\n" + "\n[...]\n".join(c.text for c in chunks))
+        context = "\n\n".join(sections)
+        prefix_tokens = self.count_tokens(system)
+        tokens = fixed + self.count_tokens(context)
+
+        PROMPT_TOKENS.observe(prefix_tokens, part="prefix")
+        PROMPT_TOKENS.observe(tokens, part="total")
+        return Prompt(system, f"{header}{context}{tail}", context, prefix_tokens, tokens, self.options())
+
+
+_builder: Optional[PromptBuilder] = None
+_builder_lock = threading.Lock()
+
+
+def _keep_alive(value: str) -> Union[str, int, None]:
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def get_prompt_builder() -> PromptBuilder:
+    '''
+    Builder condiviso, configurato da OLLAMA_NUM_CTX, OLLAMA_KEEP_ALIVE,
+    OLLAMA_MAX_TOKENS, PROMPT_PREFIX_TOKENS, PROMPT_CONTEXT_TOKENS,
+    RETRIEVAL_TOP_K e PROMPT_TOKENIZER (vedi .env.example).
+    '''
+    global _builder
+    if _builder is None:
+        with _builder_lock:
+            if _builder is None:
+                _builder = PromptBuilder(
+                    count_tokens=load_token_counter(os.getenv("PROMPT_TOKENIZER", DEFAULT_TOKENIZER)),
+                    num_ctx=int(os.getenv("OLLAMA_NUM_CTX", 4096)),
+                    max_output_tokens=int(os.getenv("OLLAMA_MAX_TOKENS", 512)),
+                    prefix_tokens=int(os.getenv("PROMPT_PREFIX_TOKENS", 600)),
+                    context_tokens=int(os.getenv("PROMPT_CONTEXT_TOKENS", 1600)),
+                    top_k=int(os.getenv("RETRIEVAL_TOP_K", 4)),
+                    keep_alive=_keep_alive(os.getenv("OLLAMA_KEEP_ALIVE", "30m")),
+                )
+    return _builder
+
+
+async def load_prompt_builder() -> PromptBuilder:
+    '''
+    Come `get_prompt_builder`, ma la prima creazione (lettura o download del
+    tokenizer, anche decine di secondi senza rete) avviene fuori dall'event loop.
+    '''
+    if _builder is None:
+        return await asyncio.get_running_loop().run_in_executor(None, get_prompt_builder)
+    return _builder
@@ -0,0 +1,170 @@
+# Pre-crawl e aggiornamento periodico delle pagine di URL_MAP.
+#
+# Invece di far pagare all'utente il crawl "a freddo", l'action server scarica
+# tutte le pagine (URL deduplicati) all'avvio e le riscarica ad intervalli
+# regolari, con un po' di jitter per non colpire il sito tutte insieme.
+# I contenuti finiscono nella cache delle pagine: l'action legge solo quella.
+
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from . import lifecycle
+
+logger = logging.getLogger(__name__)
+
+
+class PageRefresher:
+    '''
+    Scheduler in background che aggiorna un insieme di URL.
+
+    :param urls: URL da mantenere aggiornati (i duplicati vengono ignorati)
+    :param fetch: coroutine che scarica un URL e aggiorna la cache
+    :param interval: secondi tra due aggiornamenti dello stesso URL
+    :param jitter: frazione di `interval` usata come variazione casuale (+/-)
+    :param concurrency: crawl contemporanei al massimo
+    :param retry_delay: attesa iniziale prima di riprovare un URL fallito
+    '''
+
+    def __init__(self,
+                 urls: Iterable[str],
+                 fetch: Callable[[str], Awaitable[Any]],
+                 interval: float = 3600.0,
+                 jitter: float = 0.1,
+                 concurrency: int = 1,
+                 retry_delay: float = 60.0) -> None:
+        self.urls: List[str] = list(dict.fromkeys(urls))
+        self.interval = interval
+        self.jitter = jitter
+        self.concurrency = concurrency
+        self.retry_delay = retry_delay
+        self._fetch = fetch
+
+        self._status: Dict[str, Dict[str, Any]] = {
+            url: {
+                "last_refresh": None,
+                "last_attempt": None,
+                "last_error": None,
+                "duration": None,
+                "refreshes": 0,
+                "failures": 0,
+                "consecutive_failures": 0,
+                "next_refresh": None,
+            }
+            for url in self.urls
+        }
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _next_delay(self, url: str) -> float:
+        base = self.interval
+        failures = self._status[url]["consecutive_failures"]
+        if failures:
+            # Dopo un errore si riprova prima, con backoff esponenziale
+            base = min(self.interval, self.retry_delay * 2 ** (failures - 1))
+        spread = base * self.jitter
+        return max(0.0, base + random.uniform(-spread, spread))
+
+    async def refresh(self, url: str) -> bool:
+        """Aggiorna subito un URL e ne registra l'esito."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        status = self._status[url]
+        async with self._semaphore:
+            start = time.monotonic()
+            status["last_attempt"] = time.time()
+            try:
+                await self._fetch(url)
+            except Exception as e:
+                status["failures"] += 1
+                status["consecutive_failures"] += 1
+                status["last_error"] = f"{type(e).__name__}: {e}"
+                logger.warning(f"Refresh of {url} failed: {e}")
+                return False
+            finally:
+                status["duration"] = time.monotonic() - start
+
+        status["last_refresh"] = time.time()
+        status["refreshes"] += 1
+        status["consecutive_failures"] = 0
+        status["last_error"] = None
+        return True
+
+    async def refresh_all(self) -> None:
+        await asyncio.gather(*(self.refresh(url) for url in self.urls))
+
+    async def _run(self, url: str) -> None:
+        while True:
+            await self.refresh(url)
+            delay = self._next_delay(url)
+            self._status[url]["next_refresh"] = time.time() + delay
+            await asyncio.sleep(delay)
+
+    def start(self) -> None:
+        '''Avvia un task per URL: primo crawl immediato, poi ogni `interval` +/- jitter.'''
+        if self._tasks:
+            return
+        self._tasks = [asyncio.ensure_future(self._run(url)) for url in self.urls]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Stato per URL: ultimo aggiornamento riuscito, errori e prossimo aggiornamento."""
+        return {url: dict(status) for url, status in self._status.items()}
+
+
+_refresher: Optional[PageRefresher] = None
+
+
+def get_refresher() -> PageRefresher:
+    '''
+    Refresher condiviso per gli URL di URL_MAP, configurato da
+    PAGE_REFRESH_INTERVAL (secondi) e PAGE_REFRESH_JITTER (frazione).
+    '''
+    global _refresher
+    if _refresher is None:
+        from .pages import fetch_page, unique_urls
+
+        _refresher = PageRefresher(
+            urls=unique_urls(),
+            fetch=fetch_page,
+            interval=float(os.getenv("PAGE_REFRESH_INTERVAL", 3600)),
+            jitter=float(os.getenv("PAGE_REFRESH_JITTER", 0.1)),
+            concurrency=int(os.getenv("CRAWLER_POOL_SIZE", 2)),
+        )
+    return _refresher
+
+
+@lifecycle.on_startup
+async def start_refresher() -> None:
+    if os.getenv("PAGE_REFRESH_ENABLED", "1") != "0":
+        get_refresher().start()
+
+
+@lifecycle.on_shutdown
+async def stop_refresher() -> None:
+    if _refresher is not None:
+        await _refresher.stop()
+
+
+@lifecycle.route("/status/pages")
+async def pages_status() -> Dict[str, Any]:
+    from .page_cache import get_page_cache
+
+    cache_ages = get_page_cache().stats()["entries"]
+    if _refresher is None:
+        return {"enabled": False, "pages": {}, "cache_ages": cache_ages}
+    return {
+        "enabled": True,
+        "interval": _refresher.interval,
+        "pages": _refresher.status(),
+        "cache_ages": cache_ages,
+    }
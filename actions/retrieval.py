@@ -0,0 +1,168 @@
+# Recupero dei passaggi rilevanti di una pagina (BM25).
+#
+# Invece di troncare la pagina ai primi 8000 caratteri, la dividiamo in chunk
+# sovrapposti, costruiamo un indice lessicale BM25 (una volta per contenuto,
+# salvato accanto alla pagina in cache) e mandiamo al modello solo i chunk più
+# pertinenti alla domanda, entro un budget di token.
+
+import os
+import re
+import math
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .page_cache import CachedPage
+
+# Parole troppo frequenti per essere utili (IT + EN)
+STOPWORDS = frozenset("""
+a ad al alla alle allo agli ai anche che chi ci come con da dal dalla dalle dei del della delle dello
+degli di e ed gli ha hanno ho i il in la le lo ma mi ne nei nel nella nelle non o per più quale quali
+quanto quanta sono su sul sulla tra fra un una uno si se sei è cosa dove quando mio mia tuo tua
+an and are as at be by can do does for from has have how i if in is it its me my of on or our
+the their there this to was what when where which who why will with you your
+""".split())
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Stima grossolana dei token (circa 4 caratteri per token)."""
+    return (len(text) + 3) // 4
+
+
+class Chunk(NamedTuple):
+    index: int
+    start: int
+    end: int
+    text: str
+
+
+def _split_point(text: str, start: int, limit: int) -> int:
+    '''Sceglie dove chiudere un chunk: fine paragrafo, fine frase o spazio, non prima di metà chunk.'''
+    floor = start + (limit - start) // 2
+    for sep in ("\n\n", "\n", ". ", " "):
+        cut = text.rfind(sep, floor, limit)
+        if cut != -1:
+            return cut + len(sep)
+    return limit
+
+
+def chunk_text(text: str, chunk_size: int = 800, overlap: int = 150) -> List[Chunk]:
+    '''
+    Divide il testo in chunk di circa `chunk_size` caratteri, sovrapposti di
+    `overlap` caratteri, preferendo i confini di paragrafo e di frase.
+    '''
+    if overlap >= chunk_size:
+        raise ValueError("overlap must be smaller than chunk_size")
+
+    chunks: List[Chunk] = []
+    n = len(text)
+    pos = 0
+    while pos < n:
+        end = n if pos + chunk_size >= n else _split_point(text, pos, pos + chunk_size)
+        piece = text[pos:end].strip()
+        if piece:
+            chunks.append(Chunk(len(chunks), pos, end, piece))
+        if end >= n:
+            break
+
+        # Il chunk successivo riparte `overlap` caratteri prima, su un confine di parola
+        next_pos = end - overlap
+        space = text.find(" ", next_pos, end)
+        next_pos = space + 1 if space != -1 else next_pos
+        pos = max(next_pos, pos + 1)
+    return chunks
+
+
+class BM25Index:
+    '''Indice BM25 in memoria su una lista di chunk.'''
+
+    def __init__(self, chunks: List[Chunk], k1: float = 1.5, b: float = 0.75) -> None:
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+
+        self._tf: List[Counter] = [Counter(tokenize(c.text)) for c in chunks]
+        self._len = [sum(tf.values()) for tf in self._tf]
+        self._avg_len = (sum(self._len) / len(self._len)) if self._len else 0.0
+
+        df: Counter = Counter()
+        for tf in self._tf:
+            df.update(tf.keys())
+        n = len(chunks)
+        self._idf: Dict[str, float] = {
+            term: math.log(1 + (n - freq + 0.5) / (freq + 0.5)) for term, freq in df.items()
+        }
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[float, Chunk]]:
+        '''Restituisce i `k` chunk con punteggio più alto (solo quelli con punteggio > 0).'''
+        terms = [t for t in set(tokenize(query)) if t in self._idf]
+        if not terms:
+            return []
+
+        scored = []
+        for i, tf in enumerate(self._tf):
+            norm = self.k1 * (1 - self.b + self.b * self._len[i] / self._avg_len) if self._avg_len else self.k1
+            score = 0.0
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self._idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            if score > 0:
+                scored.append((score, self.chunks[i]))
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored[:k]
+
+
+def page_index(page: CachedPage,
+               chunk_size: Optional[int] = None,
+               overlap: Optional[int] = None) -> BM25Index:
+    '''
+    Indice BM25 della pagina, costruito al primo uso e conservato insieme al
+    contenuto in cache (si ricostruisce solo quando il contenuto cambia).
+    '''
+    index = page.derived.get("bm25")
+    if index is None:
+        # Chunk già calcolati con i parametri di default (es. dagli offset dello snapshot)
+        chunks = page.derived.get("chunks") if chunk_size is None and overlap is None else None
+        if chunks is not None:
+            index = BM25Index(chunks)
+            page.derived["bm25"] = index
+            return index
+        chunk_size = chunk_size or int(os.getenv("RETRIEVAL_CHUNK_SIZE", 800))
+        overlap = overlap if overlap is not None else int(os.getenv("RETRIEVAL_CHUNK_OVERLAP", 150))
+        index = BM25Index(chunk_text(page.content, chunk_size, overlap))
+        page.derived["bm25"] = index
+    return index
+
+
+def select_context(index: BM25Index, question: str, k: int = 4, token_budget: int = 1000) -> str:
+    '''
+    Sceglie i chunk più pertinenti alla domanda entro `token_budget` token e li
+    restituisce nell'ordine in cui compaiono nella pagina. Se nessun chunk
+    contiene termini della domanda si usa l'inizio della pagina.
+    '''
+    ranked = [chunk for _, chunk in index.search(question or "", k)]
+    if not ranked:
+        ranked = index.chunks[:k]
+
+    selected: List[Chunk] = []
+    used = 0
+    for chunk in ranked:
+        cost = estimate_tokens(chunk.text)
+        if used + cost > token_budget:
+            continue
+        selected.append(chunk)
+        used += cost
+
+    if not selected and ranked:
+        # Nemmeno un chunk entra nel budget: tronchiamo il migliore
+        return ranked[0].text[:token_budget * 4]
+
+    selected.sort(key=lambda c: c.start)
+    return "\n[...]\n".join(c.text for c in selected)
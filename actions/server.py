@@ -0,0 +1,72 @@
+# Avvio dell'action server con le risorse condivise.
+#
+# Equivalente a `python -m rasa_sdk --actions actions`, ma aggancia all'app
+# Sanic gli hook di actions/lifecycle.py, così browser, sessioni e pool vengono
+# creati all'avvio e chiusi in modo pulito allo spegnimento.
+#
+#     python -m actions.server [--port 5055] [-v]
+
+import os
+import logging
+
+from . import lifecycle
+
+logger = logging.getLogger(__name__)
+
+
+async def _after_server_start(app, loop) -> None:
+    await lifecycle.startup()
+
+
+async def _before_server_stop(app, loop) -> None:
+    await lifecycle.shutdown()
+
+
+def _make_handler(handler):
+    async def endpoint(request):
+        from sanic import response
+
+        result = await handler()
+        status = 200
+        if isinstance(result, tuple):
+            result, status = result
+        if isinstance(result, str):
+            return response.text(result, status=status)
+        return response.json(result, status=status)
+
+    return endpoint
+
+
+def create_app(action_package: str = "actions", cors_origins="*"):
+    from rasa_sdk import endpoint
+
+    app = endpoint.create_app(action_package, cors_origins=cors_origins)
+    app.register_listener(_after_server_start, "after_server_start")
+    app.register_listener(_before_server_stop, "before_server_stop")
+
+    for path, handler in lifecycle.routes().items():
+        app.add_route(_make_handler(handler), path, methods=["GET"], name=handler.__name__)
+    return app
+
+
+def main() -> None:
+    from rasa_sdk import endpoint, utils
+
+    parser = endpoint.create_argument_parser()
+    args = parser.parse_args()
+
+    utils.configure_colored_logging(args.loglevel)
+    utils.update_sanic_log_level()
+
+    app = create_app(args.actions or "actions", cors_origins=args.cors)
+
+    logger.info(f"Action endpoint is up and running on port {args.port}")
+    app.run(
+        host=os.environ.get("SANIC_HOST", "0.0.0.0"),
+        port=args.port,
+        workers=utils.number_of_sanic_workers(),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# Deduplicazione delle operazioni in corso ("single flight").
+#
+# Quando esce un avviso di scadenza decine di studenti chiedono la stessa cosa
+# nello stesso momento: senza coordinamento ognuno lancerebbe il proprio crawl
+# e la propria generazione. Con SingleFlight la prima richiesta per una chiave
+# esegue il lavoro e le altre, arrivate mentre è in corso, ne attendono
+# il risultato (o l'eccezione).
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    '''Esegue al più un'operazione alla volta per chiave, condividendone il risultato.'''
+
+    # Statistiche che crescono soltanto (counter nelle metriche)
+    COUNTERS = ("executions", "shared")
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._stats = {"executions": 0, "shared": 0}
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Evita il warning "exception was never retrieved" se tutti hanno rinunciato
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        '''
+        Esegue `fn()` se non c'è già un'operazione in corso per `key`,
+        altrimenti attende quella esistente.
+
+        L'operazione gira in un task separato: se chi l'ha avviata viene
+        cancellato, gli altri in attesa ricevono comunque il risultato.
+        '''
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self._stats["executions"] += 1
+        else:
+            self._stats["shared"] += 1
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._calls)
+        return stats
@@ -0,0 +1,326 @@
+# Snapshot compresso su disco delle pagine UnivPM.
+#
+# `python -m actions.snapshot build` scarica tutte le pagine di URL_MAP e le
+# scrive in un unico file versionato: un'intestazione JSON (URL, data, hash,
+# offset dei chunk di ricerca) seguita da un blocco zlib per pagina. L'action
+# server lo apre con mmap: nessuna rete all'avvio, nessuna lettura completa
+# del file (si decomprime solo la pagina richiesta, direttamente dalla memoria
+# mappata) e, con più processi worker, i byte del file stanno una volta sola
+# nella page cache del sistema operativo. Se il sito è lento o irraggiungibile
+# le risposte partono dallo snapshot.
+#
+# Formato (interi little-endian):
+#   MAGIC (8 byte) | versione formato (u32) | lunghezza intestazione (u32)
+#   intestazione JSON (utf-8) | blocchi delle pagine
+
+import os
+import sys
+import mmap
+import json
+import time
+import zlib
+import struct
+import asyncio
+import logging
+import argparse
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from .page_cache import CachedPage
+from .retrieval import Chunk, chunk_text
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"UPMSNAP\0"
+FORMAT_VERSION = 1
+_PREFIX = struct.Struct("<8sII")
+
+
+class SnapshotError(Exception):
+    """File di snapshot non valido, di una versione non supportata o corrotto."""
+
+
+def _chunk_params() -> Dict[str, int]:
+    return {
+        "chunk_size": int(os.getenv("RETRIEVAL_CHUNK_SIZE", 800)),
+        "overlap": int(os.getenv("RETRIEVAL_CHUNK_OVERLAP", 150)),
+    }
+
+
+def write_snapshot(path: str, pages: Iterable[CachedPage], level: int = 9,
+                   chunk_size: int = 800, overlap: int = 150) -> Dict[str, Any]:
+    '''
+    Scrive lo snapshot in modo atomico (file temporaneo + rename): i processi
+    che hanno già mappato il file precedente continuano a leggerlo.
+    Restituisce l'intestazione scritta.
+    '''
+    entries: List[Dict[str, Any]] = []
+    blocks: List[bytes] = []
+    offset = 0
+    for page in pages:
+        raw = page.content.encode("utf-8")
+        block = zlib.compress(raw, level)
+        chunks = chunk_text(page.content, chunk_size, overlap)
+        entries.append({
+            "url": page.url,
+            "fetched_at": page.fetched_at,
+            "content_hash": page.content_hash,
+            "offset": offset,
+            "length": len(block),
+            "raw_length": len(raw),
+            "crc32": zlib.crc32(raw),
+            "chunks": [[c.start, c.end] for c in chunks],
+        })
+        blocks.append(block)
+        offset += len(block)
+
+    header = {
+        "created_at": time.time(),
+        "chunk_size": chunk_size,
+        "overlap": overlap,
+        "pages": entries,
+    }
+    encoded = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(encoded)))
+        f.write(encoded)
+        for block in blocks:
+            f.write(block)
+    os.replace(tmp_path, path)
+    return header
+
+
+class Snapshot:
+    '''
+    Snapshot aperto in sola lettura tramite mmap.
+
+    Le pagine vengono decompresse al primo accesso e poi riusate (con il loro
+    indice di ricerca) finché il file non cambia.
+    '''
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size < _PREFIX.size:
+                raise SnapshotError(f"{path}: file too short")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        magic, version, header_len = _PREFIX.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise SnapshotError(f"{path}: not a page snapshot")
+        if version != FORMAT_VERSION:
+            self.close()
+            raise SnapshotError(f"{path}: unsupported snapshot format {version} (expected {FORMAT_VERSION})")
+        start = _PREFIX.size
+        try:
+            self.header = json.loads(bytes(self._mmap[start:start + header_len]).decode("utf-8"))
+        except ValueError as e:
+            self.close()
+            raise SnapshotError(f"{path}: corrupted header: {e}") from e
+        self._data_start = start + header_len
+        self._entries = {entry["url"]: entry for entry in self.header["pages"]}
+        self._pages: Dict[str, CachedPage] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def created_at(self) -> float:
+        return self.header["created_at"]
+
+    def urls(self) -> List[str]:
+        return list(self._entries)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._entries
+
+    def block(self, url: str) -> memoryview:
+        '''Blocco compresso della pagina, senza copie (vista sulla memoria mappata).'''
+        entry = self._entries[url]
+        start = self._data_start + entry["offset"]
+        return memoryview(self._mmap)[start:start + entry["length"]]
+
+    def read(self, url: str) -> str:
+        entry = self._entries[url]
+        view = self.block(url)
+        try:
+            raw = zlib.decompress(view)
+        except zlib.error as e:
+            raise SnapshotError(f"{self.path}: corrupted block for {url}: {e}") from e
+        finally:
+            view.release()
+        if len(raw) != entry["raw_length"] or zlib.crc32(raw) != entry["crc32"]:
+            raise SnapshotError(f"{self.path}: checksum mismatch for {url}")
+        return raw.decode("utf-8")
+
+    def page(self, url: str) -> Optional[CachedPage]:
+        '''La pagina come CachedPage (con i chunk già calcolati), o None se assente.'''
+        if url not in self._entries:
+            return None
+        with self._lock:
+            page = self._pages.get(url)
+            if page is None:
+                entry = self._entries[url]
+                page = CachedPage(url, self.read(url), entry["fetched_at"])
+                params = _chunk_params()
+                if params == {"chunk_size": self.header["chunk_size"], "overlap": self.header["overlap"]}:
+                    # Stessi parametri di chunking: l'indice si costruisce dagli offset salvati
+                    page.derived["chunks"] = [
+                        Chunk(i, start, end, page.content[start:end].strip())
+                        for i, (start, end) in enumerate(entry["chunks"])
+                    ]
+                self._pages[url] = page
+            return page
+
+    def close(self) -> None:
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Una vista è ancora in uso: la mappatura si chiude quando viene rilasciata
+            pass
+
+
+class SnapshotStore:
+    '''
+    Snapshot corrente di un percorso: si riapre da solo quando il file viene
+    sostituito (controllo al più ogni `check_interval` secondi).
+
+    :param max_age: oltre questa età (secondi) le pagine si usano solo se il crawl fallisce
+    '''
+
+    def __init__(self, path: str, max_age: float = 7 * 86400, check_interval: float = 10.0) -> None:
+        self.path = path
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self._snapshot: Optional[Snapshot] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[Snapshot]:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                self._snapshot = None
+                return None
+            signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if self._snapshot is None or self._snapshot.signature != signature:
+                try:
+                    self._snapshot = Snapshot(self.path)
+                    logger.info(f"Loaded page snapshot {self.path} ({len(self._snapshot.urls())} pages)")
+                except (OSError, SnapshotError) as e:
+                    logger.warning(f"Page snapshot {self.path} not usable: {e}")
+                    self._snapshot = None
+            return self._snapshot
+
+    def page(self, url: str) -> Optional[CachedPage]:
+        snapshot = self.current()
+        if snapshot is None:
+            return None
+        try:
+            return snapshot.page(url)
+        except SnapshotError as e:
+            logger.warning(str(e))
+            return None
+
+
+_store: Optional[SnapshotStore] = None
+
+
+def get_snapshot_store() -> Optional[SnapshotStore]:
+    '''
+    Snapshot configurato da SNAPSHOT_PATH ("" lo disattiva) e SNAPSHOT_MAX_AGE
+    (secondi); None se disattivato.
+    '''
+    global _store
+    path = os.getenv("SNAPSHOT_PATH", os.path.join(".cache", "pages.snapshot"))
+    if not path:
+        return None
+    if _store is None:
+        _store = SnapshotStore(path, max_age=float(os.getenv("SNAPSHOT_MAX_AGE", 7 * 86400)))
+    return _store
+
+
+# --- Riga di comando ---------------------------------------------------------
+
+async def _crawl_all(urls: List[str]) -> List[CachedPage]:
+    from .pages import crawl_page
+    from .crawler_pool import get_crawler_pool
+
+    pool = get_crawler_pool()
+    await pool.start()
+    try:
+        results = await asyncio.gather(*(crawl_page(url) for url in urls), return_exceptions=True)
+    finally:
+        await pool.close()
+
+    pages = []
+    for url, result in zip(urls, results):
+        if isinstance(result, BaseException):
+            print(f"ERRORE {url}: {result}")
+        else:
+            pages.append(CachedPage(url, result))
+    return pages
+
+
+def _from_cache(urls: List[str]) -> List[CachedPage]:
+    '''Pagine dalla cache su disco (anche scadute), senza crawl.'''
+    from .page_cache import get_page_cache
+
+    cache = get_page_cache()
+    pages = []
+    for url in urls:
+        page = cache._read_disk(url)
+        if page is None:
+            print(f"ERRORE {url}: non presente in cache")
+        else:
+            pages.append(page)
+    return pages
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .pages import unique_urls
+
+    parser = argparse.ArgumentParser(prog="python -m actions.snapshot", description="Snapshot compresso delle pagine UnivPM")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="scarica le pagine di URL_MAP e scrive lo snapshot")
+    build.add_argument("--output", default=os.getenv("SNAPSHOT_PATH") or os.path.join(".cache", "pages.snapshot"))
+    build.add_argument("--from-cache", action="store_true", help="usa la cache su disco invece del crawl")
+    build.add_argument("--allow-partial", action="store_true", help="scrive anche se qualche pagina manca")
+    info = sub.add_parser("info", help="descrive uno snapshot")
+    info.add_argument("path", nargs="?", default=os.getenv("SNAPSHOT_PATH") or os.path.join(".cache", "pages.snapshot"))
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        urls = unique_urls()
+        pages = _from_cache(urls) if args.from_cache else asyncio.run(_crawl_all(urls))
+        if len(pages) < len(urls) and not args.allow_partial:
+            print(f"{len(urls) - len(pages)} pagine mancanti: snapshot non scritto (usa --allow-partial)")
+            return 1
+        header = write_snapshot(args.output, pages, **_chunk_params())
+        raw = sum(p["raw_length"] for p in header["pages"])
+        print(f"Snapshot {args.output}: {len(pages)} pagine, {raw / 1e3:.0f} KB di testo, "
+              f"{os.path.getsize(args.output) / 1e3:.0f} KB su disco")
+        return 0
+
+    snapshot = Snapshot(args.path)
+    print(f"{args.path}: formato {FORMAT_VERSION}, creato {time.ctime(snapshot.created_at)}, "
+          f"chunk {snapshot.header['chunk_size']}/{snapshot.header['overlap']}")
+    for entry in snapshot.header["pages"]:
+        print(f"  {entry['url']}  {entry['raw_length'] / 1e3:.0f} KB -> {entry['length'] / 1e3:.0f} KB, "
+              f"{len(entry['chunks'])} chunk, scaricata {time.ctime(entry['fetched_at'])}")
+    snapshot.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+# Action delle informazioni sull'università: pagina UnivPM (cache, snapshot o
+# Crawl4AI) riassunta da Ollama.
+
+import os
+from typing import Any, Text, Dict, List
+from rasa_sdk import Action, Tracker
+from rasa_sdk.executor import CollectingDispatcher
+from . import metrics
+from .llm import GenerationStats, OllamaError, SentenceBuffer, get_ollama_client
+from .cleaner import clean_content
+from .pages import URL_MAP, PageUnavailable, get_page, resolve_topic, semantic_passages
+from .prompt import Prompt, load_prompt_builder
+from .answer_cache import AnswerCache, get_answer_cache
+from .singleflight import SingleFlight
+from .admission import Overloaded, get_llm_admission
+
+@metrics.instrument
+class ActionGetUniversityInfo(Action):
+    """
+    Recupera informazioni dal sito web dell'università usando Crawl4AI e le riassume con Ollama.
+    Retrieves info from university website using Crawl4AI and summarizes with Ollama.
+    """
+
+    # Generazioni in corso, condivise tra richieste identiche contemporanee
+    generations = SingleFlight()
+
+    def name(self) -> Text:
+        return "action_get_university_info"
+
+    # Mappa degli argomenti agli URL (IT + EN support), condivisa con il refresher in background
+    URL_MAP = URL_MAP
+
+    def clean_content(self, text: str) -> str:
+        '''Pulisce il markdown estratto (vedi `cleaner.clean_content`).'''
+        return clean_content(text)
+
+    async def run(self, dispatcher: CollectingDispatcher,
+            tracker: Tracker,
+            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+
+        # 1. Identifica la lingua (default English se non specificato o diverso da 'it')
+        # 1. Identify language (default English if not specified or not 'it')
+        lang_slot = tracker.get_slot("language")
+        language = "it" if lang_slot == "it" else "en"
+
+        # 2. Identifica l'argomento richiesto: slot `topic`, altrimenti il messaggio
+        #    dell'utente (tollera maiuscole, accenti ed errori di battitura)
+        topic = tracker.get_slot("topic")
+        match = resolve_topic(topic, tracker.latest_message.get('text'))
+        passages = []
+        if match is not None:
+            url = match.value
+            if not match.exact:
+                print(f"DEBUG: topic '{topic}' interpretato come '{match.keyword}' ({match.score:.2f})")
+        else:
+            # Nessuna parola chiave: i passaggi più vicini per significato tra tutte le
+            # pagine (se l'indice semantico è attivo), altrimenti la pagina generale
+            passages = await semantic_passages(tracker.latest_message.get('text'))
+            url = passages[0][0].url if passages else self.URL_MAP["generale"]
+        if not topic:
+            topic = match.keyword if match is not None else "generale"
+        # Etichetta delle metriche: sempre una chiave di URL_MAP, mai il testo libero
+        metrics.set_topic(match.keyword if match is not None else "generale")
+        
+        # Feedback immediato all'utente (Bilingue)
+        if language == "it":
+            dispatcher.utter_message(text=f"Sto cercando informazioni su '{topic}' dal sito ufficiale...")
+        else:
+            dispatcher.utter_message(text=f"Searching for information about '{topic}' on the official website...")
+
+        # 3. Contenuto della pagina: precalcolato dal refresher in background (cache),
+        #    altrimenti scrape con Crawl4AI
+        try:
+            # Con i passaggi semantici le pagine sono già state lette: `page` è la più pertinente
+            page = passages[0][0] if passages else await get_page(url)
+        except PageUnavailable:
+            msg = "Non sono riuscito a leggere il contenuto della pagina." if language == "it" else "I couldn't read the page content."
+            dispatcher.utter_message(text=msg)
+            return []
+        except Exception as e:
+            print(f"ERRORE CRAWL4AI: {e}")
+            msg = f"Ho avuto un problema nel leggere il sito: {e}" if language == "it" else f"I encountered an issue reading the website: {e}"
+            dispatcher.utter_message(text=msg)
+            return []
+
+        user_question = tracker.latest_message.get('text')
+
+        # 4. Invia a Ollama per il riassunto (Prompt Bilingue): istruzioni e inizio
+        #    pagina in testa, uguali per tutti gli utenti (Ollama ne riusa il prefill),
+        #    poi i passaggi più pertinenti alla domanda (BM25) entro il budget di token.
+        #    Senza argomento riconosciuto: i passaggi semantici di tutte le pagine, con le fonti
+        try:
+            builder = await load_prompt_builder()
+            with metrics.span("prompt"):
+                if passages:
+                    prompt = builder.build_passages(passages, user_question, language)
+                else:
+                    prompt = builder.build(page, user_question, language)
+            extracted_text = prompt.context
+
+            # Stessa domanda sullo stesso contesto: riusiamo la risposta già generata
+            answer_cache = get_answer_cache()
+            with metrics.span("answer_cache") as stage:
+                cached_reply = answer_cache.get(url, page.content_hash, extracted_text, user_question, language)
+                stage.outcome = "hit" if cached_reply is not None else "miss"
+            if cached_reply is not None:
+                dispatcher.utter_message(text=cached_reply)
+                return []
+
+            # Chiamata asincrona a Ollama: non blocca l'event loop dell'action server.
+            # Chi fa la stessa domanda sullo stesso contesto mentre la risposta è in
+            # generazione attende quella invece di lanciarne un'altra.
+            try:
+                key = AnswerCache.make_key(extracted_text, user_question, language)
+                with metrics.span("llm") as stage:
+                    try:
+                        ai_reply, cacheable = await self.generations.do(key, lambda: self.generate(prompt))
+                    except Overloaded:
+                        stage.outcome = "shed"
+                        raise
+                    if not cacheable:
+                        stage.outcome = "truncated"
+                if ai_reply and cacheable:
+                    answer_cache.put(url, page.content_hash, extracted_text, user_question, language, ai_reply)
+
+                if os.getenv("OLLAMA_STREAM", "0") == "1":
+                    # Risposta in più messaggi, frase per frase
+                    sentences = SentenceBuffer()
+                    for sentence in sentences.feed(ai_reply):
+                        dispatcher.utter_message(text=sentence)
+                    rest = sentences.flush()
+                    if rest:
+                        dispatcher.utter_message(text=rest)
+                else:
+                    dispatcher.utter_message(text=ai_reply)
+            except Overloaded as e:
+                # Troppe generazioni in corso o in coda: meglio dirlo subito che far scadere tutti
+                print(f"DEBUG: generazione rifiutata ({e})")
+                msg = "Sto ricevendo molte richieste in questo momento, riprova tra qualche istante." if language == "it" else "I'm receiving a lot of requests right now, please try again in a moment."
+                dispatcher.utter_message(text=msg)
+            except OllamaError as e:
+                print(f"ERRORE OLLAMA: {e}")
+                msg = "Ho letto i dati ma ho problemi a riassumerli al momento." if language == "it" else "I read the data but I'm having trouble summarizing it right now."
+                dispatcher.utter_message(text=msg)
+
+        except Exception as e:
+            print(f"ERRORE CHIAMATA OLLAMA: {e}")
+            msg = "Errore nella generazione della risposta." if language == "it" else "Error generating the response."
+            dispatcher.utter_message(text=msg)
+
+        return []
+
+    async def generate(self, prompt: Prompt):
+        '''
+        Genera la risposta e indica se può essere messa in cache.
+
+        Con OLLAMA_STREAM=1 la generazione avviene in streaming e si ferma dopo
+        OLLAMA_MAX_TOKENS token o OLLAMA_DEADLINE secondi.
+
+        La generazione parte solo quando il controllo di ammissione concede un
+        posto (vedi `admission.py`); a coda piena solleva `Overloaded`.
+        '''
+        client = get_ollama_client()
+        async with get_llm_admission().slot():
+            if os.getenv("OLLAMA_STREAM", "0") != "1":
+                return await client.generate(prompt.prompt, **prompt.fields()), True
+
+            stats = GenerationStats()
+            parts = []
+            async for piece in client.stream(
+                prompt.prompt,
+                stats=stats,
+                max_tokens=int(os.getenv("OLLAMA_MAX_TOKENS", 512)),
+                timeout=float(os.getenv("OLLAMA_DEADLINE", 45)),
+                **prompt.fields(),
+            ):
+                parts.append(piece)
+        print(f"DEBUG: Ollama ttft={stats.ttft}s prefill={stats.prompt_eval_duration}s "
+              f"prompt={prompt.tokens} tok (prefisso {prompt.prefix_tokens}) "
+              f"tok/s={stats.tokens_per_second:.1f} tokens={stats.tokens} stop={stats.stop_reason}")
+        # Una risposta interrotta per scadenza è parziale: non la riutilizziamo
+        return "".join(parts).strip(), stats.stop_reason != "deadline"
+
+
+metrics.collector("llm_generations", counters=SingleFlight.COUNTERS)(ActionGetUniversityInfo.generations.stats)
@@ -0,0 +1,208 @@
+# Riscaldamento all'avvio e readiness dell'action server.
+#
+# Senza riscaldamento il primo utente dopo un deploy paga tutto: caricamento
+# dei pesi del modello in Ollama, apertura delle connessioni al DB, snapshot
+# del catalogo, crawl e indicizzazione delle pagine. All'avvio eseguiamo questi
+# passi in background (riprovando finché i servizi non rispondono) e /ready
+# risponde 503 finché non sono tutti completati, così Docker Compose (o un
+# orchestratore) manda traffico solo a un server già caldo. Le pagine sono un
+# riscaldamento "al meglio": una pagina di univpm.it irraggiungibile viene
+# solo registrata nel log (sarà scaricata alla prima domanda) e non blocca
+# la readiness, che dipende davvero solo da modello e database.
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from . import lifecycle, metrics
+
+logger = logging.getLogger(__name__)
+
+Check = Callable[[], Awaitable[None]]
+
+
+class Warmup:
+    '''
+    Esegue i controlli di riscaldamento in parallelo, ciascuno riprovato con
+    backoff esponenziale finché non riesce.
+
+    :param checks: nome -> coroutine che solleva un'eccezione se il servizio non è pronto
+    :param retry_delay: secondi prima del primo nuovo tentativo
+    :param max_retry_delay: attesa massima tra due tentativi
+    '''
+
+    def __init__(self, checks: Dict[str, Check], retry_delay: float = 2.0, max_retry_delay: float = 30.0) -> None:
+        self.checks = checks
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.started_at: Optional[float] = None
+        self._status: Dict[str, Dict[str, Any]] = {
+            name: {"ready": False, "attempts": 0, "duration": None, "last_error": None} for name in checks
+        }
+        self._tasks: List[asyncio.Task] = []
+
+    def ready(self) -> bool:
+        return all(status["ready"] for status in self._status.values())
+
+    async def _run(self, name: str, check: Check) -> None:
+        status = self._status[name]
+        delay = self.retry_delay
+        started = time.monotonic()
+        while True:
+            status["attempts"] += 1
+            try:
+                await check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                status["last_error"] = f"{type(e).__name__}: {e}"
+                logger.warning(f"Warm-up {name} failed (attempt {status['attempts']}), "
+                               f"retrying in {delay:.0f}s: {status['last_error']}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+                continue
+            status["ready"] = True
+            status["duration"] = round(time.monotonic() - started, 3)
+            logger.info(f"Warm-up {name} done in {status['duration']}s")
+            if self.ready():
+                logger.info(f"Action server ready after {time.monotonic() - self.started_at:.1f}s")
+            return
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self.started_at = time.monotonic()
+        self._tasks = [asyncio.ensure_future(self._run(name, check)) for name, check in self.checks.items()]
+
+    async def wait(self) -> None:
+        '''Attende la fine di tutti i controlli (utile nei test e negli script).'''
+        await asyncio.gather(*self._tasks)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {name: dict(status) for name, status in self._status.items()}
+
+
+async def warm_llm() -> None:
+    '''Carica i pesi del modello con una generazione di un token (e il prefisso di sistema in KV cache).'''
+    from .admission import PRIORITY_BACKGROUND, get_llm_admission
+    from .llm import get_ollama_client
+    from .prompt import SYSTEM_PROMPTS, load_prompt_builder
+
+    fields = (await load_prompt_builder()).options()
+    fields["options"] = {**fields["options"], "num_predict": 1}
+    async with get_llm_admission().slot(PRIORITY_BACKGROUND):
+        await get_ollama_client().generate("Ciao", system=SYSTEM_PROMPTS["it"], **fields)
+
+
+def _open_db() -> None:
+    from .db import get_pool
+    from .catalog import get_catalog
+
+    # Apre le connessioni minime del pool e carica lo snapshot del catalogo
+    with get_pool().connection():
+        pass
+    get_catalog()
+
+
+async def warm_db() -> None:
+    await asyncio.get_running_loop().run_in_executor(None, _open_db)
+
+
+async def prime_pages(urls: List[str], fetch: Callable[[str], Awaitable[Any]]) -> List[Any]:
+    '''Scarica le pagine in parallelo; restituisce quelle riuscite e registra le altre nel log.'''
+    results = await asyncio.gather(*(fetch(url) for url in urls), return_exceptions=True)
+    pages = []
+    for url, result in zip(urls, results):
+        if isinstance(result, BaseException):
+            logger.warning(f"Warm-up could not load {url}: {type(result).__name__}: {result}")
+        else:
+            pages.append(result)
+    return pages
+
+
+async def warm_pages() -> None:
+    '''
+    Porta in cache le pagine di URL_MAP, con indici di ricerca e prefisso del
+    prompt. Riesce quando tutte le pagine sono state tentate, anche se alcune
+    non si sono potute scaricare.
+    '''
+    from .pages import get_page, unique_urls
+    from .prompt import load_prompt_builder
+
+    urls = unique_urls()
+    pages = await prime_pages(urls, get_page)
+    builder = await load_prompt_builder()
+    for page in pages:
+        builder.lead(page)
+    if len(pages) < len(urls):
+        logger.warning(f"Warm-up loaded {len(pages)} of {len(urls)} pages")
+
+    # Indice semantico sulle pagine disponibili, se attivo (EMBEDDINGS_MODEL)
+    from .embeddings import get_semantic_search
+    search = get_semantic_search()
+    if search is not None:
+        try:
+            await search.ensure(pages)
+        except Exception as e:
+            logger.warning(f"Warm-up could not build the embedding index: {type(e).__name__}: {e}")
+
+
+CHECKS: Dict[str, Check] = {"llm": warm_llm, "db": warm_db, "pages": warm_pages}
+
+_warmup: Optional[Warmup] = None
+
+
+def get_warmup() -> Warmup:
+    '''
+    Riscaldamento del processo: WARMUP_CHECKS elenca i controlli richiesti per
+    la readiness (default "llm,db,pages"; vuoto = pronto subito).
+    '''
+    global _warmup
+    if _warmup is None:
+        names = [n.strip() for n in os.getenv("WARMUP_CHECKS", "llm,db,pages").split(",") if n.strip()]
+        unknown = [n for n in names if n not in CHECKS]
+        if unknown:
+            logger.warning(f"Unknown warm-up checks ignored: {', '.join(unknown)}")
+        _warmup = Warmup(
+            {name: CHECKS[name] for name in names if name in CHECKS},
+            max_retry_delay=float(os.getenv("WARMUP_MAX_RETRY_DELAY", 30)),
+        )
+    return _warmup
+
+
+@lifecycle.on_startup
+async def start_warmup() -> None:
+    # In background: il server deve rispondere subito a /health e /ready
+    get_warmup().start()
+
+
+@lifecycle.on_shutdown
+async def stop_warmup() -> None:
+    if _warmup is not None:
+        await _warmup.stop()
+
+
+@lifecycle.route("/ready")
+async def readiness() -> Tuple[Dict[str, Any], int]:
+    warmup = get_warmup()
+    ready = warmup.ready()
+    return {"ready": ready, "checks": warmup.status()}, 200 if ready else 503
+
+
+@metrics.collector("warmup", counters=tuple(f"{name}_attempts" for name in CHECKS))
+def warmup_metrics() -> Optional[Dict[str, Any]]:
+    if _warmup is None:
+        return None
+    stats: Dict[str, Any] = {"ready": _warmup.ready()}
+    for name, status in _warmup.status().items():
+        stats[f"{name}_ready"] = status["ready"]
+        stats[f"{name}_attempts"] = status["attempts"]
+    return stats
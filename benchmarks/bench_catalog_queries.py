@@ -0,0 +1,158 @@
+"""
+Benchmark delle query sul catalogo usate dalle action, su un catalogo sintetico.
+
+Per ogni query (eseguita come prepared statement, come fa l'action server)
+riporta mediana, p95 e media in millisecondi e, con --explain, il piano
+EXPLAIN (ANALYZE, BUFFERS). Con --compare ripete le misure dopo aver rimosso
+gli indici di database/03_indexes.sql in una transazione annullata alla fine.
+
+Prima generare il catalogo:
+    python benchmarks/generate_catalog.py --degrees 10000 --courses 1000000
+    python benchmarks/bench_catalog_queries.py --explain --compare
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from actions.db import connect  # noqa: E402
+from actions.catalog import CatalogSnapshot, Course, Degree  # noqa: E402
+from actions.catalog_queries import (  # noqa: E402
+    CATALOG_SNAPSHOT,
+    CATALOG_VERSION,
+    ENROLLMENT_SUMMARY,
+    Statement,
+    execute,
+    fetch_catalog,
+)
+
+# Ricerche che il form di iscrizione faceva sul DB e che oggi risponde lo snapshot
+DEGREES_FOR = Statement("bench_degrees_for", ("degree_field", "degree_type"), """
+    SELECT id, name FROM degree WHERE category = $1 AND type = $2 ORDER BY id
+""")
+COURSES_FOR = Statement("bench_courses_for", ("text", "boolean"), """
+    SELECT id, name FROM course WHERE degree_id = $1 AND is_mandatory = $2
+""")
+COURSE_BY_ID = Statement("bench_course_by_id", ("integer",), """
+    SELECT name FROM course WHERE id = $1
+""")
+
+INDEXES = ["degree_category_type_idx", "course_degree_mandatory_idx"]
+
+
+def sample_params(cur, count: int, seed: int = 0):
+    '''Parametri realistici estratti dal catalogo generato.'''
+    rng = random.Random(seed)
+    cur.execute("SELECT DISTINCT category::text, type::text FROM degree")
+    pairs = cur.fetchall()
+    cur.execute("SELECT id FROM degree")
+    degree_ids = [row[0] for row in cur.fetchall()]
+    cur.execute("SELECT min(id), max(id) FROM course")
+    low, high = cur.fetchone()
+
+    degrees = [rng.choice(degree_ids) for _ in range(count)]
+    return {
+        DEGREES_FOR: [rng.choice(pairs) for _ in range(count)],
+        COURSES_FOR: [(d, rng.random() < 0.5) for d in degrees],
+        COURSE_BY_ID: [(rng.randint(low, high),) for _ in range(count)],
+        ENROLLMENT_SUMMARY: [(d, rng.randint(low, high)) for d in degrees],
+        CATALOG_VERSION: [()] * count,
+    }
+
+
+def time_statement(cur, statement: Statement, params_list) -> dict:
+    timings = []
+    rows = 0
+    for params in params_list:
+        start = time.perf_counter()
+        execute(cur, statement, params)
+        rows = len(cur.fetchall())
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "p50": statistics.median(timings),
+        "p95": timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0],
+        "mean": statistics.fmean(timings),
+        "rows": rows,
+    }
+
+
+def explain(cur, statement: Statement, params) -> str:
+    placeholders = f" ({', '.join(['%s'] * len(params))})" if params else ""
+    cur.execute(f"EXPLAIN (ANALYZE, BUFFERS) EXECUTE {statement.name}{placeholders}", tuple(params))
+    return "\n".join(f"    {row[0]}" for row in cur.fetchall())
+
+
+def time_snapshot(conn, repeat: int) -> None:
+    '''Caricamento completo dello snapshot in memoria: tempo e memoria Python occupata.'''
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fetch_catalog(conn)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    version, degrees, courses = fetch_catalog(conn)
+    snapshot = CatalogSnapshot([Degree(*r) for r in degrees], [Course(*r) for r in courses], version)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{CATALOG_SNAPSHOT.name:<24} {statistics.median(timings):10.1f} ms (mediana di {repeat}), "
+          f"{len(snapshot)} degree, {len(courses)} course, picco {peak / 1e6:.0f} MB in Python")
+
+
+def run_suite(conn, params, args, label: str) -> None:
+    cur = conn.cursor()
+    print(f"\n== {label} ==")
+    print(f"{'query':<24} {'p50 ms':>10} {'p95 ms':>10} {'media ms':>10} {'righe':>7}")
+    for statement, params_list in params.items():
+        result = time_statement(cur, statement, params_list)
+        print(f"{statement.name:<24} {result['p50']:10.3f} {result['p95']:10.3f} "
+              f"{result['mean']:10.3f} {result['rows']:7d}")
+        if args.explain:
+            print(explain(cur, statement, params_list[0]))
+    if not args.skip_snapshot:
+        time_snapshot(conn, args.snapshot_repeat)
+    cur.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--schema", default="bench_catalog")
+    parser.add_argument("--repeat", type=int, default=200, help="esecuzioni per query")
+    parser.add_argument("--explain", action="store_true", help="stampa EXPLAIN (ANALYZE, BUFFERS)")
+    parser.add_argument("--compare", action="store_true", help="ripete le misure senza gli indici")
+    parser.add_argument("--skip-snapshot", action="store_true", help="non misura il caricamento completo")
+    parser.add_argument("--snapshot-repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    conn = connect()
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SET search_path TO {args.schema}")
+        params = sample_params(cur, args.repeat)
+        cur.close()
+        # Il SET vale per la sessione solo se la transazione viene confermata
+        conn.commit()
+
+        run_suite(conn, params, args, "con indici")
+        conn.commit()
+
+        if args.compare:
+            # DDL transazionale: gli indici tornano al ROLLBACK
+            cur = conn.cursor()
+            cur.execute(f"DROP INDEX {', '.join(INDEXES)}")
+            cur.close()
+            run_suite(conn, params, args, "senza indici")
+            conn.rollback()
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
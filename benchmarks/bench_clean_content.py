@@ -0,0 +1,129 @@
+"""
+Benchmark della pulizia del markdown (actions/cleaner.py).
+
+Confronta la vecchia implementazione a sei `re.sub` con il cleaner attuale,
+con e senza budget di caratteri, misurando throughput (MB/s) e picco di
+memoria allocata (tracemalloc).
+
+Uso:
+    python benchmarks/bench_clean_content.py                  # pagine sintetiche
+    python benchmarks/bench_clean_content.py pagina.md ...    # markdown salvati
+    python benchmarks/bench_clean_content.py --cache-dir .cache/pages
+"""
+
+import os
+import re
+import sys
+import glob
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from actions.cleaner import clean_content  # noqa: E402
+
+
+def legacy_clean_content(text: str) -> str:
+    '''Implementazione originale, tenuta come riferimento.'''
+    text = re.sub(r'!\[.*?\]\(.*?\)', '', text)
+    text = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', text)
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'^\s*[-=_*]{3,}\s*$', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\n\s*\n', '\n\n', text)
+    text = re.sub(r'[ \t]+', ' ', text)
+    return text.strip()
+
+
+WORDS = ("università corso laurea iscrizione tasse contributi scadenza rata isee borsa studio "
+         "ingegneria economia medicina agraria scienze studenti segreteria domanda bando").split()
+
+
+def synthetic_page(size_kb: int, seed: int = 0) -> str:
+    '''Markdown simile a quello di Crawl4AI: menu di link, immagini, tabelle, separatori.'''
+    rng = random.Random(seed)
+    parts = []
+    size = 0
+    while size < size_kb * 1024:
+        kind = rng.random()
+        if kind < 0.25:
+            block = "\n".join(
+                f"* [{rng.choice(WORDS).title()}](https://www.univpm.it/Entra/{rng.choice(WORDS)}_{i})"
+                for i in range(rng.randint(3, 12))
+            )
+        elif kind < 0.35:
+            block = f"[![{rng.choice(WORDS)}](https://www.univpm.it/img/{rng.randint(1, 999)}.png)](https://www.univpm.it)"
+        elif kind < 0.45:
+            rows = ["| Fascia ISEE | Importo |", "| --- | --- |"]
+            rows += [f"| {rng.randint(0, 99)}.000  | {rng.randint(100, 3000)} € |" for _ in range(rng.randint(2, 8))]
+            block = "\n".join(rows)
+        elif kind < 0.5:
+            block = rng.choice(["---", "* * *", "=====", "  ___  "])
+        else:
+            words = [rng.choice(WORDS) for _ in range(rng.randint(20, 120))]
+            block = " ".join(words).capitalize() + ".  <br>  Vedi <b>anche</b>\tla pagina."
+        parts.append(block)
+        parts.append("\n" * rng.randint(1, 4))
+        size += len(block) + 2
+    return "".join(parts)
+
+
+def load_pages(args) -> dict:
+    pages = {}
+    for path in args.files:
+        with open(path, "r", encoding="utf-8") as f:
+            pages[os.path.basename(path)] = f.read()
+    if args.cache_dir:
+        # Nella cache delle pagine il contenuto è già pulito, ma resta un input realistico
+        for path in glob.glob(os.path.join(args.cache_dir, "*.json")):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            pages[data.get("url", path)] = data["content"]
+    if not pages:
+        for size_kb in args.sizes:
+            pages[f"synthetic-{size_kb}KB"] = synthetic_page(size_kb)
+    return pages
+
+
+def measure(fn, text: str, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="file markdown da usare come input")
+    parser.add_argument("--cache-dir", help="cartella della cache delle pagine (PAGE_CACHE_DIR)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 1000], help="KB delle pagine sintetiche")
+    parser.add_argument("--budget", type=int, default=8000, help="caratteri per la modalità con budget")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    variants = [
+        ("legacy (6 re.sub)", legacy_clean_content),
+        ("cleaner", clean_content),
+        (f"cleaner max_chars={args.budget}", lambda text: clean_content(text, max_chars=args.budget)),
+    ]
+
+    print(f"{'pagina':<28} {'variante':<28} {'KB':>7} {'ms':>9} {'MB/s':>8} {'picco KB':>9}")
+    for name, text in load_pages(args).items():
+        size_mb = len(text.encode("utf-8")) / 1e6
+        for label, fn in variants:
+            seconds, peak = measure(fn, text, args.repeat)
+            print(f"{name[:28]:<28} {label:<28} {size_mb * 1000:7.0f} {seconds * 1000:9.2f} "
+                  f"{size_mb / seconds:8.1f} {peak / 1024:9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Benchmark dell'avvio dell'action server: tempo di import, avvio e memoria.
+
+In produzione il server parte con `python -m actions.server` (vedi il CMD del
+Dockerfile): rasa_sdk importa ogni modulo del package per registrare le
+action, poi il listener `after_server_start` esegue in ogni worker Sanic gli
+hook di avvio di lifecycle.py (pool di browser, warm-up, refresher, outbox,
+writer delle iscrizioni). Ogni misura gira in un processo Python nuovo che:
+
+  1. crea l'app vera con `actions.server.create_app` (oppure, se rasa_sdk non
+     è installato, importa i moduli con pkgutil) e misura tempo di import,
+     RSS e librerie pesanti caricate;
+  2. esegue i listener di avvio dell'app, attende che il warm-up sia pronto
+     (/ready) e misura la RSS dell'intero albero di processi: i browser
+     Chromium avviati da Playwright sono processi figli e contano anche loro.
+
+Le librerie pesanti non devono mai arrivare con l'import; dopo l'avvio
+dipendono dal ruolo del worker. Per un worker che serve solo i form:
+
+    CRAWLER_POOL_EAGER=0 WARMUP_CHECKS= PAGE_REFRESH_ENABLED=0 \\
+        python benchmarks/bench_startup.py --light
+
+Uso:
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --no-boot        # solo import (come rasa_sdk)
+    python benchmarks/bench_startup.py --save .cache/startup.json
+    python benchmarks/bench_startup.py --baseline .cache/startup.json --tolerance 0.2
+
+Esce con codice 1 se una libreria pesante viene importata con il package,
+se con --light l'avvio carica librerie pesanti o processi figli, o se con
+--baseline tempo o memoria peggiorano oltre la tolleranza.
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Librerie che l'import del package non deve caricare (arrivano con la prima action che le usa)
+HEAVY_MODULES = ("crawl4ai", "playwright", "numpy", "psycopg2", "aiohttp", "smtplib", "requests")
+
+# Eseguito in un processo nuovo: crea l'app, la avvia e stampa le misure in JSON
+CHILD = r"""
+import os, sys, time, json, asyncio, pkgutil, importlib
+
+config = json.loads(sys.argv[1])
+heavy_modules = set(config["heavy"])
+
+def rss_kb(pid="self"):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return 0
+    return 0
+
+def tree_rss_kb():
+    '''RSS del processo e di tutti i discendenti (browser), numero di discendenti.'''
+    if not os.path.isdir("/proc"):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, 0
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    total, descendants, stack = rss_kb(), 0, list(children.get(os.getpid(), []))
+    while stack:
+        pid = stack.pop()
+        total += rss_kb(pid)
+        descendants += 1
+        stack.extend(children.get(pid, []))
+    return total, descendants
+
+def loaded_heavy():
+    return sorted({name.split(".")[0] for name in sys.modules} & heavy_modules)
+
+before = rss_kb()
+started = time.perf_counter()
+app, skipped = None, []
+try:
+    from actions.server import create_app
+    app = create_app("actions")
+    loader = "actions.server"
+except ImportError as e:
+    if e.name is None or not e.name.startswith(("rasa_sdk", "sanic")):
+        raise
+    import actions
+    loader = "pkgutil"
+    for info in pkgutil.walk_packages(actions.__path__, "actions."):
+        try:
+            importlib.import_module(info.name)
+        except ImportError as e:
+            if e.name is None or not e.name.startswith("rasa_sdk"):
+                raise
+            skipped.append(info.name)
+sample = {"seconds": time.perf_counter() - started, "rss_kb": rss_kb(), "rss_before_kb": before,
+          "loader": loader, "skipped": skipped, "heavy": loaded_heavy()}
+
+async def boot():
+    from actions import lifecycle
+    from actions.server import _after_server_start, _before_server_stop
+    from actions.warmup import get_warmup
+
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    # Gli stessi listener che Sanic esegue in ogni worker
+    if app is not None:
+        await _after_server_start(app, loop)
+    else:
+        await lifecycle.startup()
+    warmup = get_warmup()
+    deadline = started + config["ready_timeout"]
+    while not warmup.ready() and time.perf_counter() < deadline:
+        await asyncio.sleep(0.1)
+    sample["ready"] = warmup.ready()
+    sample["ready_seconds"] = time.perf_counter() - started
+    sample["boot_rss_kb"], sample["processes"] = tree_rss_kb()
+    sample["boot_heavy"] = loaded_heavy()
+    if app is not None:
+        await _before_server_stop(app, loop)
+    else:
+        await lifecycle.shutdown()
+
+if config["boot"]:
+    asyncio.run(boot())
+print(json.dumps(sample))
+"""
+
+
+def run_once(boot: bool = True, ready_timeout: float = 60.0, importtime: bool = False) -> dict:
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    config = {"heavy": HEAVY_MODULES, "boot": boot, "ready_timeout": ready_timeout}
+    command += ["-c", CHILD, json.dumps(config)]
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"Avvio dell'action server fallito:\n{result.stderr}")
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    if importtime:
+        sample["importtime"] = parse_importtime(result.stderr)
+    return sample
+
+
+def parse_importtime(stderr: str) -> list:
+    '''Righe di -X importtime come (microsecondi cumulativi, modulo).'''
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Il rientro indica un import annidato: teniamo quelli diretti e i moduli di actions
+        module = name.strip()
+        if len(name) - len(name.lstrip()) <= 1 or module.startswith("actions"):
+            rows.append((int(cumulative), module))
+    return rows
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for key in ("seconds", "rss_delta_kb", "ready_seconds", "boot_rss_kb"):
+        if key in baseline and key in result and result[key] > baseline[key] * (1 + tolerance):
+            regressions.append(f"{key}: {result[key]:.3f} contro {baseline[key]:.3f} della baseline")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="processi da avviare (si riporta la mediana)")
+    parser.add_argument("--top", type=int, default=15, help="moduli più lenti da mostrare")
+    parser.add_argument("--no-boot", action="store_true", help="misura solo l'import, senza gli hook di avvio")
+    parser.add_argument("--ready-timeout", type=float, default=60.0, help="secondi massimi di attesa di /ready")
+    parser.add_argument("--light", action="store_true",
+                        help="l'avvio non deve caricare librerie pesanti né processi figli (es. worker dei soli form)")
+    parser.add_argument("--save", help="salva il risultato in JSON, da usare come baseline")
+    parser.add_argument("--baseline", help="JSON di un'esecuzione precedente da confrontare")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="peggioramento ammesso rispetto alla baseline")
+    args = parser.parse_args()
+
+    boot = not args.no_boot
+    samples = [run_once(boot, args.ready_timeout) for _ in range(args.runs)]
+    profile = run_once(boot=False, importtime=True)
+
+    result = {
+        "loader": samples[0]["loader"],
+        "seconds": statistics.median(s["seconds"] for s in samples),
+        "rss_kb": statistics.median(s["rss_kb"] for s in samples),
+        "rss_delta_kb": statistics.median(s["rss_kb"] - s["rss_before_kb"] for s in samples),
+        "heavy": sorted({name for s in samples for name in s["heavy"]}),
+    }
+    if boot:
+        result.update({
+            "ready": all(s["ready"] for s in samples),
+            "ready_seconds": statistics.median(s["ready_seconds"] for s in samples),
+            "boot_rss_kb": statistics.median(s["boot_rss_kb"] for s in samples),
+            "processes": max(s["processes"] for s in samples),
+            "boot_heavy": sorted({name for s in samples for name in s["boot_heavy"]}),
+        })
+
+    print(f"Import del package actions ({result['loader']}, mediana di {args.runs} processi)")
+    print(f"  tempo     {result['seconds'] * 1000:9.1f} ms")
+    print(f"  RSS       {result['rss_kb'] / 1024:9.1f} MB (+{result['rss_delta_kb'] / 1024:.1f} MB per il package)")
+    if samples[0]["skipped"]:
+        print(f"  saltati   {', '.join(samples[0]['skipped'])} (rasa_sdk non installato: "
+              f"avvio senza l'app Sanic, solo con gli hook di lifecycle)")
+    if boot:
+        ready = "pronto" if result["ready"] else f"NON pronto entro {args.ready_timeout:.0f} s"
+        print(f"\nAvvio (hook di lifecycle, {ready})")
+        print(f"  tempo     {result['ready_seconds'] * 1000:9.1f} ms")
+        print(f"  RSS       {result['boot_rss_kb'] / 1024:9.1f} MB (processo e {result['processes']} processi figli)")
+        print(f"  librerie  {', '.join(result['boot_heavy']) or '-'}")
+
+    print(f"\n{'ms':>9}  modulo")
+    for micros, name in sorted(profile["importtime"], reverse=True)[:args.top]:
+        print(f"{micros / 1000:9.1f}  {name}")
+
+    failures = []
+    if result["heavy"]:
+        failures.append(f"librerie pesanti importate all'avvio: {', '.join(result['heavy'])}")
+    if args.light and boot:
+        if result["boot_heavy"]:
+            failures.append(f"librerie pesanti caricate dagli hook di avvio: {', '.join(result['boot_heavy'])}")
+        if result["processes"]:
+            failures.append(f"{result['processes']} processi figli avviati (browser?)")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failures += compare(result, json.load(f), args.tolerance)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    for failure in failures:
+        print(f"\nERRORE: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
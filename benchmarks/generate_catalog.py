@@ -0,0 +1,112 @@
+"""
+Genera un catalogo sintetico di grandi dimensioni per i benchmark.
+
+Crea (o ricrea) uno schema separato, vi applica le migrazioni di database/
+(tipi, tabelle, versione del catalogo, indici) e lo popola lato server con
+generate_series, senza toccare le tabelle del bot nello schema public.
+
+Uso (connessione da POSTGRES_HOST/PORT/DB/USER/PASSWORD, come l'action server):
+    python benchmarks/generate_catalog.py --degrees 10000 --courses 1000000
+    python benchmarks/generate_catalog.py --schema bench_catalog --no-indexes
+"""
+
+import os
+import sys
+import time
+import argparse
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from actions.db import connect  # noqa: E402
+
+MIGRATIONS = ["00_migratons.sql", "02_catalog_version.sql"]
+INDEXES = "03_indexes.sql"
+
+# id VARCHAR(5): 'D' + 4 cifre esadecimali
+MAX_DEGREES = 16 ** 4
+
+
+def run_file(cur, name: str) -> None:
+    with open(os.path.join(ROOT, "database", name), "r", encoding="utf-8") as f:
+        cur.execute(f.read())
+
+
+def generate(conn, schema: str, degrees: int, courses: int, indexes: bool) -> None:
+    cur = conn.cursor()
+
+    start = time.perf_counter()
+    cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+    cur.execute(f"CREATE SCHEMA {schema}")
+    # Tipi, tabelle e trigger vengono creati nello schema di benchmark
+    cur.execute(f"SET search_path TO {schema}")
+    for name in MIGRATIONS:
+        run_file(cur, name)
+
+    # Disattiviamo i trigger di versione durante il caricamento
+    cur.execute("ALTER TABLE degree DISABLE TRIGGER USER")
+    cur.execute("ALTER TABLE course DISABLE TRIGGER USER")
+
+    cur.execute("""
+        INSERT INTO degree (id, name, type, category)
+        SELECT 'D' || lpad(upper(to_hex(g)), 4, '0'),
+               'Corso di Laurea ' || g,
+               (enum_range(NULL::degree_type))[1 + g %% array_length(enum_range(NULL::degree_type), 1)],
+               (enum_range(NULL::degree_field))[1 + (g / 7) %% array_length(enum_range(NULL::degree_field), 1)]
+          FROM generate_series(0, %s - 1) AS g
+    """, (degrees,))
+    print(f"degree: {degrees} righe in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    cur.execute("""
+        INSERT INTO course (degree_id, name, is_mandatory)
+        SELECT 'D' || lpad(upper(to_hex(g %% %s)), 4, '0'),
+               'Insegnamento ' || g,
+               g %% 10 < 7
+          FROM generate_series(0, %s - 1) AS g
+    """, (degrees, courses))
+    print(f"course: {courses} righe in {time.perf_counter() - start:.1f}s")
+
+    cur.execute("ALTER TABLE degree ENABLE TRIGGER USER")
+    cur.execute("ALTER TABLE course ENABLE TRIGGER USER")
+
+    start = time.perf_counter()
+    if indexes:
+        run_file(cur, INDEXES)
+        print(f"indici e statistiche in {time.perf_counter() - start:.1f}s")
+    else:
+        cur.execute("ANALYZE degree")
+        cur.execute("ANALYZE course")
+        print(f"statistiche (senza indici) in {time.perf_counter() - start:.1f}s")
+
+    cur.execute("SELECT pg_size_pretty(pg_total_relation_size('course')), "
+                "pg_size_pretty(pg_indexes_size('course'))")
+    table_size, index_size = cur.fetchone()
+    print(f"course: {table_size} totali, di cui indici {index_size}")
+    cur.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--schema", default="bench_catalog")
+    parser.add_argument("--degrees", type=int, default=10000)
+    parser.add_argument("--courses", type=int, default=1000000)
+    parser.add_argument("--no-indexes", action="store_true", help="non applica database/03_indexes.sql")
+    args = parser.parse_args()
+
+    if not 0 < args.degrees <= MAX_DEGREES:
+        parser.error(f"--degrees deve essere tra 1 e {MAX_DEGREES} (id VARCHAR(5))")
+    if args.schema == "public":
+        parser.error("lo schema public contiene il catalogo del bot")
+
+    conn = connect()
+    try:
+        generate(conn, args.schema, args.degrees, args.courses, not args.no_indexes)
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"Catalogo sintetico pronto nello schema {args.schema}")
+
+
+if __name__ == "__main__":
+    main()
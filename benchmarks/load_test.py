@@ -0,0 +1,586 @@
+"""
+Test di carico dell'action server: riproduce conversazioni sintetiche su /webhook.
+
+Avvia l'action server (python -m actions.server) con dei sostituti locali per
+i servizi esterni e lo interroga con N client concorrenti, per ogni action e
+per ogni slot validato da validate_enrollment_form:
+
+  - Ollama: risposte preconfezionate, in streaming o no, con TTFT e ritardo
+    per token configurabili (--llm-ttft, --llm-token-delay);
+  - sito UnivPM: server HTTP locale (UNIVPM_BASE_URL) con le pagine salvate in
+    --pages-dir (es. Entra_Tasse_e_contributi.html) o generate al volo;
+  - SMTP: server locale che accetta e scarta le mail.
+
+Postgres non ha un sostituto: si usa il DB configurato da POSTGRES_HOST/PORT/...
+(es. `docker compose up -d db`), eventualmente su uno schema di
+benchmarks/generate_catalog.py con --schema.
+
+Riporta throughput e latenza p50/p95/p99 per action; con --save si salvano i
+risultati e con --baseline si confrontano con un'esecuzione precedente.
+
+Uso:
+    python benchmarks/load_test.py --concurrency 20 --duration 60
+    python benchmarks/load_test.py --mix action_get_university_info=1 --llm-ttft 0.8
+    python benchmarks/load_test.py --save base.json
+    python benchmarks/load_test.py --baseline base.json
+    python benchmarks/load_test.py --url http://localhost:5055   # server già avviato
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+import socketserver
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+
+# --- Sostituti dei servizi esterni -------------------------------------------
+
+ANSWERS = {
+    "it": ("Le tasse universitarie si pagano in due rate: la prima all'immatricolazione, "
+           "la seconda entro la scadenza indicata sul portale. L'importo dipende dall'ISEE "
+           "e sono previste esenzioni per merito e per reddito. Fonte: sito UnivPM."),
+    "en": ("Tuition fees are paid in two instalments: the first at enrollment, the second "
+           "by the deadline shown on the portal. The amount depends on the ISEE and there "
+           "are exemptions based on merit and income. Source: UnivPM website."),
+}
+
+
+class OllamaStandIn(ThreadingHTTPServer):
+    '''Risponde a /api/generate come Ollama, con tempi configurabili.'''
+
+    daemon_threads = True
+
+    def __init__(self, ttft: float, token_delay: float) -> None:
+        super().__init__(("127.0.0.1", 0), OllamaHandler)
+        self.ttft = ttft
+        self.token_delay = token_delay
+
+
+class OllamaHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def _json(self, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path == "/api/tags":
+            self._json({"models": [{"name": "stand-in"}]})
+        else:
+            self.send_error(404)
+
+    def do_POST(self) -> None:
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        # La lingua è nelle istruzioni di sistema (campo system) o, nei vecchi prompt, nel prompt stesso
+        prompt = f"{payload.get('system', '')}\n{payload.get('prompt', '')}"
+        words = ANSWERS["it" if "ITALIANO" in prompt else "en"].split(" ")
+        limit = (payload.get("options") or {}).get("num_predict")
+        if limit:
+            words = words[:limit]
+        server = self.server
+        started = time.perf_counter()
+
+        if not payload.get("stream", True):
+            time.sleep(server.ttft + server.token_delay * len(words))
+            self._json({"response": " ".join(words), "done": True})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        time.sleep(server.ttft)
+        prompt_eval = time.perf_counter() - started
+        for i, word in enumerate(words):
+            piece = word if i == 0 else f" {word}"
+            self.wfile.write(json.dumps({"response": piece, "done": False}).encode() + b"\n")
+            self.wfile.flush()
+            time.sleep(server.token_delay)
+        self.wfile.write(json.dumps({
+            "response": "", "done": True,
+            "done_reason": "length" if limit and len(words) >= limit else "stop",
+            "eval_count": len(words),
+            "prompt_eval_duration": int(prompt_eval * 1e9),
+            "eval_duration": int((time.perf_counter() - started - prompt_eval) * 1e9),
+        }).encode() + b"\n")
+
+
+def synthetic_page(path: str) -> str:
+    '''Pagina HTML generata per gli URL senza una copia salvata.'''
+    rng = random.Random(path)
+    words = ("iscrizione tasse contributi rata scadenza isee borsa studio alloggio residenza "
+             "corso laurea triennale magistrale immatricolazione segreteria studenti esonero").split()
+    title = path.strip("/").replace("/", " - ").replace("_", " ") or "UnivPM"
+    sections = []
+    for n in range(12):
+        paragraphs = "".join(
+            f"<p>{' '.join(rng.choice(words) for _ in range(60))}.</p>" for _ in range(3)
+        )
+        sections.append(f"<h2>Sezione {n + 1}</h2>{paragraphs}"
+                        f"<p><a href=\"{path}/dettagli_{n}\">Dettagli</a></p>")
+    return f"<html><head><title>{title}</title></head><body><h1>{title}</h1>{''.join(sections)}</body></html>"
+
+
+class SiteStandIn(ThreadingHTTPServer):
+    '''Serve le pagine del sito (salvate in `pages_dir` o sintetiche).'''
+
+    daemon_threads = True
+
+    def __init__(self, pages_dir: Optional[str], delay: float) -> None:
+        super().__init__(("127.0.0.1", 0), SiteHandler)
+        self.pages_dir = pages_dir
+        self.delay = delay
+        self.requests = 0
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        server = self.server
+        server.requests += 1
+        path = self.path.split("?", 1)[0]
+        html = None
+        if server.pages_dir:
+            saved = os.path.join(server.pages_dir, path.strip("/").replace("/", "_") + ".html")
+            if os.path.exists(saved):
+                with open(saved, "r", encoding="utf-8") as f:
+                    html = f.read()
+        if html is None:
+            html = synthetic_page(path)
+        time.sleep(server.delay)
+        data = html.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class SmtpStandIn(socketserver.ThreadingTCPServer):
+    '''SMTP minimale senza autenticazione: accetta e scarta i messaggi.'''
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), SmtpHandler)
+        self.messages = 0
+
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self) -> None:
+        self.reply("220 localhost ESMTP stand-in")
+        while True:
+            line = self.rfile.readline().decode(errors="replace").rstrip("\r\n")
+            if not line:
+                return
+            command = line.split(" ", 1)[0].upper()
+            if command in ("EHLO", "HELO"):
+                self.wfile.write(b"250-localhost\r\n250 8BITMIME\r\n")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.server.messages += 1
+                self.reply("250 OK queued")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+def serve(server: socketserver.BaseServer) -> int:
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    return server.server_address[1]
+
+
+# --- Conversazioni sintetiche ------------------------------------------------
+
+QUESTIONS = {
+    "it": [("tasse", "Quanto costano le tasse universitarie?"),
+           ("iscrizione", "Come funziona l'iscrizione al primo anno?"),
+           ("alloggi", "Ci sono alloggi per studenti fuori sede?"),
+           ("corsi", "Quali corsi di laurea ci sono?"),
+           (None, "Quando scade la seconda rata delle tase?")],
+    "en": [("fees", "How much are the tuition fees?"),
+           ("admission", "How do I apply for admission?"),
+           ("housing", "Is there student housing?"),
+           (None, "What degrees do you offer?")],
+}
+FIELDS = ["ingegneria", "Economics", "medicina", "scienze", "agraria", "ingegnria"]
+TYPES = ["triennale", "magistrale", "ciclo unico", "bachelor", "master's degree", "Bachelor's Degree"]
+
+# Corsi di laurea del seed (database/01_seed.sql), se il DB non è raggiungibile
+SEED_DEGREES = [
+    ("L33", "Economia e Commercio", "Bachelor's Degree", "Economics"),
+    ("L7", "Ingegneria Civile e Ambientale", "Bachelor's Degree", "Enginering"),
+    ("LM56", "International Economics and Commerce / Data Science", "Master's Degree", "Economics"),
+    ("LM41", "Medicina e Chirurgia / Medicine and Surgery", "Single-Cycle Degree", "Medicine"),
+]
+
+
+class Catalog:
+    '''Corsi di laurea e insegnamenti opzionali da usare negli slot.'''
+
+    def __init__(self, degrees: List[Tuple], optional: Dict[str, List[int]]) -> None:
+        self.degrees = degrees
+        self.optional = optional
+
+    @classmethod
+    def load(cls) -> "Catalog":
+        try:
+            from actions.db import connect
+            from actions.catalog_queries import fetch_catalog
+
+            conn = connect()
+            try:
+                _, degrees, courses = fetch_catalog(conn)
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"Catalogo non disponibile ({e}): uso gli id del seed")
+            return cls(SEED_DEGREES, {})
+        optional: Dict[str, List[int]] = defaultdict(list)
+        for course_id, degree_id, _, mandatory in courses:
+            if not mandatory:
+                optional[degree_id].append(course_id)
+        return cls([tuple(d) for d in degrees[:2000]], dict(optional))
+
+
+def tracker(sender_id: str, text: str, slots: Dict[str, Any],
+            events: Optional[List[Dict[str, Any]]] = None, active_loop: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "sender_id": sender_id,
+        "slots": slots,
+        "latest_message": {"text": text, "intent": {"name": "ask_info", "confidence": 0.9}, "entities": []},
+        "events": events or [],
+        "paused": False,
+        "followup_action": None,
+        "active_loop": {"name": active_loop} if active_loop else {},
+        "latest_action_name": "action_listen",
+    }
+
+
+def enrollment_slots(rng: random.Random, catalog: Catalog, n: int) -> Dict[str, Any]:
+    degree_id, _, degree_type, category = rng.choice(catalog.degrees)
+    courses = catalog.optional.get(degree_id) or [1]
+    return {
+        "language": rng.choice(["it", "en"]),
+        "student_name": f"Studente {n}",
+        "email": f"studente{n}@studenti.univpm.it",
+        "degree_field": category,
+        "degree_type": degree_type,
+        "degree_id": degree_id,
+        "selected_courses": str(rng.choice(courses)),
+    }
+
+
+def university_info(rng, catalog, n):
+    language = rng.choice(["it", "en"])
+    topic, text = rng.choice(QUESTIONS[language])
+    return "action_get_university_info", tracker(f"load-{n}", text, {"language": language, "topic": topic})
+
+
+def ask_degree_id(rng, catalog, n):
+    slots = enrollment_slots(rng, catalog, n)
+    return "action_ask_degree_id", tracker(f"load-{n}", slots["degree_type"], slots)
+
+
+def ask_selected_courses(rng, catalog, n):
+    slots = enrollment_slots(rng, catalog, n)
+    return "action_ask_selected_courses", tracker(f"load-{n}", slots["degree_id"], slots)
+
+
+def send_enrollment_email(rng, catalog, n):
+    slots = enrollment_slots(rng, catalog, n)
+    return "action_send_enrollment_email", tracker(f"load-{n}", "confermo", slots)
+
+
+def send_email(rng, catalog, n):
+    slots = {"email": f"studente{n}@studenti.univpm.it", "language": "it"}
+    return "action_send_email", tracker(f"load-{n}", slots["email"], slots)
+
+
+def validate(slot: str) -> Callable:
+    '''Turno del form di iscrizione in cui l'utente fornisce `slot`.'''
+    def build(rng, catalog, n):
+        slots = enrollment_slots(rng, catalog, n)
+        degree = next(d for d in catalog.degrees if d[0] == slots["degree_id"])
+        value = {
+            "degree_field": rng.choice(FIELDS),
+            "degree_type": rng.choice(TYPES),
+            # id esatto o nome del corso (ricerca approssimata)
+            "degree_id": slots["degree_id"] if rng.random() < 0.7 else degree[1].lower(),
+            "selected_courses": slots["selected_courses"],
+            "email": slots["email"] if rng.random() < 0.9 else "non-una-mail",
+        }[slot]
+        slots[slot] = value
+        slots["requested_slot"] = slot
+        events = [
+            {"event": "action", "name": "enrollment_form"},
+            {"event": "slot", "name": slot, "value": value},
+        ]
+        return "validate_enrollment_form", tracker(f"load-{n}", str(value), slots, events, "enrollment_form")
+    return build
+
+
+# etichetta -> (peso, costruttore della richiesta); il mix ricorda un picco di iscrizioni
+SCENARIOS: Dict[str, Tuple[float, Callable]] = {
+    "action_get_university_info": (25, university_info),
+    "action_ask_degree_id": (10, ask_degree_id),
+    "action_ask_selected_courses": (10, ask_selected_courses),
+    "validate_enrollment_form:degree_field": (9, validate("degree_field")),
+    "validate_enrollment_form:degree_type": (9, validate("degree_type")),
+    "validate_enrollment_form:degree_id": (9, validate("degree_id")),
+    "validate_enrollment_form:selected_courses": (9, validate("selected_courses")),
+    "validate_enrollment_form:email": (9, validate("email")),
+    "action_send_enrollment_email": (7, send_enrollment_email),
+    "action_send_email": (3, send_email),
+}
+
+
+def load_domain() -> Dict[str, Any]:
+    '''Il dominio che Rasa invia con ogni chiamata (serve ai form).'''
+    import yaml
+
+    with open(os.path.join(ROOT, "domain.yml"), "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+# --- Esecuzione --------------------------------------------------------------
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+
+async def run_load(url: str, mix: Dict[str, float], catalog: Catalog, domain: Dict[str, Any],
+                   concurrency: int, duration: float, warmup: float, seed: int) -> Dict[str, Any]:
+    import aiohttp
+
+    labels = list(mix)
+    weights = [mix[label] for label in labels]
+    samples: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    counter = iter(range(10 ** 9))
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    async def worker(worker_id: int, session) -> None:
+        rng = random.Random(seed + worker_id)
+        while time.perf_counter() < stop_at:
+            label = rng.choices(labels, weights)[0]
+            action, state = SCENARIOS[label][1](rng, catalog, next(counter))
+            body = {"next_action": action, "sender_id": state["sender_id"], "tracker": state,
+                    "domain": domain, "version": "3.6.21"}
+            t0 = time.perf_counter()
+            try:
+                async with session.post(f"{url}/webhook", json=body) as resp:
+                    await resp.read()
+                    ok = resp.status == 200
+            except aiohttp.ClientError:
+                ok = False
+            t1 = time.perf_counter()
+            if t0 < measure_from:
+                continue
+            samples[label].append((t1 - t0) * 1000)
+            if not ok:
+                errors[label] += 1
+
+    timeout = aiohttp.ClientTimeout(total=120)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        await asyncio.gather(*(worker(i, session) for i in range(concurrency)))
+    elapsed = time.perf_counter() - measure_from
+
+    results = {}
+    for label in labels:
+        values = samples.get(label, [])
+        results[label] = {
+            "requests": len(values),
+            "errors": errors.get(label, 0),
+            "rps": len(values) / elapsed if elapsed > 0 else 0.0,
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": max(values, default=0.0),
+        }
+    total = [v for values in samples.values() for v in values]
+    results["TOTAL"] = {
+        "requests": len(total),
+        "errors": sum(errors.values()),
+        "rps": len(total) / elapsed if elapsed > 0 else 0.0,
+        "p50": percentile(total, 50),
+        "p95": percentile(total, 95),
+        "p99": percentile(total, 99),
+        "max": max(total, default=0.0),
+    }
+    return results
+
+
+def report(results: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    print(f"\n{'action':<44} {'req':>6} {'err':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9}")
+    for label, r in results.items():
+        print(f"{label:<44} {r['requests']:6d} {r['errors']:5d} {r['rps']:8.1f} {r['p50']:9.1f} "
+              f"{r['p95']:9.1f} {r['p99']:9.1f} {r['max']:9.1f}")
+        before = (baseline or {}).get(label)
+        if before and before.get("p95"):
+            deltas = "  ".join(
+                f"{key} {100 * (r[key] - before[key]) / before[key]:+.0f}%"
+                for key in ("rps", "p50", "p95", "p99") if before.get(key)
+            )
+            print(f"{'':<44} rispetto al baseline: {deltas}")
+
+
+def start_action_server(port: int, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "actions.server", "--actions", "actions", "--port", str(port)],
+        cwd=ROOT, env={**os.environ, **env},
+    )
+
+
+def wait_ready(url: str, process: Optional[subprocess.Popen], timeout: float = 300) -> None:
+    '''Attende /ready (riscaldamento completato), o /health sui server che non lo espongono.'''
+    import urllib.error
+    import urllib.request
+
+    path = "/ready"
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f"L'action server è terminato (exit {process.returncode})")
+        try:
+            with urllib.request.urlopen(f"{url}{path}", timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                path = "/health"
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"L'action server non risponde su {url}")
+
+
+def parse_mix(value: Optional[str]) -> Dict[str, float]:
+    if not value:
+        return {label: weight for label, (weight, _) in SCENARIOS.items()}
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        matching = [label for label in SCENARIOS if label == name or label.startswith(f"{name}:")]
+        if not matching:
+            raise SystemExit(f"Scenario sconosciuto: {name} (disponibili: {', '.join(SCENARIOS)})")
+        for label in matching:
+            mix[label] = float(weight or 1)
+    return mix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=10, help="client concorrenti")
+    parser.add_argument("--duration", type=float, default=30, help="secondi di misura")
+    parser.add_argument("--warmup", type=float, default=5, help="secondi iniziali esclusi dalle misure")
+    parser.add_argument("--mix", help="pesi degli scenari, es. action_get_university_info=3,validate_enrollment_form=1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", help="action server già avviato (non viene lanciato né configurato)")
+    parser.add_argument("--port", type=int, default=5056, help="porta dell'action server lanciato")
+    parser.add_argument("--llm-ttft", type=float, default=0.3, help="secondi prima del primo token")
+    parser.add_argument("--llm-token-delay", type=float, default=0.02, help="secondi tra un token e l'altro")
+    parser.add_argument("--llm-stream", action="store_true", help="imposta OLLAMA_STREAM=1")
+    parser.add_argument("--pages-dir", help="pagine HTML salvate (percorso con _ al posto di /)")
+    parser.add_argument("--site-delay", type=float, default=0.2, help="latenza del sito sostitutivo")
+    parser.add_argument("--cold", action="store_true", help="niente refresher né cache su disco: si misurano i crawl")
+    parser.add_argument("--schema", help="schema Postgres del catalogo (es. bench_catalog)")
+    parser.add_argument("--save", help="salva i risultati in JSON")
+    parser.add_argument("--baseline", help="confronta con i risultati salvati da --save")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    ollama = OllamaStandIn(args.llm_ttft, args.llm_token_delay)
+    site = SiteStandIn(args.pages_dir, args.site_delay)
+    smtp = SmtpStandIn()
+    ollama_port, site_port, smtp_port = serve(ollama), serve(site), serve(smtp)
+
+    env = {
+        "OLLAMA_URL": f"http://127.0.0.1:{ollama_port}",
+        "OLLAMA_STREAM": "1" if args.llm_stream else "0",
+        "UNIVPM_BASE_URL": f"http://127.0.0.1:{site_port}",
+        "SMTP_SERVER": "127.0.0.1",
+        "SMTP_PORT": str(smtp_port),
+        "SMTP_STARTTLS": "0",
+        "SMTP_EMAIL": "bot@univpm.it",
+        "SMTP_PASSWORD": "load-test",
+    }
+    if args.schema:
+        env["PGOPTIONS"] = f"-c search_path={args.schema}"
+        os.environ["PGOPTIONS"] = env["PGOPTIONS"]
+
+    spool = tempfile.TemporaryDirectory()
+    env["OUTBOX_DIR"] = os.path.join(spool.name, "outbox")
+    env["PAGE_CACHE_DIR"] = "" if args.cold else os.path.join(spool.name, "pages")
+    if args.cold:
+        env["PAGE_REFRESH_ENABLED"] = "0"
+
+    catalog = Catalog.load()
+    domain = load_domain()
+
+    process = None
+    url = args.url
+    if url is None:
+        url = f"http://127.0.0.1:{args.port}"
+        process = start_action_server(args.port, env)
+    try:
+        wait_ready(url, process)
+        print(f"Carico su {url}: {args.concurrency} client, {args.duration:.0f}s (+{args.warmup:.0f}s di warm-up)")
+        results = asyncio.run(run_load(url, mix, catalog, domain, args.concurrency,
+                                       args.duration, args.warmup, args.seed))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        spool.cleanup()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    print(f"\nsito: {site.requests} richieste, SMTP: {smtp.messages} mail")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+--
+-- VERSIONE DEL CATALOGO
+-- L'action server tiene in memoria una copia di degree/course: ogni modifica
+-- alle tabelle incrementa la versione e notifica il canale 'catalog_changed',
+-- così la copia viene ricaricata solo quando serve.
+--
+
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO catalog_version (id) VALUES (TRUE) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS trigger AS $$
+DECLARE
+    new_version BIGINT;
+BEGIN
+    UPDATE catalog_version
+    SET version = version + 1, updated_at = now()
+    RETURNING version INTO new_version;
+
+    PERFORM pg_notify('catalog_changed', new_version::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER degree_catalog_changed
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON degree
+FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
+
+CREATE TRIGGER course_catalog_changed
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON course
+FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
@@ -0,0 +1,16 @@
+--
+-- INDICI DEL CATALOGO
+-- Le ricerche filtrano sempre per degree(category, type) e per
+-- course(degree_id, is_mandatory): senza indici sono scansioni sequenziali,
+-- invisibili solo finché il seed è piccolo. INCLUDE (name) permette di
+-- rispondere agli elenchi con un index-only scan.
+--
+
+CREATE INDEX IF NOT EXISTS degree_category_type_idx
+    ON degree (category, type) INCLUDE (name);
+
+CREATE INDEX IF NOT EXISTS course_degree_mandatory_idx
+    ON course (degree_id, is_mandatory) INCLUDE (name);
+
+ANALYZE degree;
+ANALYZE course;
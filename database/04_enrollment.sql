@@ -0,0 +1,24 @@
+--
+-- ISCRIZIONI
+-- Un riepilogo per conversazione (sender_id di Rasa), scritto dall'action
+-- server a lotti (actions/enrollments.py). Se lo studente ricompila il form
+-- la riga viene aggiornata, non duplicata.
+--
+
+CREATE TABLE IF NOT EXISTS enrollment (
+    sender_id VARCHAR(255) PRIMARY KEY,
+    student_name VARCHAR(255),
+    email VARCHAR(255) NOT NULL,
+    degree_field VARCHAR(64),
+    degree_type VARCHAR(64),
+    degree_id VARCHAR(5),
+    selected_course VARCHAR(255),
+    language VARCHAR(2),
+    submitted_at TIMESTAMPTZ NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Gli orientatori consultano le iscrizioni per corso di laurea, dalle più recenti
+CREATE INDEX IF NOT EXISTS enrollment_degree_submitted_idx
+    ON enrollment (degree_id, submitted_at DESC);
@@ -0,0 +1,31 @@
+--
+-- TRACKER STORE DI RASA
+-- Le conversazioni vivono su PostgreSQL invece che nella memoria del server
+-- Rasa (tracker_store/ in radice, configurato in endpoints.yml). Gli eventi
+-- vengono solo aggiunti, uno per riga in JSONB, con un numero progressivo per
+-- conversazione; tracker_conversation tiene il conteggio e l'ultima attività
+-- per l'elenco delle conversazioni e per la retention.
+--
+
+CREATE TABLE IF NOT EXISTS tracker_conversation (
+    sender_id VARCHAR(255) PRIMARY KEY,
+    event_count INTEGER NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS tracker_event (
+    sender_id VARCHAR(255) NOT NULL,
+    seq INTEGER NOT NULL,
+    type_name VARCHAR(64) NOT NULL,
+    timestamp DOUBLE PRECISION NOT NULL,
+    data JSONB NOT NULL,
+    PRIMARY KEY (sender_id, seq)
+);
+
+-- Inizio dell'ultima sessione: il tracker si carica da lì in avanti
+CREATE INDEX IF NOT EXISTS tracker_event_session_idx
+    ON tracker_event (sender_id, seq) WHERE type_name = 'session_started';
+
+-- Retention: conversazioni inattive da più tempo
+CREATE INDEX IF NOT EXISTS tracker_conversation_updated_idx
+    ON tracker_conversation (updated_at);
@@ -8,13 +8,34 @@ model_exists() {
 # Modello da scaricare
 MODEL_NAME="qwen3:0.6b" #"qwen2.5:0.5b"
 
-# Avvia il server Ollama in background per permettere l'uso di `ollama list`
+# Quanto il modello resta in memoria dopo l'ultima richiesta (-1 = sempre)
+KEEP_ALIVE="${OLLAMA_KEEP_ALIVE:-30m}"
+
+# Secondi massimi di attesa per l'avvio del server
+STARTUP_TIMEOUT="${OLLAMA_STARTUP_TIMEOUT:-60}"
+
+# File controllato dall'healthcheck di Docker Compose: esiste solo a modello caricato
+READY_FILE=/tmp/ollama-ready
+rm -f "$READY_FILE"
+
+# Avvia il server Ollama (resta lo stesso processo per tutta la vita del container)
 ollama serve &
 OLLAMA_PID=$!
 
-# Attendi qualche secondo che il server si avvii a sufficienza
+# Inoltra lo stop del container al server
+trap 'kill -TERM $OLLAMA_PID 2>/dev/null' TERM INT
+
+# Attendi che il server risponda, invece di un'attesa fissa
 echo "Waiting for Ollama server to initialize..."
-sleep 5
+waited=0
+until ollama list > /dev/null 2>&1; do
+    if [ "$waited" -ge "$STARTUP_TIMEOUT" ]; then
+        echo "Ollama server did not start within ${STARTUP_TIMEOUT}s."
+        break
+    fi
+    sleep 1
+    waited=$((waited + 1))
+done
 
 # Controlla se il modello esiste
 if model_exists "$MODEL_NAME"; then
@@ -28,9 +49,20 @@ else
     fi
 fi
 
-# Porta il server Ollama in primo piano come processo principale del container
-# Prima, uccidi il processo ollama serve in background se è ancora in esecuzione
-kill $OLLAMA_PID &> /dev/null
+# Modello di embedding per la ricerca semantica (opzionale, vedi EMBEDDINGS_MODEL in .env.example)
+if [ -n "$EMBEDDINGS_MODEL" ] && [ "$EMBEDDINGS_MODEL" != "hashing" ] && ! model_exists "$EMBEDDINGS_MODEL"; then
+    echo "Pulling embedding model $EMBEDDINGS_MODEL..."
+    ollama pull "$EMBEDDINGS_MODEL" || echo "Error pulling $EMBEDDINGS_MODEL."
+fi
+
+# Carica i pesi in memoria subito (prompt vuoto), così la prima domanda non paga il caricamento
+echo "Preloading $MODEL_NAME (keep alive $KEEP_ALIVE)..."
+if ollama run "$MODEL_NAME" "" --keepalive "$KEEP_ALIVE" > /dev/null; then
+    touch "$READY_FILE"
+    echo "Model $MODEL_NAME loaded."
+else
+    echo "Error preloading $MODEL_NAME."
+fi
 
-# Eseguilo in primo piano
-exec ollama serve
+# Il server resta in primo piano come processo principale del container
+wait $OLLAMA_PID
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Rende importabile il package `actions` anche lanciando pytest da altre cartelle
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
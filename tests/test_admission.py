@@ -0,0 +1,103 @@
+import asyncio
+import unittest
+
+from actions.admission import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    AdmissionController,
+    Overloaded,
+    QueueTimeout,
+)
+
+
+class TestAdmissionController(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrency_is_bounded(self):
+        admission = AdmissionController(max_concurrency=2, max_queue=10, max_wait=5)
+        running = 0
+        peak = 0
+
+        async def generate():
+            nonlocal running, peak
+            async with admission.slot():
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(generate() for _ in range(8)))
+        self.assertEqual(peak, 2)
+        self.assertEqual(admission.stats()["admitted"], 8)
+        self.assertEqual((admission.active, admission.queued), (0, 0))
+
+    async def test_full_queue_sheds_immediately(self):
+        admission = AdmissionController(max_concurrency=1, max_queue=1, max_wait=5)
+        await admission.acquire()
+        waiter = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0)
+
+        with self.assertRaises(Overloaded):
+            await admission.acquire()
+        self.assertEqual(admission.stats()["shed"], 1)
+
+        admission.release()
+        await waiter
+        admission.release()
+        self.assertEqual((admission.active, admission.queued), (0, 0))
+
+    async def test_waiters_are_served_by_priority(self):
+        admission = AdmissionController(max_concurrency=1, max_queue=10, max_wait=5)
+        await admission.acquire()
+        order = []
+
+        async def wait(name, priority):
+            async with admission.slot(priority):
+                order.append(name)
+
+        tasks = [
+            asyncio.ensure_future(wait("refresh", PRIORITY_BACKGROUND)),
+            asyncio.ensure_future(wait("studente 1", PRIORITY_INTERACTIVE)),
+            asyncio.ensure_future(wait("studente 2", PRIORITY_INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        admission.release()
+        await asyncio.gather(*tasks)
+        self.assertEqual(order, ["studente 1", "studente 2", "refresh"])
+
+    async def test_urgent_request_evicts_background_when_full(self):
+        admission = AdmissionController(max_concurrency=1, max_queue=1, max_wait=5)
+        await admission.acquire()
+        background = asyncio.ensure_future(admission.acquire(PRIORITY_BACKGROUND))
+        await asyncio.sleep(0)
+
+        interactive = asyncio.ensure_future(admission.acquire(PRIORITY_INTERACTIVE))
+        with self.assertRaises(Overloaded):
+            await background
+        admission.release()
+        await interactive
+        self.assertEqual(admission.stats()["evicted"], 1)
+        admission.release()
+
+    async def test_wait_deadline(self):
+        admission = AdmissionController(max_concurrency=1, max_queue=5, max_wait=0.02)
+        await admission.acquire()
+        with self.assertRaises(QueueTimeout):
+            await admission.acquire()
+        self.assertEqual(admission.stats()["expired"], 1)
+        self.assertEqual(admission.queued, 0)
+        admission.release()
+        self.assertEqual(admission.active, 0)
+
+    async def test_cancelled_waiter_gives_back_its_place(self):
+        admission = AdmissionController(max_concurrency=1, max_queue=5, max_wait=5)
+        await admission.acquire()
+        waiter = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        self.assertEqual(admission.queued, 0)
+
+        admission.release()
+        self.assertEqual(admission.active, 0)
+        await admission.acquire()
+        self.assertEqual(admission.active, 1)
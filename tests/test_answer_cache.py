@@ -0,0 +1,48 @@
+import time
+import unittest
+
+from actions.answer_cache import AnswerCache, normalize_question
+
+URL = "https://www.univpm.it/Entra/Tasse_e_contributi"
+CONTEXT = "Tasse e contributi: la seconda rata entro il 31 marzo."
+
+
+class TestAnswerCache(unittest.TestCase):
+    def test_normalize_question(self):
+        self.assertEqual(normalize_question("  Quanto costa la RETTA? "), "quanto costa la retta")
+        self.assertEqual(normalize_question("Cos'è l'ISEE?"), "cos e l isee")
+
+    def test_hit_on_equivalent_question(self):
+        cache = AnswerCache()
+        cache.put(URL, "v1", CONTEXT, "Quanto costa la retta?", "it", "Dipende dall'ISEE.")
+        self.assertEqual(cache.get(URL, "v1", CONTEXT, "quanto costa la retta", "it"), "Dipende dall'ISEE.")
+        # Lingua o contesto diversi sono un'altra chiave
+        self.assertIsNone(cache.get(URL, "v1", CONTEXT, "quanto costa la retta", "en"))
+        self.assertIsNone(cache.get(URL, "v1", CONTEXT + " ISEE", "quanto costa la retta", "it"))
+
+    def test_page_change_invalidates(self):
+        cache = AnswerCache()
+        cache.put(URL, "v1", CONTEXT, "retta", "it", "vecchia risposta")
+        self.assertIsNone(cache.get(URL, "v2", CONTEXT, "retta", "it"))
+        self.assertEqual(cache.stats()["invalidated"], 1)
+
+        cache.put(URL, "v2", CONTEXT, "retta", "it", "risposta")
+        self.assertEqual(cache.invalidate_page(URL, "v3"), 1)
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_ttl_and_lru(self):
+        cache = AnswerCache(max_entries=2, ttl=0.01)
+        cache.put(URL, "v1", CONTEXT, "a", "it", "A")
+        time.sleep(0.02)
+        self.assertIsNone(cache.get(URL, "v1", CONTEXT, "a", "it"))
+
+        cache = AnswerCache(max_entries=2, ttl=60)
+        for q in ("a", "b", "c"):
+            cache.put(URL, "v1", CONTEXT, q, "it", q.upper())
+        self.assertIsNone(cache.get(URL, "v1", CONTEXT, "a", "it"))
+        self.assertEqual(cache.get(URL, "v1", CONTEXT, "c", "it"), "C")
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
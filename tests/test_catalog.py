@@ -0,0 +1,234 @@
+import unittest
+
+from actions.catalog import CatalogCache, CatalogSnapshot, Course, Degree
+from actions.catalog_queries import ENROLLMENT_SUMMARY, execute, prepared_statements
+from actions.db import ConnectionPool
+
+
+DEGREES = [
+    ("L8", "Ingegneria Informatica, Elettronica e Videogame", "Bachelor's Degree", "Enginering"),
+    ("L33", "Economia e Commercio", "Bachelor's Degree", "Economics"),
+    ("LM32", "Ingegneria Informatica e dell'Automazione", "Master's Degree", "Enginering"),
+]
+
+COURSES = [
+    (1, "L8", "Calculus and Analytical Geometry", True),
+    (2, "L8", "Physics for Engineers", True),
+    (3, "L8", "Advanced Robotics", False),
+    (4, "L33", "Microeconomics", True),
+    (5, "L33", "Entrepreneurship and Innovation", False),
+]
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.version = 1
+        self.degrees = list(DEGREES)
+        self.courses = list(COURSES)
+        self.queries = []
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.db = connection.db
+        self.rows = []
+
+    def execute(self, query, params=None):
+        self.db.queries.append(query)
+        if query.startswith("PREPARE "):
+            name = query.split()[1]
+            self.connection.prepared[name] = query
+            return
+        if query.startswith("EXECUTE "):
+            query = self.connection.prepared[query.split()[1]]
+        if "json_agg" in query:
+            self.rows = [(
+                self.db.version,
+                [list(row) for row in self.db.degrees],
+                [list(row) for row in self.db.courses],
+            )]
+        elif "catalog_version" in query:
+            self.rows = [(self.db.version,)]
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    closed = 0
+
+    def __init__(self, db):
+        self.db = db
+        self.prepared = {}
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+class TestCatalogSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeDatabase()
+        pool = ConnectionPool(connect=lambda: FakeConnection(self.db), max_size=1)
+        self.cache = CatalogCache(pool=pool, poll_interval=0.0)
+
+    def test_indexes(self):
+        catalog = self.cache.get()
+        self.assertEqual([d.id for d in catalog.degrees_for("Enginering", "Bachelor's Degree")], ["L8"])
+        self.assertEqual(catalog.degree("L33"), Degree(*DEGREES[1]))
+        self.assertEqual(
+            [c.name for c in catalog.courses_for("L8", mandatory=True)],
+            ["Calculus and Analytical Geometry", "Physics for Engineers"],
+        )
+        self.assertEqual(catalog.courses_for("L8", mandatory=False), [Course(*COURSES[2])])
+
+    def test_optional_course_lookup(self):
+        catalog = self.cache.get()
+        self.assertEqual(catalog.optional_course("L8", "3").name, "Advanced Robotics")
+        # Obbligatorio, di un'altra laurea o non numerico
+        self.assertIsNone(catalog.optional_course("L8", "1"))
+        self.assertIsNone(catalog.optional_course("L8", "5"))
+        self.assertIsNone(catalog.optional_course("L8", "abc"))
+
+    def test_find_degree_by_name(self):
+        catalog = self.cache.get()
+        self.assertEqual(catalog.find_degree("l8").id, "L8")
+        self.assertEqual(catalog.find_degree("ingegneria informatica", "Enginering", "Bachelor's Degree").id, "L8")
+        self.assertEqual(catalog.find_degree("ingegneria informatica", "Enginering", "Master's Degree").id, "LM32")
+        self.assertEqual(catalog.find_degree("economia e comercio").id, "L33")
+        self.assertIsNone(catalog.find_degree("medicina", "Medicine", "Bachelor's Degree"))
+
+    def test_find_degree_id_is_case_insensitive(self):
+        catalog = self.cache.get()
+        self.assertEqual(catalog.find_degree(" [lm32] ").id, "LM32")
+        # Id di un'altra area o di un altro tipo
+        self.assertIsNone(catalog.find_degree("L8", "Enginering", "Master's Degree"))
+
+    def test_reload_only_when_version_changes(self):
+        self.cache.get()
+        self.cache.get()
+        self.assertEqual(self.cache.reloads, 1)
+
+        self.db.version = 2
+        self.db.degrees.append(("L99", "Nuova Laurea", "Bachelor's Degree", "Science"))
+        catalog = self.cache.get()
+        self.assertEqual(self.cache.reloads, 2)
+        self.assertEqual(catalog.degree("L99").name, "Nuova Laurea")
+
+    def test_single_prepared_round_trip(self):
+        self.cache.get()
+        self.db.version = 2
+        self.cache.get()
+        # Ogni statement viene preparato una sola volta sulla connessione del pool
+        prepares = [q for q in self.db.queries if q.startswith("PREPARE")]
+        self.assertEqual(sorted(q.split()[1] for q in prepares), ["catalog_snapshot", "catalog_version"])
+        self.assertEqual(self.db.queries.count("EXECUTE catalog_snapshot"), 2)
+
+
+class PgError(Exception):
+    def __init__(self, pgcode):
+        super().__init__(pgcode)
+        self.pgcode = pgcode
+
+
+class TestPreparedStatements(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeDatabase()
+        self.conn = FakeConnection(self.db)
+
+    def test_parameters_and_reuse(self):
+        cur = self.conn.cursor()
+        execute(cur, ENROLLMENT_SUMMARY, ("L8", 3))
+        execute(cur, ENROLLMENT_SUMMARY, ("L33", None))
+        self.assertTrue(self.db.queries[0].startswith("PREPARE enrollment_summary (text, integer) AS"))
+        self.assertEqual(self.db.queries[1:], ["EXECUTE enrollment_summary (%s, %s)"] * 2)
+
+        # Una nuova connessione (nuova sessione) prepara di nuovo
+        other = FakeConnection(self.db)
+        execute(other.cursor(), ENROLLMENT_SUMMARY, ("L8", 3))
+        self.assertEqual(len([q for q in self.db.queries if q.startswith("PREPARE")]), 2)
+
+    def test_lost_statement_is_prepared_again(self):
+        cur = self.conn.cursor()
+        execute(cur, ENROLLMENT_SUMMARY, ("L8", 3))
+
+        def fail(query, params=None):
+            raise PgError("26000")
+
+        cur.execute = fail
+        with self.assertRaises(PgError):
+            execute(cur, ENROLLMENT_SUMMARY, ("L8", 3))
+        self.assertNotIn("enrollment_summary", prepared_statements(self.conn))
+
+
+# Estratto di database/01_seed.sql con lauree dai nomi e dagli id simili
+SEED_DEGREES = [
+    Degree("L7", "Ingegneria Civile e Ambientale", "Bachelor's Degree", "Enginering"),
+    Degree("L8", "Ingegneria Informatica, Elettronica e Videogame", "Bachelor's Degree", "Enginering"),
+    Degree("L9-L8", "Ingegneria Gestionale (Interclasse)", "Bachelor's Degree", "Enginering"),
+    Degree("L13", "Scienze Biologiche", "Bachelor's Degree", "Science"),
+    Degree("L18", "Economia Aziendale e Digital Business", "Bachelor's Degree", "Economics"),
+    Degree("L22", "Scienze Motorie per la Salute", "Bachelor's Degree", "Science"),
+    Degree("L33", "Economia e Commercio", "Bachelor's Degree", "Economics"),
+    Degree("LM6", "Biologia Marina e Biologia Molecolare", "Master's Degree", "Science"),
+    Degree("LM23", "Ingegneria Civile", "Master's Degree", "Enginering"),
+    Degree("LM24", "Ingegneria Edile", "Master's Degree", "Enginering"),
+    Degree("LM29", "Ingegneria Elettronica", "Master's Degree", "Enginering"),
+    Degree("LM30", "Green Industrial Engineering", "Master's Degree", "Enginering"),
+    Degree("LM32", "Ingegneria Informatica e dell'Automazione", "Master's Degree", "Enginering"),
+]
+
+BACHELOR = "Bachelor's Degree"
+MASTER = "Master's Degree"
+
+
+class TestMatchDegree(unittest.TestCase):
+    def setUp(self):
+        self.catalog = CatalogSnapshot(SEED_DEGREES, [])
+
+    def test_id_typos_are_not_corrected(self):
+        self.assertIsNone(self.catalog.find_degree("LM3", "Enginering", MASTER))
+        self.assertIsNone(self.catalog.find_degree("LM3", "Science", MASTER))
+        self.assertIsNone(self.catalog.find_degree("L1", "Economics", BACHELOR))
+        self.assertIsNone(self.catalog.find_degree("L1", "Science", BACHELOR))
+        self.assertEqual(self.catalog.match_degree("LM3", "Enginering", MASTER).candidates, [])
+
+    def test_ambiguous_name_returns_candidates(self):
+        match = self.catalog.match_degree("ingegneria", "Enginering", MASTER)
+        self.assertIsNone(match.degree)
+        self.assertEqual({d.id for d in match.candidates}, {"LM23", "LM24", "LM29", "LM32"})
+
+        match = self.catalog.match_degree("scienze", "Science", BACHELOR)
+        self.assertIsNone(match.degree)
+        self.assertEqual({d.id for d in match.candidates}, {"L13", "L22"})
+
+        # Nomi approssimati quasi ugualmente simili
+        match = self.catalog.match_degree("ingegnera", "Enginering", MASTER)
+        self.assertIsNone(match.degree)
+        self.assertGreater(len(match.candidates), 1)
+
+    def test_unambiguous_names(self):
+        self.assertEqual(self.catalog.find_degree("ingegneria informatica", "Enginering", MASTER).id, "LM32")
+        self.assertEqual(self.catalog.find_degree("vorrei ingegneria civile", "Enginering", MASTER).id, "LM23")
+        self.assertEqual(self.catalog.find_degree("ingegneira civile", "Enginering", MASTER).id, "LM23")
+        self.assertEqual(self.catalog.find_degree("biologia marina", "Science", MASTER).id, "LM6")
+        self.assertEqual(self.catalog.find_degree("economia e comercio", "Economics", BACHELOR).id, "L33")
+
+
+if __name__ == '__main__':
+    unittest.main()
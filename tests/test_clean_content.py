@@ -1,26 +1,7 @@
-import re
 import unittest
 
-def clean_content(text: str) -> str:
-    # Rimuove immagini Markdown: ![alt](url)
-    text = re.sub(r'!\s*\[.*?\]\s*\(.*?\)', '', text)
-    
-    # Rimuove link Markdown mantenendo il testo: [testo](url) -> testo
-    text = re.sub(r'\[([^\\]+?)\]\s*\(.*?\)', r'\1', text)
-    
-    # Rimuove tag HTML residui
-    text = re.sub(r'<[^>]+>', '', text)
-    
-    # Rimuove righe con troppi caratteri speciali
-    text = re.sub(r'^\s*[-=_*]{3,}\s*$', '', text, flags=re.MULTILINE)
-
-    # Collassa newline multipli
-    text = re.sub(r'\n\s*\n', '\n\n', text)
-    
-    # Rimuove spazi multipli
-    text = re.sub(r'[ \t]+', ' ', text)
-    
-    return text.strip()
+from actions.cleaner import clean_content, iter_clean
+
 
 class TestCleanContent(unittest.TestCase):
     def test_clean_links(self):
@@ -53,5 +34,30 @@ class TestCleanContent(unittest.TestCase):
         self.assertIn("| Header 1 | Header 2 |", processed)
         self.assertIn("| Val 1 | Val 2 |", processed)
 
+    def test_clean_html_tags(self):
+        raw = "Scadenza <b>31 marzo</b> per la [<i>seconda rata</i>](/rate)."
+        self.assertEqual(clean_content(raw), "Scadenza 31 marzo per la seconda rata.")
+
+    def test_linked_image_removed(self):
+        raw = "[![logo](logo.png)](/home) Benvenuti"
+        self.assertEqual(clean_content(raw), "Benvenuti")
+
+    def test_spaces_and_tabs(self):
+        self.assertEqual(clean_content("a  \t b\t\tc"), "a b c")
+
+    def test_separator_on_first_line(self):
+        self.assertEqual(clean_content("***\nTesto"), "Testo")
+
+    def test_blocks_match_single_pass(self):
+        page = "\n\n".join(f"## Sezione {i}\n\nTesto [link {i}](/p/{i}) con  spazi.\n---" for i in range(300))
+        self.assertEqual(clean_content(page, block_size=512), clean_content(page))
+        self.assertEqual("\n\n".join(iter_clean(page, block_size=512)), clean_content(page))
+
+    def test_budget_stops_early(self):
+        page = "Paragrafo di prova con [un link](/x).\n\n" * 10000
+        cleaned = clean_content(page, max_chars=1000)
+        self.assertLessEqual(len(cleaned), 1000)
+        self.assertTrue(clean_content(page).startswith(cleaned))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,111 @@
+import os
+import asyncio
+import unittest
+
+from actions import crawler_pool
+from actions.crawler_pool import CrawlerPool
+
+
+class FakeCrawler:
+    def __init__(self, n):
+        self.n = n
+        self.closed = False
+
+    async def arun(self, url):
+        return url
+
+    async def close(self):
+        self.closed = True
+
+
+class TestCrawlerPool(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.created = []
+
+        async def factory():
+            crawler = FakeCrawler(len(self.created))
+            self.created.append(crawler)
+            return crawler
+
+        self.factory = factory
+
+    async def test_start_warms_up_all_browsers(self):
+        pool = CrawlerPool(size=3, factory=self.factory)
+        await pool.start()
+        self.assertEqual(len(self.created), 3)
+        self.assertEqual(pool.stats()["idle"], 3)
+        await pool.close()
+        self.assertTrue(all(c.closed for c in self.created))
+        self.assertEqual(pool.stats()["live"], 0)
+
+    async def test_browser_is_reused_between_leases(self):
+        pool = CrawlerPool(size=1, factory=self.factory)
+        async with pool.lease() as first:
+            pass
+        async with pool.lease() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(len(self.created), 1)
+        await pool.close()
+
+    async def test_recycled_after_max_pages(self):
+        pool = CrawlerPool(size=1, max_pages=2, factory=self.factory)
+        for _ in range(2):
+            async with pool.lease() as crawler:
+                await crawler.arun("https://www.univpm.it/Entra")
+        await asyncio.sleep(0)
+        async with pool.lease() as crawler:
+            self.assertIsNot(crawler, self.created[0])
+        self.assertTrue(self.created[0].closed)
+        self.assertEqual(pool.stats()["recycled"], 1)
+        await pool.close()
+
+    async def test_crashed_browser_is_replaced(self):
+        pool = CrawlerPool(size=1, factory=self.factory)
+        with self.assertRaises(RuntimeError):
+            async with pool.lease():
+                raise RuntimeError("browser crashed")
+        async with pool.lease() as crawler:
+            self.assertIsNot(crawler, self.created[0])
+        self.assertEqual(pool.stats()["crashed"], 1)
+        self.assertEqual(pool.stats()["live"], 1)
+        await pool.close()
+
+    async def test_concurrent_leases_are_bounded(self):
+        pool = CrawlerPool(size=2, factory=self.factory)
+        in_use = []
+        peak = []
+
+        async def worker():
+            async with pool.lease() as crawler:
+                in_use.append(crawler)
+                peak.append(len(in_use))
+                await asyncio.sleep(0.01)
+                in_use.remove(crawler)
+
+        await asyncio.gather(*(worker() for _ in range(6)))
+        self.assertEqual(max(peak), 2)
+        self.assertEqual(len(self.created), 2)
+        await pool.close()
+
+    async def test_lazy_pool_starts_browsers_on_first_lease(self):
+        saved, saved_env = crawler_pool._pool, os.environ.get("CRAWLER_POOL_EAGER")
+        crawler_pool._pool = CrawlerPool(size=2, factory=self.factory)
+        os.environ["CRAWLER_POOL_EAGER"] = "0"
+        try:
+            await crawler_pool.start_crawler_pool()
+            self.assertEqual(self.created, [])
+            async with crawler_pool.get_crawler_pool().lease() as crawler:
+                self.assertIs(crawler, self.created[0])
+            self.assertEqual(len(self.created), 1)
+            await crawler_pool.close_crawler_pool()
+        finally:
+            crawler_pool._pool = saved
+            if saved_env is None:
+                os.environ.pop("CRAWLER_POOL_EAGER", None)
+            else:
+                os.environ["CRAWLER_POOL_EAGER"] = saved_env
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import threading
+import time
+import unittest
+
+from actions.db import ConnectionPool, PoolTimeoutError
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params=None):
+        if self.conn.fail_queries:
+            raise RuntimeError("connection lost")
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.fail_queries = False
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+class TestConnectionPool(unittest.TestCase):
+    def make_pool(self, **kwargs):
+        self.opened = []
+
+        def connect():
+            conn = FakeConnection()
+            self.opened.append(conn)
+            return conn
+
+        return ConnectionPool(connect=connect, **kwargs)
+
+    def test_connection_is_reused(self):
+        pool = self.make_pool(max_size=2)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual(first.commits, 2)
+
+    def test_rollback_on_error(self):
+        pool = self.make_pool()
+        with self.assertRaises(ValueError):
+            with pool.connection() as conn:
+                raise ValueError("boom")
+        self.assertEqual(conn.rollbacks, 1)
+        self.assertEqual(pool.stats()["idle"], 1)
+
+    def test_max_lifetime_recycles_connection(self):
+        pool = self.make_pool(max_lifetime=0.0)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+        self.assertIsNot(first, second)
+        self.assertTrue(first.closed)
+        self.assertGreaterEqual(pool.stats()["recycled"], 1)
+
+    def test_failed_health_check_replaces_connection(self):
+        pool = self.make_pool(health_check_after=0.0)
+        with pool.connection() as first:
+            pass
+        first.fail_queries = True
+        with pool.connection() as second:
+            pass
+        self.assertIsNot(first, second)
+        self.assertEqual(pool.stats()["failed_health_checks"], 1)
+
+    def test_pool_is_bounded_and_times_out(self):
+        pool = self.make_pool(max_size=1, acquire_timeout=0.05)
+        with pool.connection():
+            with self.assertRaises(PoolTimeoutError):
+                with pool.connection():
+                    pass
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+    def test_waiter_gets_released_connection(self):
+        pool = self.make_pool(max_size=1, acquire_timeout=2.0)
+        got = []
+
+        def worker():
+            with pool.connection() as conn:
+                got.append(conn)
+
+        with pool.connection() as conn:
+            t = threading.Thread(target=worker)
+            t.start()
+            time.sleep(0.05)
+        t.join()
+        self.assertEqual(got, [conn])
+        stats = pool.stats()
+        self.assertEqual(stats["waits"], 1)
+        self.assertEqual(stats["size"], 1)
+        self.assertEqual(stats["in_use"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
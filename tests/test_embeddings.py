@@ -0,0 +1,141 @@
+import asyncio
+import tempfile
+import unittest
+
+try:
+    import numpy as np
+except ImportError:  # numpy è in actions/requirements.txt
+    raise unittest.SkipTest("numpy not installed")
+
+from actions.embeddings import EmbeddingIndex, HashingEmbedder, SemanticSearch
+from actions.page_cache import CachedPage
+
+FEES = "https://www.univpm.it/Entra/Tasse_e_contributi"
+HOUSING = "https://www.univpm.it/Entra/Servizi_agli_studenti/Alloggi"
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def embed(self, texts):
+        self.calls.append(list(texts))
+        return await super().embed(texts)
+
+
+def pages():
+    return [
+        CachedPage(FEES, "Le tasse universitarie si pagano in tre rate. Contributo onnicomprensivo e ISEE."),
+        CachedPage(HOUSING, "Residenze e alloggi per studenti fuori sede. Posti letto ERDIS a Ancona."),
+    ]
+
+
+class TestEmbeddings(unittest.IsolatedAsyncioTestCase):
+    async def test_hashing_embedder_is_deterministic(self):
+        embedder = HashingEmbedder(dim=64)
+        a, b = await embedder.embed(["tasse universitarie", "tasse universitarie"])
+        self.assertEqual(a.shape, (64,))
+        self.assertTrue(np.array_equal(a, b))
+
+    async def test_search_finds_page_across_all_pages(self):
+        search = SemanticSearch(HashingEmbedder())
+        hits = await search.search(pages(), "cerco un alloggio per studenti", k=2)
+        self.assertEqual(hits[0].url, HOUSING)
+        self.assertGreaterEqual(hits[0].score, hits[1].score)
+
+    async def test_saved_index_is_searched_without_pages(self):
+        with tempfile.TemporaryDirectory() as directory:
+            await SemanticSearch(HashingEmbedder(), directory=directory).ensure(pages())
+
+            search = SemanticSearch(HashingEmbedder(), directory=directory)
+            hits = await search.search_index("cerco un alloggio per studenti", k=1)
+            self.assertEqual(hits[0].url, HOUSING)
+            self.assertEqual(search.indexed_hash(HOUSING), pages()[1].content_hash)
+
+    async def test_search_index_is_empty_before_indexing(self):
+        self.assertEqual(await SemanticSearch(HashingEmbedder()).search_index("tasse"), [])
+
+    async def test_update_page_replaces_only_its_rows(self):
+        embedder = CountingEmbedder()
+        search = SemanticSearch(embedder)
+        site = pages()
+        await search.ensure(site)
+
+        updated = CachedPage(FEES, "Nuove scadenze delle rate delle tasse.")
+        index = await search.update_page(updated)
+        self.assertEqual(embedder.calls[-1], ["Nuove scadenze delle rate delle tasse."])
+        self.assertEqual(index.pages, {FEES: updated.content_hash, HOUSING: site[1].content_hash})
+        self.assertEqual({row[0] for row in index.rows}, {FEES, HOUSING})
+
+        # Pagina nuova, non ancora nell'indice
+        other = CachedPage("https://www.univpm.it/Entra", "Portale di ingresso dell'ateneo.")
+        index = await search.update_page(other)
+        self.assertEqual(len(index), 3)
+        self.assertIs(await search.update_page(other), index)
+
+    async def test_query_vectors_are_cached_per_normalized_question(self):
+        embedder = CountingEmbedder()
+        search = SemanticSearch(embedder)
+        site = pages()
+        await search.search(site, "Quanto costano le tasse?")
+        await search.search(site, "quanto costano le TASSE")
+
+        self.assertEqual(len(embedder.calls), 3)  # due pagine + una domanda
+        self.assertEqual(search.stats()["query_hits"], 1)
+
+    async def test_slow_query_embedding_times_out(self):
+        class SlowEmbedder(HashingEmbedder):
+            slow = False
+
+            async def embed(self, texts):
+                if self.slow:
+                    await asyncio.sleep(5)
+                return await super().embed(texts)
+
+        embedder = SlowEmbedder()
+        search = SemanticSearch(embedder, query_timeout=0.05)
+        await search.ensure(pages())
+        # Ollama occupato: l'embedding della domanda non arriva in tempo
+        embedder.slow = True
+        with self.assertRaises(asyncio.TimeoutError):
+            await search.search_index("dove posso dormire?")
+        self.assertEqual(search.stats()["query_cache_size"], 0)
+
+    async def test_only_changed_pages_are_embedded_again(self):
+        embedder = CountingEmbedder()
+        search = SemanticSearch(embedder)
+        site = pages()
+        await search.ensure(site)
+
+        site[0] = CachedPage(FEES, "Tasse aggiornate: nuove scadenze delle rate.")
+        index = await search.ensure(site)
+        self.assertEqual(embedder.calls[-1], ["Tasse aggiornate: nuove scadenze delle rate."])
+        self.assertEqual(index.pages[FEES], site[0].content_hash)
+
+        self.assertIs(await search.ensure(site), index)
+
+    async def test_index_is_saved_and_memory_mapped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            await SemanticSearch(HashingEmbedder(), directory=directory).ensure(pages())
+
+            loaded = EmbeddingIndex.load(directory)
+            self.assertIsInstance(loaded.vectors, np.memmap)
+            self.assertEqual(len(loaded), 2)
+
+            # Un nuovo processo riusa l'indice salvato senza ricalcolare nulla
+            embedder = CountingEmbedder()
+            await SemanticSearch(embedder, directory=directory).ensure(pages())
+            self.assertEqual(embedder.calls, [])
+
+    def test_top_k_ordering(self):
+        vectors = np.eye(4, dtype=np.float32)
+        rows = [("u", i, 0, 1) for i in range(4)]
+        index = EmbeddingIndex(vectors, rows, "test", {"u": "h"})
+        query = np.array([0.1, 0.9, 0.4, 0.0], dtype=np.float32)
+        self.assertEqual([hit.chunk_index for hit in index.search(query, k=2)], [1, 2])
+        self.assertEqual(len(index.search(query, k=10)), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
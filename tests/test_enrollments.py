@@ -0,0 +1,165 @@
+import os
+import json
+import asyncio
+import tempfile
+import threading
+import unittest
+
+from actions.enrollments import COLUMNS, EnrollmentWriter, upsert_enrollments
+
+
+class RecordingDb:
+    '''Scrittura di un lotto: registra le righe, oppure fallisce le prime `failures` volte.'''
+
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+        self.lock = threading.Lock()
+
+    def __call__(self, rows):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("database non raggiungibile")
+            self.batches.append([row["sender_id"] for row in rows])
+
+
+class RowRejected(Exception):
+    '''Come psycopg2.DataError: il DB rifiuta i dati di una riga.'''
+
+
+class ConstrainedDb(RecordingDb):
+    '''Rifiuta ogni lotto che contiene una riga "bad", con dati non validi per il DB.'''
+
+    def __call__(self, rows):
+        if any(row["sender_id"].startswith("bad") for row in rows):
+            raise RowRejected("value too long for type character varying(2)")
+        super().__call__(rows)
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params):
+        self.conn.executed.append((sql, params))
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.executed = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+class TestEnrollmentWriter(unittest.IsolatedAsyncioTestCase):
+    async def test_flushes_when_batch_is_full(self):
+        db = RecordingDb()
+        writer = EnrollmentWriter(db, batch_size=3, flush_interval=60)
+        for sender in ("a", "b", "c"):
+            writer.submit(sender, email=f"{sender}@example.com")
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(db.batches, [["a", "b", "c"]])
+        self.assertEqual(writer.stats()["written"], 3)
+        await writer.stop()
+
+    async def test_flushes_after_interval(self):
+        db = RecordingDb()
+        writer = EnrollmentWriter(db, batch_size=100, flush_interval=0.05)
+        writer.submit("a", email="a@example.com")
+        await asyncio.sleep(0.01)
+        self.assertEqual(db.batches, [])
+
+        await asyncio.sleep(0.1)
+        self.assertEqual(db.batches, [["a"]])
+        await writer.stop()
+
+    async def test_same_sender_is_written_once_with_latest_data(self):
+        written = []
+        writer = EnrollmentWriter(written.extend, batch_size=100, flush_interval=60)
+        writer.submit("a", email="old@example.com")
+        writer.submit("a", email="new@example.com")
+        await writer.stop()
+
+        self.assertEqual(len(written), 1)
+        self.assertEqual(written[0]["email"], "new@example.com")
+
+    async def test_stop_flushes_buffer(self):
+        db = RecordingDb()
+        writer = EnrollmentWriter(db, batch_size=100, flush_interval=60)
+        writer.submit("a", email="a@example.com")
+        writer.submit("b", email="b@example.com")
+        await writer.stop()
+
+        self.assertEqual(db.batches, [["a", "b"]])
+        self.assertEqual(writer.pending(), 0)
+
+    async def test_failed_batch_is_kept_and_retried(self):
+        db = RecordingDb(failures=1)
+        writer = EnrollmentWriter(db, batch_size=100, flush_interval=0.01, max_retry_delay=0.02)
+        writer.submit("a", email="a@example.com")
+        await asyncio.sleep(0.015)
+        # Mentre il lotto è in errore arriva una versione più recente della stessa iscrizione
+        writer.submit("a", email="fixed@example.com")
+        await asyncio.sleep(0.1)
+
+        self.assertEqual(db.batches, [["a"]])
+        stats = writer.stats()
+        self.assertEqual(stats["failures"], 1)
+        self.assertEqual(stats["pending"], 0)
+        self.assertIn("database non raggiungibile", stats["last_error"])
+        await writer.stop()
+
+    async def test_rejected_row_does_not_block_the_batch(self):
+        db = ConstrainedDb()
+        with tempfile.TemporaryDirectory() as tmp:
+            dead_letter = os.path.join(tmp, "rejected.jsonl")
+            writer = EnrollmentWriter(db, batch_size=100, flush_interval=60, dead_letter=dead_letter,
+                                      is_row_error=lambda e: isinstance(e, RowRejected))
+            for sender in ("a", "bad", "b"):
+                writer.submit(sender, email=f"{sender}@example.com")
+            self.assertEqual(await writer.flush(), 2)
+
+            self.assertEqual(db.batches, [["a"], ["b"]])
+            stats = writer.stats()
+            self.assertEqual((stats["written"], stats["rejected"], stats["pending"]), (2, 1, 0))
+            with open(dead_letter, encoding="utf-8") as f:
+                rejected = [json.loads(line) for line in f]
+            self.assertEqual([r["row"]["sender_id"] for r in rejected], ["bad"])
+            await writer.stop()
+
+    async def test_long_values_are_truncated(self):
+        written = []
+        writer = EnrollmentWriter(written.extend, batch_size=100, flush_interval=60)
+        writer.submit("a", email="a@example.com", student_name="x" * 300, language="italiano")
+        await writer.stop()
+
+        self.assertEqual(len(written[0]["student_name"]), 255)
+        self.assertEqual(written[0]["language"], "it")
+
+
+class TestUpsert(unittest.TestCase):
+    def test_single_multi_row_statement(self):
+        conn = FakeConnection()
+        upsert_enrollments(conn, [{"sender_id": "a", "email": "a@x.it"}, {"sender_id": "b", "email": "b@x.it"}])
+
+        self.assertEqual(len(conn.executed), 1)
+        sql, params = conn.executed[0]
+        self.assertEqual(sql.count("(%s"), 2)
+        self.assertIn("ON CONFLICT (sender_id) DO UPDATE", sql)
+        self.assertEqual(len(params), 2 * len(COLUMNS))
+        self.assertEqual(params[0], "a")
+
+    def test_empty_batch_does_nothing(self):
+        conn = FakeConnection()
+        upsert_enrollments(conn, [])
+        self.assertEqual(conn.executed, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,209 @@
+import json
+import asyncio
+import unittest
+
+from actions.llm import GenerationStats, OllamaClient, OllamaError, SentenceBuffer
+
+
+class FakeOllama:
+    '''Server HTTP locale che risponde a /api/generate come Ollama.'''
+
+    def __init__(self):
+        self.status = 200
+        # Righe della risposta in streaming: (attesa in secondi, oggetto JSON o testo)
+        self.lines = []
+        # Risposta senza streaming e secondi impiegati a generarla
+        self.response = "Risposta"
+        self.delay = 0.0
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+
+    async def handle(self, request):
+        from aiohttp import web
+
+        payload = await request.json()
+        self.requests.append(payload)
+        if self.status != 200:
+            return web.Response(status=self.status, text="model 'test' not found")
+        if not payload["stream"]:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            try:
+                await asyncio.sleep(self.delay)
+            finally:
+                self.active -= 1
+            return web.json_response({"response": self.response, "done": True})
+        resp = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await resp.prepare(request)
+        for delay, line in self.lines:
+            await asyncio.sleep(delay)
+            text = line if isinstance(line, str) else json.dumps(line)
+            await resp.write(text.encode() + b"\n")
+        await resp.write_eof()
+        return resp
+
+    async def handle_embed(self, request):
+        from aiohttp import web
+
+        payload = await request.json()
+        return web.json_response({"embeddings": [[float(len(text)), 1.0] for text in payload["input"]]})
+
+
+class OllamaServerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        try:
+            from aiohttp import web
+            from aiohttp.test_utils import TestServer
+        except ImportError:
+            self.skipTest("aiohttp not installed")
+        self.ollama = FakeOllama()
+        app = web.Application()
+        app.router.add_post("/api/generate", self.ollama.handle)
+        app.router.add_post("/api/embed", self.ollama.handle_embed)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.client = OllamaClient(str(self.server.make_url("")), "test", read_timeout=5, max_concurrency=2)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.close()
+
+    async def collect(self, **kwargs):
+        stats = GenerationStats()
+        pieces = [piece async for piece in self.client.stream("Domanda", stats=stats, **kwargs)]
+        return pieces, stats
+
+
+class TestStream(OllamaServerTestCase):
+    async def test_stops_on_done(self):
+        self.ollama.lines = [
+            (0, {"response": "La retta ", "done": False}),
+            (0, {"response": "dipende dall'ISEE.", "done": False}),
+            (0, {"response": "", "done": True, "prompt_eval_duration": 2e8, "eval_duration": 5e8}),
+        ]
+        pieces, stats = await self.collect()
+
+        self.assertEqual("".join(pieces), "La retta dipende dall'ISEE.")
+        self.assertEqual((stats.stop_reason, stats.tokens), ("done", 2))
+        self.assertAlmostEqual(stats.prompt_eval_duration, 0.2)
+        self.assertEqual(self.ollama.requests[0]["stream"], True)
+
+    async def test_stops_after_max_tokens(self):
+        self.ollama.lines = [(0, {"response": f"t{i} ", "done": False}) for i in range(10)]
+        pieces, stats = await self.collect(max_tokens=3)
+
+        self.assertEqual(pieces, ["t0 ", "t1 ", "t2 "])
+        self.assertEqual(stats.stop_reason, "max_tokens")
+        # Anche Ollama viene fermato, non solo la lettura
+        self.assertEqual(self.ollama.requests[0]["options"]["num_predict"], 3)
+
+    async def test_stops_at_deadline_with_partial_answer(self):
+        self.ollama.lines = [(0, {"response": "Prima parte", "done": False}),
+                             (2, {"response": " troppo tardi", "done": True})]
+        pieces, stats = await self.collect(timeout=0.3)
+
+        self.assertEqual(pieces, ["Prima parte"])
+        self.assertEqual(stats.stop_reason, "deadline")
+        self.assertLess(stats.duration, 1.5)
+
+    async def test_error_line_raises(self):
+        self.ollama.lines = [(0, {"response": "Ciao", "done": False}),
+                             (0, {"error": "model runner has unexpectedly stopped"})]
+        with self.assertRaisesRegex(OllamaError, "unexpectedly stopped"):
+            await self.collect()
+
+    async def test_invalid_line_raises_ollama_error(self):
+        self.ollama.lines = [(0, "<html>Bad Gateway</html>")]
+        with self.assertRaisesRegex(OllamaError, "Invalid response line"):
+            await self.collect()
+
+    async def test_http_error_raises(self):
+        self.ollama.status = 404
+        with self.assertRaisesRegex(OllamaError, "HTTP 404"):
+            await self.collect()
+
+
+class TestSentenceBuffer(unittest.TestCase):
+    def test_groups_sentences_up_to_min_chars(self):
+        buffer = SentenceBuffer(min_chars=20)
+        messages = []
+        for piece in ["La retta ", "dipende dall'ISEE. ", "Si paga ", "in due rate. Vedi", " il sito."]:
+            messages.extend(buffer.feed(piece))
+        self.assertEqual(messages, ["La retta dipende dall'ISEE.", "Si paga in due rate."])
+        self.assertEqual(buffer.flush(), "Vedi il sito.")
+        self.assertIsNone(buffer.flush())
+
+    def test_short_sentences_are_merged(self):
+        buffer = SentenceBuffer(min_chars=15)
+        self.assertEqual(buffer.feed("Sì. Certo. Ecco i dettagli completi. "), ["Sì. Certo. Ecco i dettagli completi."])
+        self.assertIsNone(buffer.flush())
+
+    def test_paragraph_break_is_a_boundary(self):
+        buffer = SentenceBuffer(min_chars=5)
+        self.assertEqual(buffer.feed("Elenco dei corsi\n\n- Analisi"), ["Elenco dei corsi"])
+        self.assertEqual(buffer.flush(), "- Analisi")
+
+
+class TestGenerationStats(unittest.TestCase):
+    def test_ttft_and_throughput(self):
+        stats = GenerationStats()
+        stats.started_at = 100.0
+        stats.first_token_at = 100.5
+        stats.finished_at = 102.5
+        stats.tokens = 41
+        self.assertAlmostEqual(stats.ttft, 0.5)
+        self.assertAlmostEqual(stats.tokens_per_second, 20.0)
+        self.assertAlmostEqual(stats.as_dict()["duration"], 2.5)
+
+    def test_no_tokens(self):
+        stats = GenerationStats()
+        self.assertIsNone(stats.ttft)
+        self.assertEqual(stats.tokens_per_second, 0.0)
+
+
+
+class TestGenerate(OllamaServerTestCase):
+    async def test_returns_response_and_forwards_fields(self):
+        reply = await self.client.generate("Domanda", system="Sei un assistente", options={"num_ctx": 4096})
+
+        self.assertEqual(reply, "Risposta")
+        request = self.ollama.requests[0]
+        self.assertEqual((request["model"], request["stream"], request["system"]), ("test", False, "Sei un assistente"))
+        self.assertEqual(request["options"], {"num_ctx": 4096})
+
+    async def test_http_error_raises(self):
+        self.ollama.status = 500
+        with self.assertRaisesRegex(OllamaError, "HTTP 500: model 'test' not found"):
+            await self.client.generate("Domanda")
+
+    async def test_read_timeout_raises(self):
+        self.client.read_timeout = 0.2
+        self.ollama.delay = 2
+        with self.assertRaises(OllamaError):
+            await self.client.generate("Domanda")
+
+    async def test_semaphore_caps_concurrency(self):
+        self.ollama.delay = 0.1
+        replies = await asyncio.gather(*(self.client.generate(f"Domanda {i}") for i in range(6)))
+
+        self.assertEqual(replies, ["Risposta"] * 6)
+        self.assertEqual(self.ollama.max_active, self.client.max_concurrency)
+
+
+    async def test_embeddings_do_not_wait_for_generations(self):
+        self.ollama.delay = 2
+        generations = [asyncio.ensure_future(self.client.generate(f"Domanda {i}"))
+                       for i in range(self.client.max_concurrency)]
+        await asyncio.sleep(0.1)
+
+        vectors = await asyncio.wait_for(self.client.embed(["tasse", "alloggi"]), 1)
+        self.assertEqual(vectors, [[5.0, 1.0], [7.0, 1.0]])
+        self.assertEqual(self.ollama.active, self.client.max_concurrency)
+        for task in generations:
+            task.cancel()
+        await asyncio.gather(*generations, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
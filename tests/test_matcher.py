@@ -0,0 +1,60 @@
+import unittest
+
+from actions.matcher import AhoCorasick, Matcher, fold
+from actions.pages import URL_MAP, resolve_topic
+
+DEGREE_TYPES = Matcher({
+    "triennale": "Bachelor's Degree",
+    "bachelor's degree": "Bachelor's Degree",
+    "magistrale": "Master's Degree",
+    "lm": "Master's Degree",
+    "laurea a ciclo unico": "Single-Cycle Degree",
+    "ciclo unico": "Single-Cycle Degree",
+})
+
+
+class TestFold(unittest.TestCase):
+    def test_accents_case_and_punctuation(self):
+        self.assertEqual(fold("  Università — Ciclo-Unico! "), "universita ciclo unico")
+        self.assertEqual(fold("Master's Degree"), "masters degree")
+
+
+class TestAhoCorasick(unittest.TestCase):
+    def test_overlapping_patterns(self):
+        automaton = AhoCorasick(["he", "she", "his", "hers"])
+        self.assertEqual(automaton.find_all("ushers"), [(1, "she"), (2, "he"), (2, "hers")])
+
+
+class TestMatcher(unittest.TestCase):
+    def test_exact_whole_words(self):
+        self.assertEqual(DEGREE_TYPES.match("Vorrei una laurea MAGISTRALE").value, "Master's Degree")
+        self.assertEqual(DEGREE_TYPES.match("bachelor’s degree").value, "Bachelor's Degree")
+        # "lm" non deve corrispondere dentro "film"
+        self.assertIsNone(DEGREE_TYPES.match("un film"))
+
+    def test_longest_keyword_wins(self):
+        match = DEGREE_TYPES.match("laurea a ciclo unico in medicina")
+        self.assertEqual(match.keyword, "laurea a ciclo unico")
+        self.assertTrue(match.exact)
+
+    def test_typos_resolve_fuzzily(self):
+        match = DEGREE_TYPES.match("trienale")
+        self.assertEqual(match.value, "Bachelor's Degree")
+        self.assertFalse(match.exact)
+        self.assertIsNone(DEGREE_TYPES.match("dottorato"))
+
+    def test_accept_filter(self):
+        match = DEGREE_TYPES.match("ciclo unico magistrale", accept=lambda v: v != "Single-Cycle Degree")
+        self.assertEqual(match.value, "Master's Degree")
+
+
+class TestResolveTopic(unittest.TestCase):
+    def test_slot_then_message(self):
+        self.assertEqual(resolve_topic("Tasse").value, URL_MAP["tasse"])
+        self.assertEqual(resolve_topic("iscrizioni").value, URL_MAP["iscrizione"])
+        self.assertEqual(resolve_topic(None, "How much is the tuition fee?").value, URL_MAP["tuition fee"])
+        self.assertIsNone(resolve_topic(None, "ciao"))
+
+
+if __name__ == "__main__":
+    unittest.main()
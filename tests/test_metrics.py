@@ -0,0 +1,116 @@
+import asyncio
+import unittest
+
+from actions import metrics
+from actions.metrics import Counter, Histogram, Registry
+
+
+class TestExposition(unittest.TestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        hist = registry.register(Histogram("stage_seconds", "Durata.", ("stage",), buckets=(0.1, 1.0)))
+        for value in (0.05, 0.5, 5.0):
+            hist.observe(value, stage="llm")
+
+        text = registry.expose()
+        self.assertIn("# TYPE stage_seconds histogram", text)
+        self.assertIn('stage_seconds_bucket{stage="llm",le="0.1"} 1', text)
+        self.assertIn('stage_seconds_bucket{stage="llm",le="1.0"} 2', text)
+        self.assertIn('stage_seconds_bucket{stage="llm",le="+Inf"} 3', text)
+        self.assertIn('stage_seconds_sum{stage="llm"} 5.55', text)
+        self.assertIn('stage_seconds_count{stage="llm"} 3', text)
+
+    def test_label_values_are_escaped(self):
+        registry = Registry()
+        counter = registry.register(Counter("errors_total", "Errori.", ("topic",)))
+        counter.inc(topic='tasse "2024"\n')
+        self.assertIn('errors_total{topic="tasse \\"2024\\"\\n"} 1.0', registry.expose())
+
+    def test_collectors_export_numeric_stats(self):
+        registry = Registry()
+        registry.collector("db_pool")(lambda: {"in_use": 2, "closed": False, "entries": {"a": 1}})
+        registry.collector("outbox")(lambda: None)
+        registry.collector("broken")(lambda: 1 / 0)
+
+        text = registry.expose()
+        self.assertIn("db_pool_in_use 2", text)
+        self.assertIn("db_pool_closed 0", text)
+        self.assertNotIn("db_pool_entries", text)
+        self.assertNotIn("outbox_", text)
+        self.assertIn("# collector broken failed", text)
+
+    def test_collector_counters_get_total_suffix(self):
+        registry = Registry()
+        registry.collector("llm_admission", counters=("admitted", "shed", "wait_time_total"))(
+            lambda: {"admitted": 5, "shed": 1, "wait_time_total": 2.5, "active": 2, "queued": 0})
+
+        text = registry.expose()
+        self.assertIn("# TYPE llm_admission_admitted_total counter\nllm_admission_admitted_total 5", text)
+        self.assertIn("# TYPE llm_admission_shed_total counter\nllm_admission_shed_total 1", text)
+        self.assertIn("# TYPE llm_admission_wait_time_total counter\nllm_admission_wait_time_total 2.5", text)
+        self.assertIn("# TYPE llm_admission_active gauge\nllm_admission_active 2", text)
+        self.assertIn("# TYPE llm_admission_queued gauge", text)
+        self.assertNotIn("llm_admission_admitted ", text)
+
+    def test_registered_collectors_type_counters(self):
+        from actions.admission import AdmissionController
+        from actions import admission, pages
+
+        saved = admission._admission
+        admission._admission = AdmissionController(max_concurrency=1, max_queue=1, max_wait=1)
+        try:
+            text = metrics.REGISTRY.expose()
+        finally:
+            admission._admission = saved
+        self.assertIn("# TYPE llm_admission_admitted_total counter", text)
+        self.assertIn("# TYPE llm_admission_active gauge", text)
+        self.assertIn(f"# TYPE page_crawls_executions_total counter\n"
+                      f"page_crawls_executions_total {pages.crawls.stats()['executions']}", text)
+        self.assertIn("# TYPE page_crawls_in_flight gauge", text)
+
+
+class TestSpans(unittest.IsolatedAsyncioTestCase):
+    async def test_spans_inherit_action_and_topic(self):
+        @metrics.instrument
+        class FakeAction:
+            def name(self):
+                return "action_test_spans"
+
+            async def run(self):
+                metrics.set_topic("tasse")
+                with metrics.span("crawl"):
+                    await asyncio.sleep(0)
+                with metrics.span("answer_cache") as stage:
+                    stage.outcome = "hit"
+                return []
+
+        self.assertTrue(asyncio.iscoroutinefunction(FakeAction.run))
+        self.assertEqual(await FakeAction().run(), [])
+
+        labels = {"action": "action_test_spans", "topic": "tasse"}
+        self.assertEqual(metrics.STAGE_DURATION.count(stage="crawl", outcome="ok", **labels), 1)
+        self.assertEqual(metrics.STAGE_TOTAL.value(stage="answer_cache", outcome="hit", **labels), 1)
+        self.assertEqual(metrics.ACTION_DURATION.count(outcome="ok", **labels), 1)
+
+    def test_errors_are_recorded_and_raised(self):
+        @metrics.instrument
+        class FailingAction:
+            def name(self):
+                return "action_test_errors"
+
+            def run(self):
+                with metrics.span("db"):
+                    raise RuntimeError("connessione persa")
+
+        with self.assertRaises(RuntimeError):
+            FailingAction().run()
+
+        self.assertEqual(metrics.STAGE_TOTAL.value(action="action_test_errors", stage="db", topic="",
+                                                  outcome="error"), 1)
+        self.assertEqual(metrics.ACTION_DURATION.count(action="action_test_errors", topic="", outcome="error"), 1)
+
+    def test_span_outside_actions(self):
+        with metrics.span("smtp_test"):
+            pass
+        self.assertEqual(metrics.STAGE_TOTAL.value(action="background", stage="smtp_test", topic="",
+                                                  outcome="ok"), 1)
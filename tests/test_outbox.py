@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import base64
+import asyncio
+import tempfile
+import unittest
+import threading
+import socketserver
+
+from actions.outbox import Outbox, SmtpSender
+
+
+class FakeSmtpServer(socketserver.ThreadingTCPServer):
+    '''Server SMTP minimale in locale: annuncia AUTH PLAIN e registra i messaggi ricevuti.'''
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, user="bot@univpm.it", password="secret"):
+        super().__init__(("127.0.0.1", 0), FakeSmtpHandler)
+        self.credentials = base64.b64encode(f"\0{user}\0{password}".encode()).decode()
+        self.messages = []
+        self.connections = 0
+        self.logins = 0
+        # destinatario -> lista di risposte da dare a RCPT prima di accettarlo
+        self.rcpt_replies = {}
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+class FakeSmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply("220 localhost ESMTP stand-in")
+        rcpt = []
+        while True:
+            line = self.rfile.readline().decode().rstrip("\r\n")
+            if not line:
+                return
+            command = line.split(" ", 1)[0].upper()
+            if command in ("EHLO", "HELO"):
+                self.wfile.write(b"250-localhost\r\n250-AUTH PLAIN\r\n250 8BITMIME\r\n")
+            elif command == "AUTH":
+                if line.split(" ")[-1] == server.credentials:
+                    with server.lock:
+                        server.logins += 1
+                    self.reply("235 2.7.0 Authentication successful")
+                else:
+                    self.reply("535 5.7.8 Bad credentials")
+            elif command == "MAIL":
+                rcpt = []
+                self.reply("250 OK")
+            elif command == "RCPT":
+                address = line.split(":", 1)[1].strip("<> ")
+                replies = server.rcpt_replies.get(address)
+                if replies:
+                    self.reply(replies.pop(0))
+                else:
+                    rcpt.append(address)
+                    self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    chunk = self.rfile.readline().decode()
+                    if chunk in (".\r\n", ""):
+                        break
+                    data.append(chunk)
+                with server.lock:
+                    server.messages.append((rcpt, "".join(data)))
+                self.reply("250 OK queued")
+            elif command in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class TestOutbox(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.smtp = FakeSmtpServer()
+        threading.Thread(target=self.smtp.serve_forever, args=(0.05,), daemon=True).start()
+        self.spool = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.smtp.shutdown()
+        self.smtp.server_close()
+        self.spool.cleanup()
+
+    def make_outbox(self, **kwargs):
+        sender = SmtpSender("127.0.0.1", self.smtp.port, "bot@univpm.it", "secret", starttls=False, timeout=5)
+        kwargs.setdefault("retry_delay", 0.05)
+        return Outbox(sender, "bot@univpm.it", spool_dir=self.spool.name, **kwargs)
+
+    def spooled(self, folder=""):
+        path = os.path.join(self.spool.name, folder)
+        return [name for name in os.listdir(path) if name.endswith(".json")]
+
+    async def wait_for(self, condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail("condition not reached")
+            await asyncio.sleep(0.01)
+
+    async def test_batch_reuses_one_authenticated_connection(self):
+        outbox = self.make_outbox()
+        for i in range(5):
+            outbox.enqueue(f"studente{i}@studenti.univpm.it", f"Conferma {i}", "Corpo del messaggio")
+
+        await self.wait_for(lambda: outbox.stats()["sent"] == 5)
+        await outbox.stop()
+
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(self.smtp.logins, 1)
+        self.assertEqual(len(self.smtp.messages), 5)
+        self.assertIn("Subject: Conferma 0", self.smtp.messages[0][1])
+        self.assertEqual(self.spooled(), [])
+
+    async def test_temporary_failure_is_retried(self):
+        self.smtp.rcpt_replies["lento@univpm.it"] = ["451 4.3.0 Try again later"]
+        outbox = self.make_outbox()
+        outbox.enqueue("lento@univpm.it", "Conferma", "Corpo")
+
+        await self.wait_for(lambda: outbox.stats()["sent"] == 1)
+        await outbox.stop()
+        self.assertEqual(outbox.stats()["retries"], 1)
+        self.assertEqual(self.smtp.messages[0][0], ["lento@univpm.it"])
+
+    async def test_permanent_failure_moves_to_failed(self):
+        self.smtp.rcpt_replies["nessuno@univpm.it"] = ["550 5.1.1 No such user"]
+        outbox = self.make_outbox()
+        outbox.enqueue("nessuno@univpm.it", "Conferma", "Corpo")
+        outbox.enqueue("studente@univpm.it", "Conferma", "Corpo")
+
+        await self.wait_for(lambda: outbox.stats()["pending"] == 0)
+        await outbox.stop()
+        stats = outbox.stats()
+        self.assertEqual((stats["sent"], stats["failed"]), (1, 1))
+        self.assertEqual(len(self.spooled("failed")), 1)
+
+    async def test_unsent_mail_survives_restart(self):
+        # Nessun server raggiungibile: il messaggio resta nello spool
+        first = self.make_outbox()
+        first.sender.port = 1
+        first.enqueue("studente@univpm.it", "Conferma", "Corpo")
+        await self.wait_for(lambda: first.stats()["retries"] >= 1)
+        await first.stop()
+        self.assertEqual(len(self.spooled()), 1)
+
+        second = self.make_outbox()
+        self.assertEqual(second.stats()["pending"], 1)
+        second.start()
+        await self.wait_for(lambda: second.stats()["sent"] == 1)
+        await second.stop()
+        self.assertEqual(self.spooled(), [])
+
+    def spool_message(self, n):
+        now = time.time()
+        message = {"id": f"legacy{n}", "to": f"studente{n}@univpm.it", "subject": "Conferma", "body": "Corpo",
+                   "created_at": now, "attempts": 0, "next_attempt": now, "last_error": None}
+        with open(os.path.join(self.spool.name, f"legacy{n}.json"), "w", encoding="utf-8") as f:
+            json.dump(message, f)
+
+    async def test_workers_sharing_the_spool_send_each_mail_once(self):
+        for n in range(6):
+            self.spool_message(n)
+        workers = [self.make_outbox() for _ in range(3)]
+        self.assertEqual(sum(w.stats()["pending"] for w in workers), 6)
+
+        for worker in workers:
+            worker.start()
+        await self.wait_for(lambda: sum(w.stats()["sent"] for w in workers) == 6)
+        for worker in workers:
+            await worker.stop()
+        self.assertEqual(len(self.smtp.messages), 6)
+        self.assertEqual(sorted(rcpt[0] for rcpt, _ in self.smtp.messages),
+                         sorted(f"studente{n}@univpm.it" for n in range(6)))
+
+    async def test_live_worker_keeps_its_messages(self):
+        first = self.make_outbox()
+        first.sender.port = 1
+        first.enqueue("studente@univpm.it", "Conferma", "Corpo")
+
+        second = self.make_outbox()
+        self.assertEqual(second._claim(), 0)
+        self.assertEqual(second.stats()["pending"], 0)
+        await first.stop()
+        await second.stop()
+
+    async def test_messages_of_a_dead_worker_are_claimed(self):
+        first = self.make_outbox()
+        first.sender.port = 1
+        first.enqueue("studente@univpm.it", "Conferma", "Corpo")
+        await self.wait_for(lambda: first.stats()["retries"] >= 1)
+        # Il processo muore senza rilasciare i messaggi: il sistema libera il suo lock
+        first._task.cancel()
+        first._folder_lock.close()
+
+        second = self.make_outbox()
+        self.assertEqual(second.stats()["pending"], 1)
+        second.start()
+        await self.wait_for(lambda: second.stats()["sent"] == 1)
+        await second.stop()
+        self.assertEqual(len(self.smtp.messages), 1)
+        self.assertEqual(os.listdir(os.path.join(self.spool.name, "inflight")), [os.path.basename(second._folder)])
+
+    async def test_idle_connection_is_closed(self):
+        outbox = self.make_outbox(idle_timeout=0.05)
+        outbox.enqueue("studente@univpm.it", "Conferma", "Corpo")
+        await self.wait_for(lambda: outbox.stats()["sent"] == 1)
+        await self.wait_for(lambda: not outbox.sender.connected)
+        await outbox.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
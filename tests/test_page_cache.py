@@ -0,0 +1,53 @@
+import tempfile
+import time
+import unittest
+
+from actions.page_cache import PageCache
+
+URL = "https://www.univpm.it/Entra/Tasse_e_contributi"
+
+
+class TestPageCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_memory_hit_and_miss(self):
+        cache = PageCache(ttl=60, directory=None)
+        self.assertIsNone(cache.get(URL))
+        cache.put(URL, "Tasse e contributi")
+        self.assertEqual(cache.get(URL).content, "Tasse e contributi")
+
+        stats = cache.stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["memory_hits"], 1)
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_disk_tier_survives_restart(self):
+        PageCache(ttl=60, directory=self.tmp.name).put(URL, "contenuto")
+
+        restarted = PageCache(ttl=60, directory=self.tmp.name)
+        page = restarted.get(URL)
+        self.assertEqual(page.content, "contenuto")
+        self.assertEqual(restarted.stats()["disk_hits"], 1)
+
+    def test_expired_entries_are_misses(self):
+        cache = PageCache(ttl=0.01, directory=self.tmp.name)
+        cache.put(URL, "vecchio")
+        time.sleep(0.02)
+        self.assertIsNone(cache.get(URL))
+        self.assertEqual(cache.stats()["expired"], 1)
+
+    def test_lru_eviction(self):
+        cache = PageCache(ttl=60, max_entries=2, directory=None)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        cache.get("a")
+        cache.put("c", "C")
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from actions.page_cache import CachedPage
+from actions import prompt as prompt_module
+from actions.prompt import PromptBuilder, load_prompt_builder, load_token_counter
+from actions.retrieval import estimate_tokens, page_index
+
+PAGE = "\n\n".join([
+    "Benvenuto nel portale UnivPM. " * 20,
+    "Alloggi per studenti fuori sede: residenze universitarie e convenzioni. " * 10,
+    "Tasse e contributi: la prima rata si paga all'immatricolazione, "
+    "la seconda rata entro il 31 marzo. L'importo dipende dall'ISEE. " * 8,
+    "Borse di studio ERDIS per studenti meritevoli. " * 10,
+])
+
+
+def words(text):
+    return len(text.split())
+
+
+class TestPromptBuilder(unittest.TestCase):
+    def setUp(self):
+        self.page = CachedPage("https://www.univpm.it/Entra", PAGE)
+
+    def test_prefix_is_shared_across_questions(self):
+        builder = PromptBuilder(prefix_tokens=150, context_tokens=600)
+        fees = builder.build(self.page, "Quando scade la seconda rata?", "it")
+        housing = builder.build(self.page, "Ci sono residenze per fuori sede?", "it")
+
+        self.assertEqual(fees.system, housing.system)
+        lead, _, _ = builder.lead(self.page)
+        self.assertTrue(lead)
+        self.assertTrue(fees.prompt.startswith(f"SOURCE: {self.page.url}\n\nCONTEXT:\n{lead}"))
+        self.assertTrue(housing.prompt.startswith(f"SOURCE: {self.page.url}\n\nCONTEXT:\n{lead}"))
+        # La domanda sta in fondo, dopo i passaggi pertinenti
+        self.assertIn("31 marzo", fees.context)
+        self.assertTrue(fees.prompt.rstrip().endswith("RISPOSTA (sii conciso, in italiano, e cita la fonte se utile):"))
+
+    def test_context_respects_token_budget(self):
+        builder = PromptBuilder(count_tokens=words, prefix_tokens=40, context_tokens=120)
+        prompt = builder.build(self.page, "tasse rata ISEE borse di studio alloggi", "en")
+        lead, lead_tokens, _ = builder.lead(self.page)
+        self.assertLessEqual(lead_tokens, 40)
+        self.assertLessEqual(words(prompt.context), 120)
+        self.assertGreater(len(prompt.context), len(lead))
+
+    def test_num_ctx_limits_passages(self):
+        roomy = PromptBuilder(prefix_tokens=100, context_tokens=2000, num_ctx=4096, max_output_tokens=256)
+        tight = PromptBuilder(prefix_tokens=100, context_tokens=2000, num_ctx=700, max_output_tokens=256)
+        question = "tasse rata ISEE borse di studio alloggi residenze"
+        self.assertLessEqual(tight.build(self.page, question, "it").tokens + 256, 700)
+        self.assertGreater(len(roomy.build(self.page, question, "it").context),
+                           len(tight.build(self.page, question, "it").context))
+
+    def test_passages_from_several_pages_keep_their_source(self):
+        other = CachedPage("https://www.univpm.it/Entra/Servizi_agli_studenti/Alloggi",
+                           "Residenze ERDIS: domanda entro luglio. " * 10)
+        fees = page_index(self.page).chunks[2]
+        housing = page_index(other).chunks[0]
+        builder = PromptBuilder(count_tokens=words, context_tokens=400)
+        prompt = builder.build_passages([(other, housing), (self.page, fees)], "scadenze?", "it")
+
+        # Fonti nell'ordine di pertinenza, ciascuna con il proprio passaggio
+        self.assertTrue(prompt.prompt.startswith(f"CONTEXT:\nSOURCE: {other.url}\n{housing.text}"))
+        self.assertIn(f"SOURCE: {self.page.url}\n{fees.text}", prompt.context)
+
+        # Budget: entra solo il passaggio più pertinente
+        tight = PromptBuilder(count_tokens=words, context_tokens=words(housing.text) + 10)
+        prompt = tight.build_passages([(other, housing), (self.page, fees)], "scadenze?", "it")
+        self.assertNotIn(f"SOURCE: {self.page.url}\n", prompt.context)
+
+    def test_ollama_fields(self):
+        builder = PromptBuilder(num_ctx=8192, keep_alive=-1)
+        prompt = builder.build(self.page, "alloggi", "en")
+        fields = prompt.fields()
+        self.assertEqual(fields["options"], {"num_ctx": 8192})
+        self.assertEqual(fields["keep_alive"], -1)
+        self.assertIn("ENGLISH", fields["system"])
+
+    def test_lead_is_computed_once_per_page(self):
+        calls = []
+
+        def counting(text):
+            calls.append(text)
+            return estimate_tokens(text)
+
+        builder = PromptBuilder(count_tokens=counting, prefix_tokens=100)
+        builder.lead(self.page)
+        first = len(calls)
+        builder.lead(self.page)
+        self.assertEqual(len(calls), first)
+
+    def test_budget_with_real_tokenizer(self):
+        try:
+            from tokenizers import Tokenizer, models, pre_tokenizers
+        except ImportError:
+            self.skipTest("tokenizers not installed")
+        # Tokenizer a parole (come quello del modello, ma costruito dal testo della pagina)
+        vocab = {"[UNK]": 0}
+        for word in PAGE.split() + "Quando scade la seconda rata ?".split():
+            vocab.setdefault(word, len(vocab))
+        tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+        tokenizer.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "tokenizer.json")
+            tokenizer.save(path)
+            count_tokens = load_token_counter(path)
+
+        self.assertIsNot(count_tokens, estimate_tokens)
+        self.assertEqual(count_tokens("la seconda rata"), 3)
+        builder = PromptBuilder(count_tokens=count_tokens, prefix_tokens=40, context_tokens=120)
+        prompt = builder.build(self.page, "Quando scade la seconda rata?", "it")
+        # Ogni parola della pagina è un token: il budget è misurato col tokenizer, non con la stima
+        self.assertEqual(count_tokens(prompt.context), words(prompt.context))
+        self.assertLessEqual(count_tokens(prompt.context), 120)
+        self.assertIn("31 marzo", prompt.context)
+
+    def test_missing_tokenizer_falls_back_to_estimate(self):
+        self.assertIs(load_token_counter(""), estimate_tokens)
+        self.assertIs(load_token_counter("/nonexistent/tokenizer.json"), estimate_tokens)
+
+
+class TestLoadPromptBuilder(unittest.IsolatedAsyncioTestCase):
+    async def test_tokenizer_is_loaded_off_the_event_loop(self):
+        threads = []
+
+        def slow_counter(source):
+            threads.append(threading.current_thread())
+            return estimate_tokens
+
+        saved = prompt_module._builder, prompt_module.load_token_counter
+        prompt_module._builder, prompt_module.load_token_counter = None, slow_counter
+        try:
+            builder = await load_prompt_builder()
+            self.assertIs(await load_prompt_builder(), builder)
+        finally:
+            prompt_module._builder, prompt_module.load_token_counter = saved
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
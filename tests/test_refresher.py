@@ -0,0 +1,61 @@
+import asyncio
+import unittest
+
+from actions.refresher import PageRefresher
+
+TASSE = "https://www.univpm.it/Entra/Tasse_e_contributi"
+ALLOGGI = "https://www.univpm.it/Entra/Servizi_agli_studenti/Alloggi"
+
+
+class TestPageRefresher(unittest.IsolatedAsyncioTestCase):
+    async def test_urls_are_deduplicated(self):
+        refresher = PageRefresher([TASSE, ALLOGGI, TASSE], fetch=None)
+        self.assertEqual(refresher.urls, [TASSE, ALLOGGI])
+
+    async def test_status_tracks_success_and_failures(self):
+        async def fetch(url):
+            if url == ALLOGGI:
+                raise ConnectionError("timeout")
+
+        refresher = PageRefresher([TASSE, ALLOGGI], fetch=fetch)
+        await refresher.refresh_all()
+        await refresher.refresh_all()
+
+        status = refresher.status()
+        self.assertEqual(status[TASSE]["refreshes"], 2)
+        self.assertIsNotNone(status[TASSE]["last_refresh"])
+        self.assertIsNone(status[ALLOGGI]["last_refresh"])
+        self.assertEqual(status[ALLOGGI]["failures"], 2)
+        self.assertEqual(status[ALLOGGI]["consecutive_failures"], 2)
+        self.assertIn("timeout", status[ALLOGGI]["last_error"])
+
+    async def test_background_schedule_refreshes_periodically(self):
+        fetched = []
+
+        async def fetch(url):
+            fetched.append(url)
+
+        refresher = PageRefresher([TASSE], fetch=fetch, interval=0.01, jitter=0.5)
+        refresher.start()
+        await asyncio.sleep(0.1)
+        await refresher.stop()
+        self.assertGreaterEqual(len(fetched), 3)
+
+    async def test_failed_url_is_retried_before_interval(self):
+        attempts = []
+
+        async def fetch(url):
+            attempts.append(url)
+            if len(attempts) == 1:
+                raise ConnectionError("down")
+
+        refresher = PageRefresher([TASSE], fetch=fetch, interval=3600, jitter=0.0, retry_delay=0.01)
+        refresher.start()
+        await asyncio.sleep(0.05)
+        await refresher.stop()
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(refresher.status()[TASSE]["consecutive_failures"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
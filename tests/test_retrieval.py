@@ -0,0 +1,58 @@
+import unittest
+
+from actions.page_cache import CachedPage
+from actions.retrieval import BM25Index, chunk_text, estimate_tokens, page_index, select_context
+
+PAGE = "\n\n".join([
+    "Benvenuto nel portale UnivPM. " * 20,
+    "Alloggi per studenti fuori sede: residenze universitarie e convenzioni. " * 10,
+    "Tasse e contributi: la prima rata si paga all'immatricolazione, "
+    "la seconda rata entro il 31 marzo. L'importo dipende dall'ISEE. " * 8,
+    "Borse di studio ERDIS per studenti meritevoli. " * 10,
+])
+
+
+class TestChunking(unittest.TestCase):
+    def test_chunks_cover_text_with_overlap(self):
+        chunks = chunk_text(PAGE, chunk_size=300, overlap=60)
+        self.assertGreater(len(chunks), 5)
+        self.assertEqual(chunks[0].start, 0)
+        self.assertEqual(chunks[-1].end, len(PAGE))
+        for prev, nxt in zip(chunks, chunks[1:]):
+            # Ogni chunk riparte prima della fine del precedente
+            self.assertLess(nxt.start, prev.end)
+            self.assertLessEqual(len(prev.text), 300)
+
+    def test_short_text_single_chunk(self):
+        chunks = chunk_text("Testo breve.", chunk_size=300, overlap=60)
+        self.assertEqual([c.text for c in chunks], ["Testo breve."])
+
+
+class TestBM25(unittest.TestCase):
+    def setUp(self):
+        self.index = BM25Index(chunk_text(PAGE, chunk_size=300, overlap=60))
+
+    def test_relevant_chunk_ranks_first(self):
+        results = self.index.search("Quando si paga la seconda rata delle tasse?", k=2)
+        self.assertTrue(results)
+        self.assertIn("seconda rata", results[0][1].text)
+
+    def test_unknown_terms_return_nothing(self):
+        self.assertEqual(self.index.search("xyzzy"), [])
+
+    def test_select_context_respects_budget(self):
+        context = select_context(self.index, "rata tasse ISEE", k=4, token_budget=150)
+        self.assertLessEqual(estimate_tokens(context), 160)
+        self.assertIn("rata", context)
+
+    def test_select_context_falls_back_to_page_head(self):
+        context = select_context(self.index, "xyzzy", k=1, token_budget=1000)
+        self.assertTrue(context.startswith("Benvenuto"))
+
+    def test_index_is_cached_on_page(self):
+        page = CachedPage("https://www.univpm.it/Entra/Tasse_e_contributi", PAGE)
+        self.assertIs(page_index(page), page_index(page))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import asyncio
+import unittest
+
+from actions.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        calls = 0
+        release = asyncio.Event()
+
+        async def crawl():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "pagina"
+
+        waiters = [asyncio.ensure_future(flight.do("iscrizione", crawl)) for _ in range(10)]
+        await asyncio.sleep(0)
+        self.assertEqual(flight.in_flight(), 1)
+        release.set()
+
+        self.assertEqual(await asyncio.gather(*waiters), ["pagina"] * 10)
+        self.assertEqual(calls, 1)
+        self.assertEqual(flight.stats(), {"executions": 1, "shared": 9, "in_flight": 0})
+
+    async def test_next_call_runs_again(self):
+        flight = SingleFlight()
+        results = iter(["v1", "v2"])
+
+        async def fetch():
+            return next(results)
+
+        self.assertEqual(await flight.do("k", fetch), "v1")
+        self.assertEqual(await flight.do("k", fetch), "v2")
+
+    async def test_exception_is_shared(self):
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("ollama down")
+
+        results = await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.assertEqual(flight.in_flight(), 0)
+
+    async def test_leader_cancellation_does_not_cancel_followers(self):
+        flight = SingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.02)
+            return 42
+
+        leader = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        self.assertEqual(await follower, 42)
+        with self.assertRaises(asyncio.CancelledError):
+            await leader
+
+
+if __name__ == "__main__":
+    unittest.main()
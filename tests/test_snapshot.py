@@ -0,0 +1,93 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from actions.page_cache import CachedPage
+from actions.retrieval import chunk_text, page_index
+from actions.snapshot import Snapshot, SnapshotError, SnapshotStore, write_snapshot
+
+FEES = "https://www.univpm.it/Entra/Tasse_e_contributi"
+HOUSING = "https://www.univpm.it/Entra/Servizi_agli_studenti/Alloggi"
+
+
+def make_text(topic, paragraphs=40):
+    return "\n\n".join(f"Paragrafo {i} su {topic}: informazioni per gli studenti." for i in range(paragraphs))
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "pages.snapshot")
+        self.pages = [CachedPage(FEES, make_text("tasse"), 1000.0), CachedPage(HOUSING, make_text("alloggi"), 2000.0)]
+
+    def open(self):
+        snapshot = Snapshot(self.path)
+        self.addCleanup(snapshot.close)
+        return snapshot
+
+    def test_round_trip(self):
+        write_snapshot(self.path, self.pages)
+        snapshot = self.open()
+
+        self.assertEqual(snapshot.urls(), [FEES, HOUSING])
+        page = snapshot.page(HOUSING)
+        self.assertEqual(page.content, self.pages[1].content)
+        self.assertEqual(page.fetched_at, 2000.0)
+        self.assertEqual(page.content_hash, self.pages[1].content_hash)
+        self.assertIsNone(snapshot.page("https://www.univpm.it/altro"))
+        # Compresso: il file è più piccolo del testo
+        self.assertLess(os.path.getsize(self.path), sum(len(p.content) for p in self.pages))
+
+    def test_chunks_restored_from_offsets(self):
+        write_snapshot(self.path, self.pages)
+        page = self.open().page(FEES)
+
+        self.assertEqual(page.derived["chunks"], chunk_text(page.content))
+        self.assertIs(page_index(page).chunks, page.derived["chunks"])
+
+    def test_page_is_decompressed_once(self):
+        write_snapshot(self.path, self.pages)
+        snapshot = self.open()
+        self.assertIs(snapshot.page(FEES), snapshot.page(FEES))
+
+    def test_corrupted_block_is_rejected(self):
+        write_snapshot(self.path, self.pages)
+        with open(self.path, "r+b") as f:
+            f.seek(-10, os.SEEK_END)
+            f.write(b"\xff" * 4)
+
+        snapshot = self.open()
+        with self.assertRaises(SnapshotError):
+            snapshot.read(HOUSING)
+        self.assertEqual(snapshot.read(FEES), self.pages[0].content)
+
+    def test_unknown_version_is_rejected(self):
+        write_snapshot(self.path, self.pages)
+        with open(self.path, "r+b") as f:
+            f.seek(8)
+            f.write(struct.pack("<I", 99))
+
+        with self.assertRaisesRegex(SnapshotError, "unsupported"):
+            Snapshot(self.path)
+
+    def test_store_reloads_rewritten_file(self):
+        store = SnapshotStore(self.path, check_interval=0)
+        self.assertIsNone(store.page(FEES))
+
+        write_snapshot(self.path, self.pages)
+        self.assertEqual(store.page(FEES).content, self.pages[0].content)
+
+        write_snapshot(self.path, [CachedPage(FEES, "Tasse aggiornate")])
+        self.assertEqual(store.page(FEES).content, "Tasse aggiornate")
+        self.assertIsNone(store.page(HOUSING))
+
+    def test_store_ignores_invalid_file(self):
+        with open(self.path, "wb") as f:
+            f.write(b"non uno snapshot")
+        self.assertIsNone(SnapshotStore(self.path, check_interval=0).page(FEES))
+
+
+if __name__ == "__main__":
+    unittest.main()
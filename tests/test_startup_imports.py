@@ -0,0 +1,83 @@
+import os
+import sys
+import json
+import subprocess
+import unittest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+HEAVY_MODULES = ("crawl4ai", "playwright", "numpy", "psycopg2", "aiohttp", "smtplib", "requests")
+
+# Importa ogni modulo del package come fa rasa_sdk all'avvio (senza rasa_sdk
+# si saltano le action che lo importano) ed elenca le librerie pesanti caricate
+CHILD = """
+import sys, json, pkgutil, importlib
+import actions
+for info in pkgutil.walk_packages(actions.__path__, "actions."):
+    try:
+        importlib.import_module(info.name)
+    except ImportError as e:
+        if e.name is None or not e.name.startswith("rasa_sdk"):
+            raise
+print(json.dumps(sorted({name.split(".")[0] for name in sys.modules} & set(sys.argv[1:]))))
+"""
+
+# Come sopra, poi esegue gli hook di avvio e arresto come il listener di
+# actions/server.py (con rasa_sdk installato, sull'app vera di create_app)
+CHILD_BOOT = """
+import sys, json, asyncio, pkgutil, importlib
+import actions
+from actions import lifecycle
+try:
+    from actions.server import create_app
+    create_app("actions")
+except ImportError as e:
+    if e.name is None or not e.name.startswith(("rasa_sdk", "sanic")):
+        raise
+    for info in pkgutil.walk_packages(actions.__path__, "actions."):
+        try:
+            importlib.import_module(info.name)
+        except ImportError as e:
+            if e.name is None or not e.name.startswith("rasa_sdk"):
+                raise
+
+async def boot():
+    await lifecycle.startup()
+    await asyncio.sleep(0.2)
+    await lifecycle.shutdown()
+
+asyncio.run(boot())
+print(json.dumps(sorted({name.split(".")[0] for name in sys.modules} & set(sys.argv[1:]))))
+"""
+
+# Worker che serve solo i form: niente browser, refresher, warm-up di modello e pagine
+FORMS_ONLY_ENV = {"CRAWLER_POOL_EAGER": "0", "PAGE_REFRESH_ENABLED": "0", "WARMUP_CHECKS": "",
+                  "EMBEDDINGS_MODEL": "", "SMTP_EMAIL": "", "SMTP_PASSWORD": ""}
+
+
+class TestStartupImports(unittest.TestCase):
+    def test_heavy_libraries_are_not_imported_at_startup(self):
+        result = subprocess.run([sys.executable, "-c", CHILD, *HEAVY_MODULES],
+                                cwd=ROOT, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(json.loads(result.stdout), [])
+
+    def test_forms_only_worker_boot_loads_no_heavy_library(self):
+        env = {**os.environ, **FORMS_ONLY_ENV}
+        result = subprocess.run([sys.executable, "-c", CHILD_BOOT, *HEAVY_MODULES],
+                                cwd=ROOT, capture_output=True, text=True, env=env, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(json.loads(result.stdout.strip().splitlines()[-1]), [])
+
+    def test_action_modules_do_not_import_each_other(self):
+        # actions.py è solo un indice: le action di un modulo non caricano le altre
+        for module in ("contact", "university_info", "enrollment_form"):
+            with open(os.path.join(ROOT, "actions", f"{module}.py"), encoding="utf-8") as f:
+                source = f.read()
+            for other in ("contact", "university_info", "enrollment_form", "actions"):
+                if other != module:
+                    self.assertNotIn(f"from .{other} import", source, module)
+
+
+if __name__ == "__main__":
+    unittest.main()
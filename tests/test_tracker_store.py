@@ -0,0 +1,210 @@
+import os
+import json
+import asyncio
+import tempfile
+import threading
+import unittest
+
+from tracker_store.event_log import EventLog, decode_event, encode_event
+
+
+class RowRejected(Exception):
+    '''Come psycopg2.DataError: il DB rifiuta i dati di un evento.'''
+
+
+class MemoryEventLog(EventLog):
+    '''EventLog con la tabella tracker_event in un dizionario al posto di PostgreSQL.'''
+
+    def __init__(self, **kwargs):
+        super().__init__(pool=None, **kwargs)
+        self.table = {}
+        self.writes = []
+        self.fail_writes = 0
+        self.write_started = threading.Event()
+        self.release_write = None
+
+    def _read(self, sender_id, all_sessions):
+        rows = sorted(self.table.get(sender_id, {}).values())
+        if not all_sessions:
+            starts = [row[0] for row in rows if row[1] == "session_started"]
+            rows = [row for row in rows if row[0] >= (starts[-1] if starts else 0)]
+        return rows
+
+    def _write(self, batch):
+        self.write_started.set()
+        if self.release_write is not None:
+            self.release_write.wait()
+        if self.fail_writes:
+            self.fail_writes -= 1
+            raise ConnectionError("database non raggiungibile")
+        for rows in batch.values():
+            if any("rifiutato" in row[3] for row in rows):
+                raise RowRejected("invalid input syntax for type json")
+        self.writes.append({sender: len(rows) for sender, rows in batch.items()})
+        for sender, rows in batch.items():
+            for row in rows:
+                self.table.setdefault(sender, {}).setdefault(row[0], row)
+
+    def _sender_ids(self):
+        return list(self.table)
+
+    def _delete(self, sender_id):
+        self.table.pop(sender_id, None)
+
+    def _is_data_error(self, error):
+        return isinstance(error, RowRejected)
+
+
+def user(text, ts=1.0):
+    return {"event": "user", "timestamp": ts, "text": text, "parse_data": {"intent": {"name": "greet"}}}
+
+
+def session_started(ts=1.0):
+    return {"event": "session_started", "timestamp": ts}
+
+
+class TestEventLog(unittest.TestCase):
+    def test_encode_keeps_type_and_timestamp_in_columns(self):
+        row = encode_event(3, user("ciao", ts=12.5))
+        self.assertEqual(row[:3], (3, "user", 12.5))
+        self.assertNotIn("timestamp", row[3])
+        self.assertEqual(decode_event(row), user("ciao", ts=12.5))
+
+    def test_only_new_events_are_appended(self):
+        log = MemoryEventLog(flush_interval=0)
+        self.assertEqual(log.load("a"), [])
+        log.append("a", [session_started(), user("ciao")])
+
+        tracker = log.load("a")
+        self.assertEqual(log.known_events("a"), 2)
+        tracker.append(user("tasse"))
+        log.append("a", tracker[log.known_events("a"):])
+
+        self.assertEqual([e["event"] for e in log.load("a", all_sessions=True)],
+                         ["session_started", "user", "user"])
+        self.assertEqual(sorted(log.table["a"]), [0, 1, 2])
+
+    def test_load_starts_from_last_session(self):
+        log = MemoryEventLog(flush_interval=0)
+        log.load("a")
+        log.append("a", [session_started(1), user("vecchia", 2), session_started(3), user("nuova", 4)])
+
+        self.assertEqual([e.get("text") for e in log.load("a")], [None, "nuova"])
+        self.assertEqual(log.known_events("a"), 2)
+        self.assertEqual(len(log.load("a", all_sessions=True)), 4)
+
+    def test_cursor_is_rebuilt_after_eviction(self):
+        log = MemoryEventLog(flush_interval=0, cache_size=1)
+        for sender in ("a", "b"):
+            log.load(sender)
+            log.append(sender, [session_started(), user("ciao")])
+
+        self.assertEqual(log.known_events("a"), 2)
+        self.assertEqual(log.stats()["cursor_misses"], 1)
+
+    def test_failed_write_is_retried_and_visible_meanwhile(self):
+        log = MemoryEventLog(flush_interval=0)
+        log.fail_writes = 1
+        log.load("a")
+        log.append("a", [session_started(), user("ciao")])
+
+        self.assertEqual(log.pending(), 2)
+        self.assertEqual(len(log.load("a")), 2)
+        self.assertEqual(log.flush(), 2)
+        self.assertEqual(log.pending(), 0)
+        self.assertEqual(log.stats()["failures"], 1)
+
+    def test_batch_in_flight_stays_visible(self):
+        log = MemoryEventLog(flush_interval=60)
+        log.load("a")
+        log.release_write = threading.Event()
+        log._pending["a"] = [encode_event(0, session_started()), encode_event(1, user("ciao"))]
+        log._pending_count = 2
+
+        writer = threading.Thread(target=log.flush)
+        writer.start()
+        log.write_started.wait(1)
+        self.assertEqual(len(log.load("a")), 2)
+        log.release_write.set()
+        writer.join(1)
+        self.assertEqual(len(log.load("a")), 2)
+
+    def test_nul_characters_are_stripped(self):
+        row = encode_event(0, user("ciao\x00mondo"))
+        self.assertNotIn("\\u0000", row[3])
+        self.assertEqual(decode_event(row)["text"], "ciaomondo")
+
+    def test_rejected_event_does_not_block_other_conversations(self):
+        log = MemoryEventLog(flush_interval=60)
+        # DB fermo durante i salvataggi: le tre conversazioni finiscono nello stesso lotto
+        log.fail_writes = 3
+        for sender, text in (("a", "ciao"), ("b", "rifiutato"), ("c", "ciao")):
+            log.load(sender)
+            log.append(sender, [session_started(), user(text)])
+
+        self.assertEqual(log.flush(), 5)
+        self.assertEqual(sorted(log.table), ["a", "b", "c"])
+        self.assertEqual(sorted(log.table["b"]), [0])
+        stats = log.stats()
+        self.assertEqual((stats["rejected"], stats["pending"]), (1, 0))
+
+    def test_rejected_event_goes_to_dead_letter(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rejected.jsonl")
+            log = MemoryEventLog(flush_interval=0, dead_letter=path)
+            log.load("a")
+            log.append("a", [user("rifiutato")])
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(json.loads(f.readline())["sender_id"], "a")
+
+    def test_pending_events_are_capped(self):
+        log = MemoryEventLog(flush_interval=60, max_pending=3)
+        log.fail_writes = 10
+        log.load("a")
+        log.append("a", [session_started(), user("1")])
+        self.assertEqual(log.append("a", [user("2"), user("3")]), 0)
+
+        self.assertEqual(log.pending(), 2)
+        self.assertEqual(log.stats()["dropped"], 2)
+        # Il cursore non è avanzato: gli eventi scartati verranno riproposti
+        self.assertEqual(log.known_events("a"), 2)
+
+    def test_tracker_that_does_not_extend_is_replaced(self):
+        log = MemoryEventLog(flush_interval=0)
+        log.load("a")
+        stored = [session_started(1), user("ciao", 2), user("tasse", 3)]
+        log.append("a", stored)
+
+        self.assertTrue(log.extends("a", 4, lambda i: (stored + [user("nuovo", 4)])[i]))
+        replacement = [session_started(1), user("altro", 5)]
+        self.assertFalse(log.extends("a", 2, lambda i: replacement[i]))
+        self.assertFalse(log.extends("a", 3, lambda i: [session_started(1), user("x", 7), user("y", 8)][i]))
+
+        log.replace("a", replacement)
+        self.assertEqual([e.get("text") for e in log.load("a")], [None, "altro"])
+        self.assertEqual(sorted(log.table["a"]), [0, 1])
+        self.assertEqual(log.known_events("a"), 2)
+
+
+class TestBatching(unittest.IsolatedAsyncioTestCase):
+    async def test_conversations_are_written_together(self):
+        log = MemoryEventLog(batch_size=1000, flush_interval=0.05)
+        for sender in ("a", "b", "c"):
+            log.load(sender)
+            log.append(sender, [session_started(), user("ciao")])
+        self.assertEqual(log.writes, [])
+
+        await asyncio.sleep(0.15)
+        self.assertEqual(log.writes, [{"a": 2, "b": 2, "c": 2}])
+        self.assertEqual(sorted(log.sender_ids()), ["a", "b", "c"])
+
+    async def test_full_buffer_is_written_immediately(self):
+        log = MemoryEventLog(batch_size=4, flush_interval=60)
+        log.load("a")
+        log.append("a", [session_started(), user("1"), user("2"), user("3")])
+        await asyncio.sleep(0.05)
+        self.assertEqual(log.writes, [{"a": 4}])
+
+
+if __name__ == "__main__":
+    unittest.main()
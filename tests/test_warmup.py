@@ -0,0 +1,72 @@
+import asyncio
+import unittest
+
+from actions.warmup import Warmup, prime_pages
+
+
+class TestWarmup(unittest.IsolatedAsyncioTestCase):
+    async def test_ready_only_after_all_checks(self):
+        release = asyncio.Event()
+        calls = []
+
+        async def db():
+            calls.append("db")
+
+        async def llm():
+            calls.append("llm")
+            await release.wait()
+
+        warmup = Warmup({"db": db, "llm": llm})
+        self.assertFalse(warmup.ready())
+        warmup.start()
+        await asyncio.sleep(0.01)
+
+        self.assertTrue(warmup.status()["db"]["ready"])
+        self.assertFalse(warmup.ready())
+
+        release.set()
+        await warmup.wait()
+        self.assertTrue(warmup.ready())
+        self.assertEqual(sorted(calls), ["db", "llm"])
+
+    async def test_failing_check_is_retried(self):
+        attempts = 0
+
+        async def ollama():
+            nonlocal attempts
+            attempts += 1
+            if attempts < 3:
+                raise ConnectionError("ollama non ancora avviato")
+
+        warmup = Warmup({"llm": ollama}, retry_delay=0.001, max_retry_delay=0.002)
+        warmup.start()
+        await warmup.wait()
+
+        status = warmup.status()["llm"]
+        self.assertTrue(status["ready"])
+        self.assertEqual(status["attempts"], 3)
+        self.assertIn("ollama non ancora avviato", status["last_error"])
+
+    async def test_stop_cancels_pending_checks(self):
+        async def never():
+            await asyncio.Event().wait()
+
+        warmup = Warmup({"pages": never})
+        warmup.start()
+        await warmup.stop()
+        self.assertFalse(warmup.ready())
+
+    def test_no_checks_means_ready(self):
+        self.assertTrue(Warmup({}).ready())
+
+    async def test_unreachable_page_does_not_block_the_others(self):
+        async def fetch(url):
+            if url == "https://www.univpm.it/down":
+                raise ConnectionError("crawl fallito")
+            return url.upper()
+
+        urls = ["https://www.univpm.it/a", "https://www.univpm.it/down", "https://www.univpm.it/b"]
+        with self.assertLogs("actions.warmup", "WARNING") as logs:
+            pages = await prime_pages(urls, fetch)
+        self.assertEqual(pages, ["HTTPS://WWW.UNIVPM.IT/A", "HTTPS://WWW.UNIVPM.IT/B"])
+        self.assertIn("https://www.univpm.it/down", logs.output[0])
@@ -0,0 +1,4 @@
+# Tracker store di Rasa su PostgreSQL (lo stesso database del catalogo).
+#
+# Configurato in endpoints.yml come `tracker_store.postgres.PostgresTrackerStore`;
+# la logica di scrittura a lotti, senza dipendenze da Rasa, è in event_log.py.
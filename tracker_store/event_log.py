@@ -0,0 +1,536 @@
+# Log degli eventi delle conversazioni su PostgreSQL, usato dal tracker store.
+#
+# Ad ogni turno Rasa salva l'intero tracker: invece di riscriverlo, qui si
+# aggiungono solo gli eventi nuovi (una riga JSONB per evento, numerata per
+# conversazione). Gli eventi nuovi restano in un buffer e vengono scritti a
+# lotti, tutte le conversazioni insieme, con un solo INSERT multi-riga e un
+# commit ogni TRACKER_FLUSH_INTERVAL secondi (o subito a buffer pieno). Il
+# numero di eventi già salvati per conversazione è in una cache LRU limitata,
+# così un salvataggio non costa una COUNT. La memoria resta costante: nessun
+# tracker viene tenuto in memoria oltre al buffer in attesa di scrittura, che
+# ha un tetto (max_pending eventi; oltre, gli eventi nuovi vengono scartati e
+# riproposti al salvataggio successivo).
+#
+# Se PostgreSQL rifiuta i dati di un lotto (DataError/IntegrityError) il lotto
+# viene riscritto per conversazione e poi per evento: gli eventi rifiutati
+# finiscono nel log (e nel file `dead_letter`, se indicato) senza bloccare gli
+# altri. Un tracker che non prosegue quello salvato (es. PUT
+# /conversations/<id>/tracker/events) sostituisce gli eventi della conversazione.
+#
+# Manutenzione (anche da riga di comando, `python -m tracker_store.event_log`):
+# - prune: cancella le conversazioni inattive da più di `retention_days`;
+# - compact: cancella gli eventi delle sessioni precedenti all'ultima più
+#   vecchi di `compact_after_days` (il bot carica solo l'ultima sessione).
+
+import os
+import sys
+import json
+import time
+import atexit
+import asyncio
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (seq, tipo evento, timestamp, dati JSON senza "event" e "timestamp")
+Row = Tuple[int, str, float, str]
+# (tipo, timestamp) di un evento: basta a riconoscere l'ultimo evento salvato
+EventKey = Tuple[str, float]
+
+SESSION_STARTED = "session_started"
+
+_EVENT_ROW = "(%s, %s, %s, %s, %s::jsonb)"
+_CONVERSATION_ROW = "(%s, %s)"
+
+
+def _strip_nul(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.replace("\x00", "")
+    if isinstance(value, dict):
+        return {_strip_nul(k): _strip_nul(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_strip_nul(v) for v in value]
+    return value
+
+
+def encode_event(seq: int, event: Dict[str, Any]) -> Row:
+    '''
+    Evento (come da `Event.as_dict()`) -> riga; tipo e timestamp vanno nelle
+    colonne. I caratteri NUL, che JSONB non accetta, vengono rimossi.
+    '''
+    data = {k: v for k, v in event.items() if k not in ("event", "timestamp")}
+    encoded = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    if "\\u0000" in encoded:
+        encoded = json.dumps(_strip_nul(data), ensure_ascii=False, separators=(",", ":"))
+    return seq, event["event"].replace("\x00", ""), float(event.get("timestamp") or time.time()), encoded
+
+
+def event_key(event: Dict[str, Any]) -> EventKey:
+    return event["event"].replace("\x00", ""), float(event.get("timestamp") or 0.0)
+
+
+def _row_key(row: Row) -> EventKey:
+    return row[1], row[2]
+
+
+def _is_data_error(error: Exception) -> bool:
+    '''Errori dovuti ai dati degli eventi: riprovare lo stesso lotto non servirebbe.'''
+    try:
+        import psycopg2
+    except ImportError:
+        return False
+    return isinstance(error, (psycopg2.DataError, psycopg2.IntegrityError))
+
+
+def decode_event(row: Row) -> Dict[str, Any]:
+    _, type_name, timestamp, data = row
+    event = json.loads(data) if isinstance(data, str) else dict(data)
+    event["event"] = type_name
+    event["timestamp"] = timestamp
+    return event
+
+
+class EventLog:
+    '''
+    Eventi delle conversazioni con scrittura a lotti.
+
+    :param pool: pool di connessioni (vedi actions/db.py)
+    :param batch_size: eventi in attesa che fanno partire subito una scrittura
+    :param flush_interval: secondi massimi di attesa di un evento nel buffer (0 = scrittura immediata)
+    :param cache_size: conversazioni di cui ricordare quanti eventi sono già salvati
+    :param retention_days: conversazioni inattive da cancellare (None = mai)
+    :param compact_after_days: età oltre cui cancellare le sessioni passate (None = mai)
+    :param maintenance_interval: secondi tra due esecuzioni di prune/compact in background
+    :param max_pending: eventi massimi in attesa di scrittura (oltre, i nuovi vengono scartati)
+    :param dead_letter: file JSONL dove salvare gli eventi rifiutati dal DB (None = solo log)
+    '''
+
+    def __init__(self,
+                 pool: Any,
+                 batch_size: int = 200,
+                 flush_interval: float = 0.5,
+                 cache_size: int = 10000,
+                 retention_days: Optional[float] = None,
+                 compact_after_days: Optional[float] = None,
+                 maintenance_interval: float = 3600.0,
+                 max_pending: int = 50000,
+                 dead_letter: Optional[str] = None) -> None:
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.cache_size = cache_size
+        self.retention_days = retention_days
+        self.compact_after_days = compact_after_days
+        self.maintenance_interval = maintenance_interval
+        self.max_pending = max_pending
+        self.dead_letter = dead_letter
+        self._maintained_at = time.monotonic()
+
+        # sender_id -> eventi non ancora scritti, in ordine di seq
+        self._pending: Dict[str, List[Row]] = {}
+        self._pending_count = 0
+        # Lotto in scrittura: resta visibile a `load` finché il commit non è avvenuto
+        self._inflight: Dict[str, List[Row]] = {}
+        # sender_id -> (seq di inizio del tracker caricato, prossimo seq, ultimo evento)
+        self._cursors: "OrderedDict[str, Tuple[int, int, Optional[EventKey]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self._stats = {"appended": 0, "written": 0, "batches": 0, "failures": 0,
+                       "rejected": 0, "dropped": 0, "replaced": 0,
+                       "cursor_hits": 0, "cursor_misses": 0}
+        self.last_error: Optional[str] = None
+        atexit.register(self.flush)
+
+    # --- Accesso al database (sovrascrivibile nei test) --------------------
+
+    def _read(self, sender_id: str, all_sessions: bool) -> List[Row]:
+        '''Eventi salvati della conversazione: tutti o dall'inizio dell'ultima sessione.'''
+        sql = "SELECT seq, type_name, timestamp, data::text FROM tracker_event WHERE sender_id = %s"
+        params: List[Any] = [sender_id]
+        if not all_sessions:
+            sql += (" AND seq >= (SELECT COALESCE(MAX(seq), 0) FROM tracker_event"
+                    f" WHERE sender_id = %s AND type_name = '{SESSION_STARTED}')")
+            params.append(sender_id)
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(sql + " ORDER BY seq", params)
+                return [tuple(row) for row in cur.fetchall()]
+            finally:
+                cur.close()
+
+    def _write(self, batch: Dict[str, List[Row]]) -> None:
+        '''Un lotto di eventi di più conversazioni in una transazione (due INSERT multi-riga).'''
+        events = [(sender_id, *row) for sender_id, rows in batch.items() for row in rows]
+        counts = [(sender_id, rows[-1][0] + 1) for sender_id, rows in batch.items()]
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(
+                    "INSERT INTO tracker_event (sender_id, seq, type_name, timestamp, data) "
+                    f"VALUES {', '.join([_EVENT_ROW] * len(events))} ON CONFLICT DO NOTHING",
+                    [value for event in events for value in event],
+                )
+                cur.execute(
+                    "INSERT INTO tracker_conversation (sender_id, event_count) "
+                    f"VALUES {', '.join([_CONVERSATION_ROW] * len(counts))} "
+                    "ON CONFLICT (sender_id) DO UPDATE SET "
+                    "event_count = GREATEST(tracker_conversation.event_count, EXCLUDED.event_count), "
+                    "updated_at = now()",
+                    [value for count in counts for value in count],
+                )
+            finally:
+                cur.close()
+
+    def _sender_ids(self) -> List[str]:
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT sender_id FROM tracker_conversation")
+                return [row[0] for row in cur.fetchall()]
+            finally:
+                cur.close()
+
+    def _delete(self, sender_id: str) -> None:
+        '''Cancella tutti gli eventi salvati della conversazione.'''
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute("DELETE FROM tracker_event WHERE sender_id = %s", [sender_id])
+                cur.execute("DELETE FROM tracker_conversation WHERE sender_id = %s", [sender_id])
+            finally:
+                cur.close()
+
+    def _is_data_error(self, error: Exception) -> bool:
+        return _is_data_error(error)
+
+    # --- Lettura ----------------------------------------------------------
+
+    def _remember(self, sender_id: str, start: int, next_seq: int, last: Optional[EventKey]) -> None:
+        with self._lock:
+            self._cursors[sender_id] = (start, next_seq, last)
+            self._cursors.move_to_end(sender_id)
+            while len(self._cursors) > self.cache_size:
+                self._cursors.popitem(last=False)
+
+    def load(self, sender_id: str, all_sessions: bool = False) -> List[Dict[str, Any]]:
+        '''
+        Eventi della conversazione (salvati + in attesa di scrittura), come
+        dizionari da passare a `DialogueStateTracker.from_dict`.
+        '''
+        rows = self._read(sender_id, all_sessions)
+        with self._lock:
+            pending = self._inflight.get(sender_id, []) + self._pending.get(sender_id, [])
+        if pending:
+            last = rows[-1][0] if rows else -1
+            rows.extend(row for row in pending if row[0] > last)
+            if not all_sessions:
+                # Una sessione iniziata negli eventi non ancora scritti
+                starts = [i for i, row in enumerate(rows) if row[1] == SESSION_STARTED]
+                if starts:
+                    rows = rows[starts[-1]:]
+
+        if not all_sessions:
+            start = rows[0][0] if rows else 0
+            # Nessun evento: conversazione nuova (o cancellata dalla retention), si riparte da 0
+            next_seq = rows[-1][0] + 1 if rows else 0
+            self._remember(sender_id, start, next_seq, _row_key(rows[-1]) if rows else None)
+        return [decode_event(row) for row in rows]
+
+    def _cursor(self, sender_id: str) -> Tuple[int, int, Optional[EventKey]]:
+        with self._lock:
+            cursor = self._cursors.get(sender_id)
+            if cursor is not None:
+                self._cursors.move_to_end(sender_id)
+                self._stats["cursor_hits"] += 1
+        if cursor is None:
+            with self._lock:
+                self._stats["cursor_misses"] += 1
+            self.load(sender_id)
+            with self._lock:
+                cursor = self._cursors[sender_id]
+        return cursor
+
+    def known_events(self, sender_id: str) -> int:
+        '''Quanti eventi del tracker caricato con `load` sono già salvati (o in attesa).'''
+        start, next_seq, _ = self._cursor(sender_id)
+        return next_seq - start
+
+    def extends(self, sender_id: str, length: int, event_at: Callable[[int], Dict[str, Any]]) -> bool:
+        '''
+        Se un tracker di `length` eventi (`event_at(i)` restituisce l'i-esimo)
+        prosegue quello salvato: ne ha almeno altrettanti e l'ultimo evento
+        salvato è nella stessa posizione.
+        '''
+        start, next_seq, last = self._cursor(sender_id)
+        known = next_seq - start
+        if known > length:
+            return False
+        return known == 0 or last is None or event_key(event_at(known - 1)) == last
+
+    def sender_ids(self) -> List[str]:
+        ids = self._sender_ids()
+        with self._lock:
+            ids.extend(s for s in self._pending if s not in set(ids))
+        return ids
+
+    # --- Scrittura --------------------------------------------------------
+
+    def append(self, sender_id: str, events: Sequence[Dict[str, Any]]) -> int:
+        '''
+        Aggiunge gli eventi nuovi della conversazione (quelli dopo `known_events`)
+        e restituisce quanti sono. La scrittura avviene a lotti in background.
+        '''
+        if not events:
+            return 0
+        with self._lock:
+            if self._pending_count + len(events) > self.max_pending:
+                # Database fermo da troppo: il cursore non avanza, così gli eventi
+                # vengono riproposti al prossimo salvataggio della conversazione
+                self._stats["dropped"] += len(events)
+                logger.error(f"Tracker event buffer full ({self._pending_count} events): "
+                             f"{len(events)} events of {sender_id} not stored")
+                return 0
+            start, next_seq, _ = self._cursors.get(sender_id, (0, 0, None))
+            rows = [encode_event(next_seq + i, event) for i, event in enumerate(events)]
+            self._cursors[sender_id] = (start, next_seq + len(rows), _row_key(rows[-1]))
+            self._cursors.move_to_end(sender_id)
+            self._pending.setdefault(sender_id, []).extend(rows)
+            self._pending_count += len(rows)
+            self._stats["appended"] += len(rows)
+            full = self._pending_count >= self.batch_size
+        self._schedule(now=full or self.flush_interval <= 0)
+        return len(rows)
+
+    def replace(self, sender_id: str, events: Sequence[Dict[str, Any]]) -> int:
+        '''Sostituisce tutti gli eventi della conversazione con `events`.'''
+        # Con il lock di scrittura nessun lotto della conversazione è in volo
+        with self._write_lock:
+            with self._lock:
+                dropped = self._pending.pop(sender_id, [])
+                self._pending_count -= len(dropped)
+                self._cursors.pop(sender_id, None)
+                self._stats["replaced"] += 1
+            self._delete(sender_id)
+        return self.append(sender_id, events)
+
+    def _take(self) -> Dict[str, List[Row]]:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._inflight = batch
+            self._pending_count = 0
+        return batch
+
+    def _put_back(self, batch: Dict[str, List[Row]]) -> None:
+        with self._lock:
+            self._inflight = {}
+            for sender_id, rows in batch.items():
+                newer = self._pending.get(sender_id, [])
+                self._pending[sender_id] = rows + newer
+                self._pending_count += len(rows)
+
+    def _failed(self, batch: Dict[str, List[Row]], error: Exception) -> None:
+        self._put_back(batch)
+        self.last_error = f"{type(error).__name__}: {error}"
+        with self._lock:
+            self._stats["failures"] += 1
+        logger.warning(f"Could not write {sum(len(rows) for rows in batch.values())} "
+                       f"tracker events: {self.last_error}")
+
+    def _reject(self, sender_id: str, row: Row, error: Exception) -> None:
+        '''Evento rifiutato dal DB: niente altri tentativi, resta nel log (e nel file di scarto).'''
+        logger.error(f"Tracker event {sender_id}#{row[0]} ({row[1]}) rejected by the database: "
+                     f"{type(error).__name__}: {error}")
+        with self._lock:
+            self._stats["rejected"] += 1
+        if not self.dead_letter:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.dead_letter)), exist_ok=True)
+            with open(self.dead_letter, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"sender_id": sender_id, "row": row, "error": str(error)},
+                                   ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.error(f"Could not save rejected tracker event {sender_id}#{row[0]}: {e}")
+
+    def _write_split(self, batch: Dict[str, List[Row]]) -> int:
+        '''
+        Lotto con dati rifiutati: una conversazione alla volta e, se ancora
+        rifiutata, un evento alla volta. Se il DB fallisce per altri motivi il
+        resto del lotto torna nel buffer.
+        '''
+        written = 0
+        items = list(batch.items())
+        for i, (sender_id, rows) in enumerate(items):
+            try:
+                self._write({sender_id: rows})
+                written += len(rows)
+                continue
+            except Exception as e:
+                if not self._is_data_error(e):
+                    self._failed(dict(items[i:]), e)
+                    return written
+            for j, row in enumerate(rows):
+                try:
+                    self._write({sender_id: [row]})
+                    written += 1
+                except Exception as e:
+                    if not self._is_data_error(e):
+                        self._failed({sender_id: rows[j:], **dict(items[i + 1:])}, e)
+                        return written
+                    self._reject(sender_id, row, e)
+        with self._lock:
+            self._inflight = {}
+        return written
+
+    def flush(self) -> int:
+        '''Scrive subito tutti gli eventi in attesa (bloccante); restituisce quanti.'''
+        with self._write_lock:
+            batch = self._take()
+            if not batch:
+                return 0
+            try:
+                self._write(batch)
+                written = sum(len(rows) for rows in batch.values())
+            except Exception as e:
+                if not self._is_data_error(e):
+                    self._failed(batch, e)
+                    return 0
+                written = self._write_split(batch)
+            with self._lock:
+                self._inflight = {}
+                self._stats["written"] += written
+                self._stats["batches"] += 1
+            return written
+
+    def _schedule(self, now: bool) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Fuori dall'event loop (script, test): scrittura sincrona
+            self.flush()
+            return
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+        if now:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        failures = 0
+        while True:
+            delay = self.flush_interval * 2 ** min(failures, 6)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay if self.flush_interval > 0 else None)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if time.monotonic() - self._maintained_at >= self.maintenance_interval:
+                self._maintained_at = time.monotonic()
+                await loop.run_in_executor(None, self.maintain)
+            if not self.pending():
+                continue
+            try:
+                written = await loop.run_in_executor(None, self.flush)
+            except Exception as e:
+                logger.exception(f"Tracker event writer error: {e}")
+                written = 0
+            failures = 0 if written else failures + 1
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._pending_count
+
+    # --- Manutenzione -----------------------------------------------------
+
+    def prune(self, retention_days: float) -> int:
+        '''Cancella le conversazioni inattive da più di `retention_days` giorni; restituisce quante.'''
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(
+                    "DELETE FROM tracker_conversation WHERE updated_at < now() - %s * interval '1 day' "
+                    "RETURNING sender_id",
+                    [retention_days],
+                )
+                pruned = [row[0] for row in cur.fetchall()]
+                if pruned:
+                    cur.execute("DELETE FROM tracker_event WHERE sender_id = ANY(%s)", [pruned])
+            finally:
+                cur.close()
+        with self._lock:
+            for sender_id in pruned:
+                self._cursors.pop(sender_id, None)
+        return len(pruned)
+
+    def compact(self, compact_after_days: float) -> int:
+        '''Cancella gli eventi delle sessioni passate più vecchi di `compact_after_days` giorni.'''
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(
+                    "DELETE FROM tracker_event e "
+                    "USING (SELECT sender_id, MAX(seq) AS seq FROM tracker_event "
+                    f"       WHERE type_name = '{SESSION_STARTED}' GROUP BY sender_id) s "
+                    "WHERE e.sender_id = s.sender_id AND e.seq < s.seq "
+                    "AND e.timestamp < extract(epoch FROM now()) - %s * 86400",
+                    [compact_after_days],
+                )
+                return cur.rowcount
+            finally:
+                cur.close()
+
+    def maintain(self) -> None:
+        '''Retention e compattazione configurate; gli errori vengono solo registrati.'''
+        try:
+            if self.retention_days is not None:
+                pruned = self.prune(self.retention_days)
+                if pruned:
+                    logger.info(f"Tracker store: {pruned} inactive conversations deleted")
+            if self.compact_after_days is not None:
+                compacted = self.compact(self.compact_after_days)
+                if compacted:
+                    logger.info(f"Tracker store: {compacted} events of past sessions deleted")
+        except Exception as e:
+            logger.warning(f"Tracker store maintenance failed: {type(e).__name__}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["pending"] = self._pending_count
+            stats["cached_cursors"] = len(self._cursors)
+        stats["last_error"] = self.last_error
+        return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from actions.db import get_pool
+
+    parser = argparse.ArgumentParser(prog="python -m tracker_store.event_log",
+                                     description="Manutenzione del tracker store su PostgreSQL")
+    parser.add_argument("--retention-days", type=float, help="cancella le conversazioni inattive da più giorni")
+    parser.add_argument("--compact-after-days", type=float, help="cancella le sessioni passate più vecchie")
+    args = parser.parse_args(argv)
+    if args.retention_days is None and args.compact_after_days is None:
+        parser.error("indicare --retention-days e/o --compact-after-days")
+
+    log = EventLog(get_pool())
+    if args.retention_days is not None:
+        print(f"Conversazioni cancellate: {log.prune(args.retention_days)}")
+    if args.compact_after_days is not None:
+        print(f"Eventi di sessioni passate cancellati: {log.compact(args.compact_after_days)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
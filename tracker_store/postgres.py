@@ -0,0 +1,103 @@
+# Tracker store di Rasa che salva gli eventi delle conversazioni su PostgreSQL.
+#
+# Senza tracker store configurato Rasa tiene ogni conversazione in memoria:
+# cresce senza limiti e si perde al riavvio. Questo store carica il tracker
+# dall'ultima sessione e ad ogni salvataggio aggiunge solo gli eventi nuovi,
+# scritti a lotti da EventLog (vedi event_log.py); un tracker che non prosegue
+# quello salvato (es. eventi sostituiti via API) prende il posto del vecchio.
+# La connessione usa le stesse variabili POSTGRES_* e lo stesso pool
+# dell'action server.
+
+import asyncio
+import logging
+import itertools
+from typing import Any, Iterable, Optional, Text
+
+from rasa.core.brokers.broker import EventBroker
+from rasa.core.tracker_store import TrackerStore
+from rasa.shared.core.domain import Domain
+from rasa.shared.core.trackers import DialogueStateTracker
+
+from actions.db import get_pool
+from .event_log import EventLog
+
+logger = logging.getLogger(__name__)
+
+
+class PostgresTrackerStore(TrackerStore):
+    '''
+    Tracker store append-only su PostgreSQL.
+
+    I parametri arrivano dal blocco `tracker_store` di endpoints.yml (`url`
+    viene ignorato: la connessione usa le variabili POSTGRES_*):
+
+    :param batch_size: eventi in attesa che fanno partire subito una scrittura
+    :param flush_interval: secondi massimi prima della scrittura di un evento (0 = ad ogni salvataggio)
+    :param cache_size: conversazioni di cui ricordare il numero di eventi salvati
+    :param retention_days: conversazioni inattive da cancellare (vuoto = mai)
+    :param compact_after_days: età oltre cui cancellare le sessioni passate (vuoto = mai)
+    :param max_pending: eventi massimi in attesa di scrittura (es. con il DB fermo)
+    :param dead_letter: file JSONL degli eventi rifiutati dal DB (vuoto = solo log)
+    '''
+
+    def __init__(self,
+                 domain: Optional[Domain] = None,
+                 event_broker: Optional[EventBroker] = None,
+                 host: Optional[Text] = None,
+                 batch_size: int = 200,
+                 flush_interval: float = 0.5,
+                 cache_size: int = 10000,
+                 retention_days: Optional[float] = None,
+                 compact_after_days: Optional[float] = None,
+                 maintenance_interval: float = 3600.0,
+                 max_pending: int = 50000,
+                 dead_letter: Optional[Text] = None,
+                 **kwargs: Any) -> None:
+        super().__init__(domain, event_broker, **kwargs)
+        self.log = EventLog(
+            get_pool(),
+            batch_size=int(batch_size),
+            flush_interval=float(flush_interval),
+            cache_size=int(cache_size),
+            retention_days=float(retention_days) if retention_days is not None else None,
+            compact_after_days=float(compact_after_days) if compact_after_days is not None else None,
+            maintenance_interval=float(maintenance_interval),
+            max_pending=int(max_pending),
+            dead_letter=dead_letter or None,
+        )
+
+    async def _in_thread(self, func: Any, *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def save(self, tracker: DialogueStateTracker) -> None:
+        '''
+        Aggiunge solo gli eventi che il database (o il buffer) non ha ancora;
+        se il tracker non prosegue quello salvato ne sostituisce gli eventi.
+        '''
+        await self.stream_events(tracker)
+        events = tracker.events
+        extends = await self._in_thread(self.log.extends, tracker.sender_id, len(events),
+                                        lambda i: events[i].as_dict())
+        if not extends:
+            logger.info(f"Tracker of {tracker.sender_id} replaced with {len(events)} events")
+            await self._in_thread(self.log.replace, tracker.sender_id, [event.as_dict() for event in events])
+            return
+        known = await self._in_thread(self.log.known_events, tracker.sender_id)
+        new_events = [event.as_dict() for event in itertools.islice(tracker.events, known, None)]
+        self.log.append(tracker.sender_id, new_events)
+
+    async def _retrieve(self, sender_id: Text, all_sessions: bool) -> Optional[DialogueStateTracker]:
+        events = await self._in_thread(self.log.load, sender_id, all_sessions)
+        if not events:
+            return None
+        return DialogueStateTracker.from_dict(sender_id, events, self.domain.slots)
+
+    async def retrieve(self, sender_id: Text) -> Optional[DialogueStateTracker]:
+        '''Tracker dall'inizio dell'ultima sessione della conversazione.'''
+        return await self._retrieve(sender_id, all_sessions=False)
+
+    async def retrieve_full_tracker(self, sender_id: Text) -> Optional[DialogueStateTracker]:
+        return await self._retrieve(sender_id, all_sessions=True)
+
+    async def keys(self) -> Iterable[Text]:
+        return await self._in_thread(self.log.sender_ids)